@@ -0,0 +1,119 @@
+"""
+Пул заранее созданных объявлений для тестов, которым нужен только валидный item_id.
+Объявления создаются один раз параллельно и ждутся до видимости в списке продавца;
+тесты берут их во временное пользование (lease). Тесты, меняющие счетчики,
+берут объявление эксклюзивно, и после них оно больше никому эксклюзивно не выдается.
+"""
+
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Set
+
+from ads import create_ads_bulk
+from api_client import AdsApiClient
+from waiting import DEFAULT_TIMEOUT, wait_until
+
+
+DEFAULT_POOL_ADS = 4
+
+
+class AdPoolError(RuntimeError):
+    """Не удалось подготовить объявления для пула"""
+
+
+class AdPool:
+    """Пул проверенных (видимых через GET) объявлений одного продавца"""
+
+    def __init__(self, client: AdsApiClient, seller_id: int, size: int = DEFAULT_POOL_ADS,
+                 timeout: float = DEFAULT_TIMEOUT):
+        self.client = client
+        self.seller_id = seller_id
+        self.size = size
+        self.timeout = timeout
+        self.ads: List[Dict[str, Any]] = []
+        self._shared: Dict[str, int] = {}
+        self._exclusive: Set[str] = set()
+        self._dirty: Set[str] = set()
+        self._next = 0
+        self._lock = threading.Lock()
+
+    def _create_visible(self, count: int) -> List[Dict[str, Any]]:
+        specs = [{"name": f"Pool Ad {len(self.ads) + index + 1}"} for index in range(count)]
+        result = create_ads_bulk(self.client, self.seller_id, specs)
+        if not result.ok:
+            raise AdPoolError(f"Не удалось создать объявления пула: {result.failures}")
+        expected = set(result.item_ids)
+
+        def fetch() -> List[Dict[str, Any]]:
+            response = self.client.get(f"/{self.seller_id}/item")
+            return response.json() if response.status_code == 200 else []
+
+        listing = wait_until(fetch, lambda ads: expected <= {ad.get("id") for ad in ads}, timeout=self.timeout)
+        visible = [ad for ad in listing if ad.get("id") in expected]
+        if len(visible) != len(expected):
+            raise AdPoolError(f"Объявления пула не появились за {self.timeout} с: "
+                              f"видно {len(visible)} из {len(expected)}")
+        return visible
+
+    def fill(self) -> "AdPool":
+        """Создание объявлений пула; вызывается один раз на сессию"""
+        self.ads.extend(self._create_visible(self.size))
+        return self
+
+    def _take_shared(self) -> Optional[Dict[str, Any]]:
+        candidates = [ad for ad in self.ads if ad["id"] not in self._exclusive]
+        if not candidates:
+            return None
+        ad = candidates[self._next % len(candidates)]
+        self._next += 1
+        return ad
+
+    def _take_exclusive(self) -> Optional[Dict[str, Any]]:
+        for ad in self.ads:
+            item_id = ad["id"]
+            if item_id not in self._exclusive and item_id not in self._dirty and not self._shared.get(item_id):
+                return ad
+        return None
+
+    def _acquire(self, ad: Dict[str, Any], exclusive: bool):
+        item_id = ad["id"]
+        if exclusive:
+            self._exclusive.add(item_id)
+        else:
+            self._shared[item_id] = self._shared.get(item_id, 0) + 1
+
+    @contextmanager
+    def lease(self, exclusive: bool = False) -> Iterator[Dict[str, Any]]:
+        """
+        Объявление во временное пользование.
+        exclusive=True - для тестов, меняющих состояние (например, счетчики просмотров):
+        объявление не выдается другим тестам до возврата и больше не выдается эксклюзивно.
+        """
+        with self._lock:
+            ad = self._take_exclusive() if exclusive else self._take_shared()
+            if ad is not None:
+                self._acquire(ad, exclusive)
+        if ad is None:
+            # Создание и ожидание видимости - без блокировки, чтобы не задерживать другие выдачи
+            ad = self._create_visible(1)[0]
+            with self._lock:
+                self.ads.append(ad)
+                self._acquire(ad, exclusive)
+        item_id = ad["id"]
+        try:
+            yield dict(ad)
+        finally:
+            with self._lock:
+                if exclusive:
+                    self._exclusive.discard(item_id)
+                    self._dirty.add(item_id)
+                else:
+                    self._shared[item_id] -= 1
+
+    @property
+    def active_leases(self) -> Dict[str, str]:
+        """Текущие выдачи: item_id -> "exclusive" или "shared" """
+        with self._lock:
+            leases = {item_id: "shared" for item_id, count in self._shared.items() if count}
+            leases.update({item_id: "exclusive" for item_id in self._exclusive})
+            return leases
@@ -0,0 +1,124 @@
+"""
+Помощники предметной области: тело запроса на создание объявления,
+разбор ответа POST /item и параллельное создание объявлений.
+"""
+
+import re
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Sequence
+
+from api_client import AdsApiClient
+
+
+SELLER_ID_MIN = 111111
+SELLER_ID_MAX = 999999
+
+DEFAULT_BULK_CONCURRENCY = 8
+
+_ITEM_ID_RE = re.compile(r"[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}")
+
+
+def endpoint_template(method: str, path: str) -> str:
+    """Шаблон эндпоинта без конкретных значений: "GET /statistic/:id", "GET /:sellerID/item" """
+    path = path.split("?", 1)[0].lstrip("/")
+    if path == "item":
+        route = "/item"
+    elif path.startswith("item/"):
+        route = "/item/:id"
+    elif path.startswith("statistic/"):
+        route = "/statistic/:id"
+    elif path.endswith("/item") and "/" not in path[:-len("/item")]:
+        route = "/:sellerID/item"
+    else:
+        route = "/" + path
+    return f"{method} {route}"
+
+
+def build_ad_payload(seller_id: int, name: str = "Test Ad", price: int = 1000,
+                     statistics: Optional[Dict] = None) -> Dict[str, Any]:
+    """Тело запроса POST /item"""
+    if statistics is None:
+        statistics = {
+            "contacts": 0,
+            "likes": 0,
+            "viewCount": 0
+        }
+    return {
+        "sellerID": seller_id,
+        "name": name,
+        "price": price,
+        "statistics": statistics
+    }
+
+
+def parse_item_id(status: Optional[str]) -> Optional[str]:
+    """id объявления из поля status ответа POST /item ("Сохранили объявление - <uuid>")"""
+    if not status:
+        return None
+    match = _ITEM_ID_RE.search(status)
+    return match.group(0).lower() if match else None
+
+
+@dataclass
+class BulkFailure:
+    """Неуспешный запрос в пакетном создании"""
+    index: int
+    spec: Dict[str, Any]
+    status_code: Optional[int]
+    error: str
+
+
+@dataclass
+class BulkCreateResult:
+    """Результат пакетного создания: id в порядке specs (None для неуспешных) и список ошибок"""
+    item_ids: List[Optional[str]] = field(default_factory=list)
+    failures: List[BulkFailure] = field(default_factory=list)
+
+    @property
+    def ok(self) -> bool:
+        return not self.failures
+
+    @property
+    def created_ids(self) -> List[str]:
+        return [item_id for item_id in self.item_ids if item_id is not None]
+
+
+def _create_one(client: AdsApiClient, seller_id: int, index: int, spec: Dict[str, Any]):
+    try:
+        response = client.post("/item", json=build_ad_payload(seller_id, **spec))
+    except Exception as exc:  # ошибка одного запроса не должна прерывать пакет
+        return None, BulkFailure(index, spec, None, repr(exc))
+    if response.status_code != 200:
+        return None, BulkFailure(index, spec, response.status_code, response.text[:200])
+    try:
+        item_id = parse_item_id(response.json().get("status"))
+    except ValueError:
+        item_id = None
+    if item_id is None:
+        return None, BulkFailure(index, spec, response.status_code,
+                                 f"в ответе нет id объявления: {response.text[:200]}")
+    return item_id, None
+
+
+def create_ads_bulk(client: AdsApiClient, seller_id: int, specs: Sequence[Dict[str, Any]],
+                    concurrency: int = DEFAULT_BULK_CONCURRENCY) -> BulkCreateResult:
+    """
+    Параллельное создание объявлений одного продавца.
+    specs - аргументы build_ad_payload (name, price, statistics) для каждого объявления.
+    Время выполнения определяется самым медленным запросом, а не суммой всех.
+    """
+    result = BulkCreateResult(item_ids=[None] * len(specs))
+    if not specs:
+        return result
+    # Больше потоков, чем соединений в пуле, только ждали бы свободного соединения
+    workers = max(1, min(concurrency, len(specs), client.pool_size))
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(_create_one, client, seller_id, index, dict(spec))
+                   for index, spec in enumerate(specs)]
+        for index, future in enumerate(futures):
+            item_id, failure = future.result()
+            result.item_ids[index] = item_id
+            if failure is not None:
+                result.failures.append(failure)
+    return result
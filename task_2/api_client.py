@@ -0,0 +1,273 @@
+"""
+HTTP-клиент для API микросервиса объявлений Авито.
+Общая сессия с пулом keep-alive соединений и явными таймаутами,
+чтобы не платить за TCP+TLS рукопожатие на каждый запрос.
+
+Таймауты соединения и чтения ограничивают одну операцию с сокетом, поэтому сервер,
+отдающий ответ по байту, их не нарушает. Общий дедлайн ограничивает весь вызов
+request() вместе с повторами и чтением тела ответа. Повторяются только
+идемпотентные GET - после обрыва соединения или ответа 502/503/504.
+Необязательный кэш ответов GET (response_cache.py) подключается параметром cache.
+"""
+
+import os
+import time
+from typing import Callable, Iterator, List, Optional, Tuple
+
+import requests
+from requests.adapters import BaseAdapter, HTTPAdapter
+from requests.utils import get_netrc_auth
+from urllib3.exceptions import DecodeError, ProtocolError, ReadTimeoutError
+
+from response_cache import ResponseCache
+from throttling import MAX_429_RETRIES, SharedThrottle, ThrottleDeadline, ThrottleError
+
+
+BASE_URL = "https://qa-internship.avito.com/api/1"
+
+DEFAULT_POOL_SIZE = 10
+DEFAULT_CONNECT_TIMEOUT = 3.05
+DEFAULT_READ_TIMEOUT = 15.0
+DEFAULT_DEADLINE = 30.0
+DEFAULT_RETRIES = 2
+RETRY_BACKOFF = 0.1
+IDEMPOTENT_METHODS = frozenset({"GET"})
+RETRY_STATUSES = frozenset({502, 503, 504})
+# Ошибки транспорта: обрыв, таймаут, неполное тело ответа
+TRANSPORT_ERRORS = (requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError)
+
+CHUNK_SIZE = 16 * 1024
+
+# observer(method, path, status, size, elapsed); status=None - запрос завершился исключением
+Observer = Callable[[str, str, Optional[int], int, float], None]
+
+
+class DeadlineExceeded(requests.Timeout):
+    """Вызов не уложился в общий дедлайн клиента"""
+
+
+def _env_float(name: str, default: float) -> float:
+    value = os.environ.get(name)
+    return float(value) if value else default
+
+
+def _env_int(name: str, default: int) -> int:
+    value = os.environ.get(name)
+    return int(value) if value else default
+
+
+def _cap_timeout(timeout, remaining: float):
+    """Таймауты (соединение, чтение), не превышающие остаток дедлайна"""
+    if remaining <= 0:
+        raise DeadlineExceeded("дедлайн истек до отправки запроса")
+    if timeout is None:
+        return remaining, remaining
+    if isinstance(timeout, tuple):
+        return tuple(remaining if part is None else min(part, remaining) for part in timeout)
+    return min(timeout, remaining)
+
+
+def _iter_available(response: requests.Response) -> Iterator[bytes]:
+    """
+    Тело ответа кусками по мере поступления (read1 urllib3 2.x) с ошибками requests, как у iter_content.
+    iter_content ждет заполнения куска целиком, и дедлайн проверялся бы только после него.
+    """
+    read1 = getattr(response.raw, "read1", None)
+    if read1 is None:
+        yield from response.iter_content(CHUNK_SIZE)
+        return
+    try:
+        while True:
+            chunk = read1(CHUNK_SIZE, decode_content=True)
+            if not chunk:
+                return
+            yield chunk
+    except ProtocolError as error:
+        raise requests.exceptions.ChunkedEncodingError(error)
+    except DecodeError as error:
+        raise requests.exceptions.ContentDecodingError(error)
+    except ReadTimeoutError as error:
+        raise requests.ConnectionError(error)
+
+
+class AdsApiClient:
+    """Клиент API объявлений поверх requests.Session с настраиваемым пулом соединений"""
+
+    def __init__(self, base_url: str = BASE_URL, pool_size: Optional[int] = None,
+                 connect_timeout: Optional[float] = None, read_timeout: Optional[float] = None,
+                 transport: Optional[BaseAdapter] = None, throttle: Optional[SharedThrottle] = None,
+                 deadline: Optional[float] = None, retries: Optional[int] = None,
+                 cache: Optional[ResponseCache] = None):
+        self.base_url = base_url.rstrip("/")
+        self.pool_size = pool_size or _env_int("ADS_API_POOL_SIZE", DEFAULT_POOL_SIZE)
+        self.timeout: Tuple[float, float] = (
+            connect_timeout or _env_float("ADS_API_CONNECT_TIMEOUT", DEFAULT_CONNECT_TIMEOUT),
+            read_timeout or _env_float("ADS_API_READ_TIMEOUT", DEFAULT_READ_TIMEOUT),
+        )
+        # Общий дедлайн вызова request() в секундах; 0 - без дедлайна
+        self.deadline = _env_float("ADS_API_DEADLINE", DEFAULT_DEADLINE) if deadline is None else deadline
+        # Сколько раз повторять идемпотентный запрос после ошибки транспорта или 502/503/504
+        self.retries = _env_int("ADS_API_RETRIES", DEFAULT_RETRIES) if retries is None else retries
+        self.observers: List[Observer] = []
+        # Общий для воркеров лимит частоты и выключатель; None - без ограничений
+        self.throttle = throttle
+        # Кэш ответов GET /item/:id и GET /:sellerID/item; None - без кэша
+        self.cache = cache
+        self.session = requests.Session()
+        # Прокси, CA-бандл и .netrc из окружения определяются один раз для base_url: иначе
+        # requests перечитывает os.environ на каждый запрос, и это ~1 мс CPU на вызов
+        settings = self.session.merge_environment_settings(self.base_url, {}, None, None, None)
+        self.session.proxies.update(settings["proxies"])
+        self.session.verify = settings["verify"]
+        self.session.auth = get_netrc_auth(self.base_url)
+        self.session.trust_env = False
+        # pool_block=True: при исчерпании пула поток ждет свободное соединение,
+        # а не открывает новое, которое потом будет выброшено
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size, pool_block=True)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        if transport is not None:
+            # Альтернативный транспорт (например, заглушка без сокетов) для base_url
+            self.session.mount(self.base_url, transport)
+
+    def url(self, path: str) -> str:
+        """Полный URL для пути относительно base_url"""
+        return f"{self.base_url}/{path.lstrip('/')}"
+
+    def request(self, method: str, path: str, cache: bool = True, retries: Optional[int] = None,
+                **kwargs) -> requests.Response:
+        """
+        Выполнение запроса через общую сессию; таймаут и общий дедлайн задаются всегда.
+        cache=False - запрос мимо кэша ответов (потоковые запросы не кэшируются никогда),
+        retries - число повторов этого запроса вместо self.retries (0 - каждая попытка видна вызывающему)
+        """
+        method = method.upper()
+        if self.cache is None:
+            return self._request(method, path, retries, **kwargs)
+        if method == "GET" and cache and not kwargs.get("stream") and self.cache.cacheable(path):
+            return self._cached_get(path, retries, **kwargs)
+        response = self._request(method, path, retries, **kwargs)
+        if method == "POST" and response.ok:
+            self.cache.invalidate_create(path, kwargs)
+        return response
+
+    def _cached_get(self, path: str, retries: Optional[int] = None, **kwargs) -> requests.Response:
+        key = self.cache.key(path, kwargs.get("params"))
+        generation = self.cache.generation
+        entry = self.cache.lookup(key)
+        if entry is not None and self.cache.fresh(entry):
+            return self.cache.hit(entry)
+        if entry is not None and entry.etag:
+            kwargs["headers"] = {**(kwargs.get("headers") or {}), "If-None-Match": entry.etag}
+        response = self._request("GET", path, retries, **kwargs)
+        if response.status_code == 304 and entry is not None:
+            return self.cache.revalidated(entry)
+        self.cache.store(key, response, generation)
+        return response
+
+    def _request(self, method: str, path: str, retries: Optional[int] = None, **kwargs) -> requests.Response:
+        kwargs.setdefault("timeout", self.timeout)
+        deadline = time.monotonic() + self.deadline if self.deadline else None
+        retries = self.retries if retries is None else retries
+        attempts = retries + 1 if method in IDEMPOTENT_METHODS else 1
+        for attempt in range(attempts):
+            last = attempt == attempts - 1
+            try:
+                response = self._throttled(method, path, deadline, **kwargs)
+            except TRANSPORT_ERRORS as error:
+                # Ошибки лимита и дедлайна не повторяются: повтор их не исправит
+                if last or isinstance(error, (ThrottleError, DeadlineExceeded)) or not self._backoff(attempt, deadline):
+                    raise
+                continue
+            if last or response.status_code not in RETRY_STATUSES or not self._backoff(attempt, deadline):
+                return response
+            response.close()
+
+    def _backoff(self, attempt: int, deadline: Optional[float]) -> bool:
+        """Пауза перед повтором; False - повтор не успеет до дедлайна"""
+        pause = RETRY_BACKOFF * 2 ** attempt
+        if deadline is not None and time.monotonic() + pause >= deadline:
+            return False
+        time.sleep(pause)
+        return True
+
+    def _throttled(self, method: str, path: str, deadline: Optional[float], **kwargs) -> requests.Response:
+        if self.throttle is None:
+            return self._send(method, path, deadline, **kwargs)
+        # 429 означает, что запрос не обработан: после паузы из Retry-After его можно повторить
+        for attempt in range(MAX_429_RETRIES + 1):
+            try:
+                # Очередь и Retry-After не должны пересидеть дедлайн вызова
+                self.throttle.acquire(None if deadline is None else deadline - time.monotonic())
+            except ThrottleDeadline as error:
+                raise DeadlineExceeded(f"{method} {path}: {error}") from None
+            try:
+                response = self._send(method, path, deadline, **kwargs)
+            except TRANSPORT_ERRORS:
+                self.throttle.record(None)
+                raise
+            self.throttle.record(response.status_code, response.headers.get("Retry-After"))
+            if response.status_code != 429 or attempt == MAX_429_RETRIES:
+                return response
+            response.close()
+
+    def _send(self, method: str, path: str, deadline: Optional[float] = None, **kwargs) -> requests.Response:
+        if deadline is not None:
+            kwargs["timeout"] = _cap_timeout(kwargs.get("timeout"), deadline - time.monotonic())
+        if not self.observers:
+            return self._perform(method, path, deadline, **kwargs)
+        started = time.perf_counter()
+        try:
+            response = self._perform(method, path, deadline, **kwargs)
+        except Exception:
+            self._notify(method, path, None, 0, time.perf_counter() - started)
+            raise
+        elapsed = time.perf_counter() - started
+        if kwargs.get("stream"):
+            size = int(response.headers.get("Content-Length") or 0)
+        else:
+            size = len(response.content)
+        self._notify(method, path, response.status_code, size, elapsed)
+        return response
+
+    def _perform(self, method: str, path: str, deadline: Optional[float], **kwargs) -> requests.Response:
+        if deadline is None or kwargs.get("stream"):
+            return self.session.request(method, self.url(path), **kwargs)
+        # Тело читается по мере поступления с проверкой дедлайна: таймаут чтения сработал бы только при полной паузе
+        response = self.session.request(method, self.url(path), stream=True, **kwargs)
+        chunks = []
+        try:
+            for chunk in _iter_available(response):
+                chunks.append(chunk)
+                if time.monotonic() > deadline:
+                    raise DeadlineExceeded(f"{method} {path}: тело ответа не получено за {self.deadline:g} с")
+        except Exception:
+            response.close()
+            raise
+        response._content = b"".join(chunks)
+        response._content_consumed = True
+        return response
+
+    def _notify(self, method: str, path: str, status: Optional[int], size: int, elapsed: float):
+        for observer in self.observers:
+            observer(method, path, status, size, elapsed)
+
+    def get(self, path: str, **kwargs) -> requests.Response:
+        return self.request("GET", path, **kwargs)
+
+    def post(self, path: str, **kwargs) -> requests.Response:
+        return self.request("POST", path, **kwargs)
+
+    def put(self, path: str, **kwargs) -> requests.Response:
+        return self.request("PUT", path, **kwargs)
+
+    def close(self):
+        self.session.close()
+        if self.throttle is not None:
+            self.throttle.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
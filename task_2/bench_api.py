@@ -0,0 +1,125 @@
+"""
+Микробенчмарки эндпоинтов API объявлений с проверкой регрессий.
+
+Запуск (файл не собирается по умолчанию, его нужно указать явно):
+    pytest bench_api.py --ads-target inprocess
+    pytest bench_api.py --bench-update-baseline          # записать базовые значения
+    pytest bench_api.py --bench-threshold 0.1            # падать при ухудшении > 10%
+    pytest bench_api.py --ads-snapshot ads.snap          # списки на объемах из снимка snapshot.py
+"""
+
+from typing import Dict
+
+import pytest
+
+from ads import build_ad_payload, create_ads_bulk
+from benchmarks import Baseline, BenchSession
+from waiting import has_at_least, wait_until
+
+
+LISTING_SIZES = (1, 100, 10_000)
+SEED_CONCURRENCY = 32
+
+
+@pytest.fixture(scope="session")
+def bench(request, ads_target, cassette_mode):
+    config = request.config
+    target = "replay" if cassette_mode[0] == "replay" else ads_target
+    session = BenchSession(
+        target,
+        Baseline(config.getoption("--bench-baseline")),
+        warmup=config.getoption("--bench-warmup"),
+        iterations=config.getoption("--bench-iterations"),
+        threshold=config.getoption("--bench-threshold"),
+        min_delta_ms=config.getoption("--bench-min-delta-ms"),
+        update=config.getoption("--bench-update-baseline"),
+    )
+    # Итоги печатаются в pytest_terminal_summary: вывод при завершении фикстуры перехватывается
+    config.pluginmanager.register(session, "ads_bench")
+    yield session
+    session.finish()
+
+
+@pytest.fixture(scope="module")
+def listing_sellers(request, api_client, seller_ids, ads_seed, ads_target, cassette_mode) -> Dict[int, int]:
+    """Продавцы с 1, 100 и 10 000 объявлений: размер списка -> sellerID"""
+    if ads_seed is not None:
+        seller_ids = seller_ids.keyed("bench_api.py::listing_sellers")
+    sellers = {}
+    for size in LISTING_SIZES:
+        seller_id = seller_ids.next()
+        if ads_target != "live" and cassette_mode[0] is None:
+            # В заглушке наполняем хранилище напрямую: 10 000 POST-запросов ничего не измеряют
+            store = request.getfixturevalue("stub_app").store
+            for index in range(size):
+                store.add(seller_id, f"Bench Ad {index}", 1000, {"likes": 0, "viewCount": 0, "contacts": 0})
+        else:
+            result = create_ads_bulk(api_client, seller_id, [{"name": f"Bench Ad {index}"} for index in range(size)],
+                                     concurrency=SEED_CONCURRENCY)
+            assert result.ok, f"Не удалось наполнить продавца {seller_id}: {result.failures[:3]}"
+            ads = wait_until(lambda: api_client.get(f"/{seller_id}/item").json(), has_at_least(size), timeout=60.0)
+            assert len(ads) >= size, f"Видно {len(ads)} из {size} объявлений продавца {seller_id}"
+        sellers[size] = seller_id
+    return sellers
+
+
+def _check(regressions):
+    if regressions:
+        pytest.fail("Регрессия производительности:\n" + "\n".join(regressions), pytrace=False)
+
+
+class TestEndpointBenchmarks:
+    """Задержки эндпоинтов против базового уровня"""
+
+    def test_bench_create(self, bench, api_client, test_seller_ids):
+        payload = build_ad_payload(test_seller_ids.next(), name="Bench Ad")
+
+        def create():
+            response = api_client.post("/item", json=payload)
+            assert response.status_code == 200
+
+        _check(bench.run("POST /item", create))
+
+    def test_bench_get_by_id(self, bench, api_client, ad_pool):
+        with ad_pool.lease() as ad:
+            item_id = ad["id"]
+
+            def get_by_id():
+                response = api_client.get(f"/item/{item_id}")
+                assert response.status_code == 200
+
+            _check(bench.run("GET /item/:id", get_by_id))
+
+    @pytest.mark.parametrize("size", LISTING_SIZES)
+    def test_bench_seller_listing(self, bench, api_client, listing_sellers, size):
+        seller_id = listing_sellers[size]
+
+        def listing():
+            response = api_client.get(f"/{seller_id}/item")
+            assert response.status_code == 200
+            assert len(response.json()) >= size
+
+        _check(bench.run(f"GET /:sellerID/item [{size}]", listing))
+
+    def test_bench_statistic(self, bench, api_client, ad_pool):
+        # Сотни чтений статистики меняют счетчики просмотров: объявление берется эксклюзивно
+        with ad_pool.lease(exclusive=True) as ad:
+            item_id = ad["id"]
+
+            def statistic():
+                response = api_client.get(f"/statistic/{item_id}")
+                assert response.status_code == 200
+
+            _check(bench.run("GET /statistic/:id", statistic))
+
+    def test_bench_snapshot_listing(self, bench, api_client, snapshot):
+        if snapshot is None or not len(snapshot):
+            pytest.skip("Нужен снимок объявлений: --ads-snapshot PATH (python snapshot.py PATH)")
+        seller_id, size = snapshot.largest(1)[0]
+
+        def listing():
+            response = api_client.get(f"/{seller_id}/item")
+            assert response.status_code == 200
+            assert len(response.json()) >= size
+
+        _check(bench.run(f"GET /:sellerID/item [snapshot {size}]", listing))
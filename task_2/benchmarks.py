@@ -0,0 +1,171 @@
+"""
+Микробенчмарки эндпоинтов: прогрев, серия измерений, сравнение с сохраненным
+базовым уровнем. Базовые значения хранятся в JSON отдельно для каждого режима
+(--ads-target), потому что задержки реального сервиса и заглушки несравнимы.
+"""
+
+import gc
+import json
+import os
+import statistics
+import time
+import warnings
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional
+
+
+DEFAULT_BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "bench_baseline.json")
+DEFAULT_WARMUP = 5
+DEFAULT_ITERATIONS = 100
+DEFAULT_THRESHOLD = 0.25
+# Разница меньше этой считается шумом измерения (важно для задержек меньше миллисекунды)
+DEFAULT_MIN_DELTA_MS = 1.0
+
+
+class BaselineMissing(UserWarning):
+    """Для бенчмарка нет базового значения: проверка регрессии не выполнялась"""
+
+
+def _percentile(sorted_values: List[float], percentile: float) -> float:
+    if not sorted_values:
+        return 0.0
+    rank = max(1, int(round(percentile / 100.0 * len(sorted_values))))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+@dataclass
+class BenchResult:
+    """Результат одного бенчмарка (миллисекунды)"""
+    name: str
+    samples_ms: List[float]
+
+    @property
+    def median_ms(self) -> float:
+        return statistics.median(self.samples_ms)
+
+    @property
+    def p99_ms(self) -> float:
+        return _percentile(sorted(self.samples_ms), 99)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "iterations": len(self.samples_ms),
+            "median_ms": round(self.median_ms, 3),
+            "p99_ms": round(self.p99_ms, 3),
+            "min_ms": round(min(self.samples_ms), 3),
+            "max_ms": round(max(self.samples_ms), 3),
+        }
+
+
+def measure(name: str, operation: Callable[[], Any], warmup: int = DEFAULT_WARMUP,
+            iterations: int = DEFAULT_ITERATIONS) -> BenchResult:
+    """
+    warmup прогонов без учета, затем iterations измеренных вызовов operation.
+    Сборщик мусора на время измерений отключается, как в timeit: паузы GC
+    иначе попадают в p99 случайным образом.
+    """
+    for _ in range(warmup):
+        operation()
+    samples = []
+    gc_was_enabled = gc.isenabled()
+    gc.collect()
+    gc.disable()
+    try:
+        for _ in range(iterations):
+            started = time.perf_counter()
+            operation()
+            samples.append((time.perf_counter() - started) * 1000)
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+    return BenchResult(name, samples)
+
+
+def find_regressions(current: Dict[str, Any], baseline: Dict[str, Any], threshold: float = DEFAULT_THRESHOLD,
+                     min_delta_ms: float = DEFAULT_MIN_DELTA_MS) -> List[str]:
+    """Метрики (median/p99), ухудшившиеся больше чем на threshold относительно базового уровня"""
+    regressions = []
+    for metric in ("median_ms", "p99_ms"):
+        base, value = baseline.get(metric), current.get(metric)
+        if base is None or value is None:
+            continue
+        if value > base * (1 + threshold) and value - base > min_delta_ms:
+            regressions.append(f"{metric}: {value:.3f} мс против базовых {base:.3f} мс "
+                               f"(+{(value / base - 1) * 100 if base else float('inf'):.0f}%, "
+                               f"порог {threshold * 100:.0f}%)")
+    return regressions
+
+
+class Baseline:
+    """Файл базовых значений: {режим: {бенчмарк: сводка}}"""
+
+    def __init__(self, path: str = DEFAULT_BASELINE_PATH):
+        self.path = path
+        self.data: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as file:
+                self.data = json.load(file)
+
+    def get(self, target: str, name: str) -> Optional[Dict[str, Any]]:
+        return self.data.get(target, {}).get(name)
+
+    def update(self, target: str, name: str, summary: Dict[str, Any]):
+        self.data.setdefault(target, {})[name] = summary
+
+    def save(self):
+        with open(self.path, "w", encoding="utf-8") as file:
+            json.dump(self.data, file, ensure_ascii=False, indent=2, sort_keys=True)
+            file.write("\n")
+
+
+class BenchSession:
+    """Прогон бенчмарков одной сессии pytest: измерение, сравнение, обновление базы"""
+
+    def __init__(self, target: str, baseline: Baseline, warmup: int = DEFAULT_WARMUP,
+                 iterations: int = DEFAULT_ITERATIONS, threshold: float = DEFAULT_THRESHOLD,
+                 min_delta_ms: float = DEFAULT_MIN_DELTA_MS, update: bool = False):
+        self.target = target
+        self.baseline = baseline
+        self.warmup = warmup
+        self.iterations = iterations
+        self.threshold = threshold
+        self.min_delta_ms = min_delta_ms
+        self.update = update
+        self.results: Dict[str, BenchResult] = {}
+        # Бенчмарки без базового значения: о них предупреждаем, а не молча считаем прошедшими
+        self.missing: List[str] = []
+
+    def run(self, name: str, operation: Callable[[], Any]) -> List[str]:
+        """
+        Измеряет operation; возвращает список регрессий (пустой, если обновляем базу).
+        Если базового значения нет, выдается предупреждение BaselineMissing.
+        """
+        result = measure(name, operation, self.warmup, self.iterations)
+        self.results[name] = result
+        summary = result.to_dict()
+        if self.update:
+            self.baseline.update(self.target, name, summary)
+            return []
+        base = self.baseline.get(self.target, name)
+        if base is None:
+            self.missing.append(name)
+            warnings.warn(BaselineMissing(f"{name}: нет базового значения для режима {self.target} в "
+                                          f"{self.baseline.path}; запишите его с --bench-update-baseline"))
+            return []
+        return find_regressions(summary, base, self.threshold, self.min_delta_ms)
+
+    def finish(self):
+        if self.update and self.results:
+            self.baseline.save()
+
+    def pytest_terminal_summary(self, terminalreporter):
+        if not self.results:
+            return
+        terminalreporter.write_sep("=", f"бенчмарки ({self.target})")
+        for name, result in self.results.items():
+            summary = result.to_dict()
+            terminalreporter.write_line(f"{name:<24} median {summary['median_ms']:>9.3f} мс   "
+                                        f"p99 {summary['p99_ms']:>9.3f} мс   n={summary['iterations']}")
+        if self.missing:
+            terminalreporter.write_line(f"Нет базовых значений (регрессия не проверялась): "
+                                        f"{', '.join(self.missing)}", yellow=True)
@@ -0,0 +1,171 @@
+"""
+Запись и воспроизведение HTTP-взаимодействий (кассеты).
+
+Кассета - файл JSON Lines, куда только дописываются строки: ключ запроса,
+статус, значимые заголовки и тело ответа. При воспроизведении файл один раз
+читается в словарь «ключ -> очередь ответов», поэтому поиск ответа - O(1)
+независимо от размера кассеты. Повторные одинаковые запросы (опрос списка,
+чтение счетчиков) получают ответы в записанном порядке; когда очередь
+заканчивается, повторяется последний ответ.
+
+Запись начинается с новой кассеты: повторная запись в тот же файл смешала бы
+ответы двух прогонов под одними ключами. Существующий файл перезаписывается
+только явно (start_cassette(..., overwrite=True)).
+"""
+
+import base64
+import hashlib
+import io
+import json
+import threading
+from typing import Dict, List, Optional
+
+from requests.adapters import BaseAdapter, HTTPAdapter
+from requests.exceptions import ConnectionError
+from urllib3 import HTTPResponse
+
+
+CASSETTE_VERSION = 1
+MODES = ("record", "replay")
+
+_KEPT_HEADERS = ("content-type", "etag", "allow", "retry-after", "cache-control")
+
+
+class CassetteMiss(ConnectionError):
+    """В кассете нет ответа для запроса"""
+
+
+def _canonical_body(body) -> bytes:
+    if body is None:
+        return b""
+    if isinstance(body, str):
+        body = body.encode("utf-8")
+    try:
+        # Порядок ключей JSON не должен влиять на ключ запроса
+        return json.dumps(json.loads(body), sort_keys=True, separators=(",", ":")).encode("utf-8")
+    except (UnicodeDecodeError, ValueError, RecursionError):
+        # Некорректное или слишком глубоко вложенное тело (TC-029) - ключ по исходным байтам
+        return body
+
+
+def request_key(method: str, path_url: str, body) -> str:
+    """Ключ запроса: метод, путь с query-строкой и нормализованное тело"""
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(method.upper().encode("ascii"))
+    digest.update(b"\0")
+    digest.update(path_url.encode("utf-8"))
+    digest.update(b"\0")
+    digest.update(_canonical_body(body))
+    return digest.hexdigest()
+
+
+def _encode_body(content: bytes) -> Dict[str, str]:
+    try:
+        return {"b": content.decode("utf-8")}
+    except UnicodeDecodeError:
+        return {"b64": base64.b64encode(content).decode("ascii")}
+
+
+def _decode_body(entry: Dict) -> bytes:
+    if "b64" in entry:
+        return base64.b64decode(entry["b64"])
+    return entry.get("b", "").encode("utf-8")
+
+
+def _build_response(adapter: HTTPAdapter, request, status: int, headers: Dict[str, str], body: bytes):
+    headers = dict(headers, **{"Content-Length": str(len(body))})
+    raw = HTTPResponse(body=io.BytesIO(body), headers=headers, status=status,
+                       preload_content=False, decode_content=False)
+    return adapter.build_response(request, raw)
+
+
+def start_cassette(path: str, overwrite: bool = False):
+    """
+    Новая кассета из одного заголовка. Существующий файл без overwrite не трогается
+    (FileExistsError): его ответы смешались бы с ответами нового прогона
+    """
+    with open(path, "w" if overwrite else "x", encoding="utf-8") as file:
+        file.write(json.dumps({"v": CASSETTE_VERSION}) + "\n")
+
+
+class RecordingAdapter(HTTPAdapter):
+    """
+    Транспорт-обертка: выполняет запрос через inner и дописывает ответ в кассету.
+    По умолчанию кассета создается заново (как start_cassette); append=True - дописывать
+    в кассету, начатую start_cassette (например, из нескольких воркеров xdist)
+    """
+
+    def __init__(self, inner: BaseAdapter, path: str, append: bool = False, overwrite: bool = False):
+        super().__init__()
+        self.inner = inner
+        self.path = path
+        self._lock = threading.Lock()
+        if not append:
+            start_cassette(path, overwrite)
+        self._file = open(path, "a", encoding="utf-8")
+
+    def send(self, request, **kwargs):
+        response = self.inner.send(request, **kwargs)
+        content = response.content
+        entry = {
+            "k": request_key(request.method, request.path_url, request.body),
+            "s": response.status_code,
+            "h": {name: value for name, value in response.headers.items() if name.lower() in _KEPT_HEADERS},
+        }
+        entry.update(_encode_body(content))
+        line = json.dumps(entry, ensure_ascii=False, separators=(",", ":")) + "\n"
+        with self._lock:
+            self._file.write(line)
+            self._file.flush()
+        return _build_response(self, request, response.status_code, entry["h"], content)
+
+    def close(self):
+        with self._lock:
+            if not self._file.closed:
+                self._file.close()
+        self.inner.close()
+
+
+class Cassette:
+    """Содержимое кассеты, проиндексированное по ключу запроса"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.index: Dict[str, List[Dict]] = {}
+        self._cursors: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        with open(path, encoding="utf-8") as file:
+            header = json.loads(file.readline() or "{}")
+            if header.get("v") != CASSETTE_VERSION:
+                raise ValueError(f"{path}: неподдерживаемая версия кассеты {header.get('v')!r}")
+            for line in file:
+                if line.strip():
+                    entry = json.loads(line)
+                    self.index.setdefault(entry["k"], []).append(entry)
+
+    def __len__(self) -> int:
+        return sum(len(entries) for entries in self.index.values())
+
+    def next_response(self, key: str) -> Optional[Dict]:
+        with self._lock:
+            entries = self.index.get(key)
+            if not entries:
+                return None
+            position = self._cursors.get(key, 0)
+            self._cursors[key] = position + 1
+            return entries[min(position, len(entries) - 1)]
+
+
+class ReplayAdapter(HTTPAdapter):
+    """Транспорт, отдающий ответы из кассеты без обращения к сети"""
+
+    def __init__(self, cassette: Cassette):
+        super().__init__()
+        self.cassette = cassette
+
+    def send(self, request, **kwargs):
+        entry = self.cassette.next_response(request_key(request.method, request.path_url, request.body))
+        if entry is None:
+            raise CassetteMiss(f"В кассете {self.cassette.path} нет ответа для {request.method} {request.path_url}",
+                               request=request)
+        return _build_response(self, request, entry["s"], entry["h"], _decode_body(entry))
@@ -0,0 +1,406 @@
+"""
+Общие фикстуры и параметры запуска для тестов API объявлений
+"""
+
+import os
+import random
+import uuid
+from typing import Dict, Optional
+
+import pytest
+
+from ad_pool import DEFAULT_POOL_ADS, AdPool
+from ads import SELLER_ID_MAX, SELLER_ID_MIN
+from api_client import DEFAULT_DEADLINE, DEFAULT_RETRIES, AdsApiClient, BASE_URL
+from benchmarks import (DEFAULT_BASELINE_PATH, DEFAULT_ITERATIONS, DEFAULT_MIN_DELTA_MS,
+                        DEFAULT_THRESHOLD, DEFAULT_WARMUP)
+from cassette import MODES as CASSETTE_MODES, Cassette, RecordingAdapter, ReplayAdapter, start_cassette
+from fault_proxy import FaultProxy, Faults
+from instrumentation import DEFAULT_SLOWEST, PLUGIN_NAME, LatencyReportPlugin
+from lag_profile import LISTING, LagProfileError, load_deadlines
+from scheduling import (DEFAULT_CHEAP_SECONDS, DEFAULT_HISTORY_FILE, MODES as SCHEDULE_MODES,
+                        PLUGIN_NAME as SCHEDULE_PLUGIN_NAME, SchedulePlugin)
+from response_cache import DEFAULT_TTL, ResponseCache
+from seller_ids import SellerIdAllocator, free_range
+from snapshot import Snapshot, SnapshotError
+from stub_server import AdsStore, AdsStubApp, InProcessAdapter, INPROCESS_BASE_URL, StubServer
+from throttling import (DEFAULT_BREAKER_COOLDOWN, DEFAULT_BREAKER_THRESHOLD, DEFAULT_LIVE_RATE, SharedThrottle,
+                        default_state_path, remove_run_state)
+from waiting import DEFAULT_TIMEOUT
+
+
+TARGETS = ("live", "local", "inprocess")
+CACHE_KEY = pytest.StashKey[ResponseCache]()
+# Идентификатор прогона для файла состояния лимита и выключателя; воркеры получают его от главного процесса
+THROTTLE_RUN_KEY = pytest.StashKey[str]()
+THROTTLE_RUN_INPUT = "ads_throttle_run"
+
+
+def pytest_addoption(parser):
+    group = parser.getgroup("ads", "API объявлений")
+    group.addoption("--ads-target", choices=TARGETS, default=None,
+                    help="Куда отправлять запросы: live - реальный сервис, local - HTTP-заглушка "
+                         "на эфемерном порту, inprocess - заглушка без сокетов (ADS_API_TARGET)")
+    group.addoption("--ads-base-url", default=None,
+                    help=f"Base URL API для режима live (по умолчанию {BASE_URL})")
+    group.addoption("--ads-pool-size", type=int, default=None,
+                    help="Размер пула keep-alive соединений (ADS_API_POOL_SIZE)")
+    group.addoption("--ads-connect-timeout", type=float, default=None,
+                    help="Таймаут установки соединения, сек (ADS_API_CONNECT_TIMEOUT)")
+    group.addoption("--ads-read-timeout", type=float, default=None,
+                    help="Таймаут чтения ответа, сек (ADS_API_READ_TIMEOUT)")
+    group.addoption("--ads-deadline", type=float, default=None,
+                    help=f"Общий дедлайн HTTP-вызова вместе с повторами и чтением тела, сек "
+                         f"(ADS_API_DEADLINE, по умолчанию {DEFAULT_DEADLINE:g}; 0 - без дедлайна)")
+    group.addoption("--ads-retries", type=int, default=None,
+                    help=f"Повторы GET после обрыва соединения или 502/503/504 "
+                         f"(ADS_API_RETRIES, по умолчанию {DEFAULT_RETRIES})")
+    group.addoption("--ads-faults", default=None,
+                    help="Только для --ads-target local: пропускать запросы через прокси со сбоями, "
+                         "например \"latency=0.05,bandwidth=50000,drop=0.05\" (см. fault_proxy.py)")
+    group.addoption("--ads-cache", type=int, default=None,
+                    help="Кэш ответов GET /item/:id и GET /:sellerID/item на N записей с проверкой по ETag "
+                         "(ADS_API_CACHE; по умолчанию выключен)")
+    group.addoption("--ads-cache-ttl", type=float, default=None,
+                    help=f"Сколько секунд отдавать из кэша ответ без ETag, не обращаясь к серверу "
+                         f"(ADS_API_CACHE_TTL, по умолчанию {DEFAULT_TTL:g})")
+    group.addoption("--ads-cache-statistic", action="store_true",
+                    help="Кэшировать и GET /statistic/:id (счетчики; по умолчанию не кэшируются)")
+    group.addoption("--ads-rate-limit", type=float, default=None,
+                    help=f"Не больше N запросов в секунду суммарно по всем воркерам (ADS_API_RATE_LIMIT); "
+                         f"по умолчанию {DEFAULT_LIVE_RATE:g} для live и без ограничения для заглушки, 0 - выключить")
+    group.addoption("--ads-breaker-threshold", type=int, default=DEFAULT_BREAKER_THRESHOLD,
+                    help="После стольких ошибок подряд (5xx, таймауты) запросы сразу завершаются ошибкой")
+    group.addoption("--ads-breaker-cooldown", type=float, default=DEFAULT_BREAKER_COOLDOWN,
+                    help="Сколько секунд выключатель остается открытым до пробного запроса")
+    group.addoption("--ads-cassette", default=None,
+                    help="Файл кассеты для записи/воспроизведения HTTP-взаимодействий (ADS_CASSETTE)")
+    group.addoption("--ads-cassette-mode", choices=CASSETTE_MODES, default=None,
+                    help="record - записывать ответы в кассету, replay - отвечать из кассеты "
+                         "без сети (ADS_CASSETTE_MODE)")
+    group.addoption("--ads-cassette-overwrite", action="store_true",
+                    help="Перезаписать существующую кассету при record (по умолчанию запись в нее запрещена)")
+    group.addoption("--ads-seed", default=None,
+                    help="Зерно для случайных данных тестов (ADS_SEED); "
+                         "в режиме кассеты по умолчанию фиксированное")
+    group.addoption("--ads-heavy", action="store_true",
+                    help="Запускать против реального сервиса тесты с отметкой heavy "
+                         "(сотни запросов и создание объявлений; или ADS_HEAVY=1)")
+    group.addoption("--ads-pool-ads", type=int, default=DEFAULT_POOL_ADS,
+                    help="Сколько объявлений заранее создать для тестов только на чтение")
+    group.addoption("--ads-lag-profile", default=None,
+                    help="Отчет lag_profile.py --json: дедлайны ожидания видимости объявлений "
+                         "по эндпоинтам вместо фиксированных (или ADS_LAG_PROFILE)")
+    group.addoption("--ads-snapshot", default=None,
+                    help="Файл snapshot.py: заглушка дополнительно отдает объявления снимка "
+                         "(только local и inprocess; или ADS_SNAPSHOT)")
+    group.addoption("--ads-latency-report", default=None,
+                    help="Сохранить JSON-отчет с перцентилями задержек по эндпоинтам в этот файл "
+                         "(по умолчанию не сохраняется)")
+    group.addoption("--ads-slowest", type=int, default=DEFAULT_SLOWEST,
+                    help="Сколько самых медленных HTTP-вызовов показать в итогах")
+    group.addoption("--ads-durations", default=None,
+                    help=f"Файл истории длительностей тестов (по умолчанию {DEFAULT_HISTORY_FILE} "
+                         f"в rootdir); пустая строка - не сохранять")
+    group.addoption("--ads-schedule", choices=SCHEDULE_MODES, default="none",
+                    help="duration - сначала долгие тесты по истории, дешевые тесты пачкой, с --dist loadgroup "
+                         "раскладка по воркерам LPT; file - порядок файлов с записью истории и отчетом "
+                         "о критическом пути; none (по умолчанию) - без планирования")
+    group.addoption("--ads-cheap-ms", type=float, default=DEFAULT_CHEAP_SECONDS * 1000,
+                    help="Тесты быстрее порога (мс) объединяются в пачку")
+
+    bench = parser.getgroup("ads-bench", "Бенчмарки API объявлений (bench_api.py)")
+    bench.addoption("--bench-warmup", type=int, default=DEFAULT_WARMUP,
+                    help="Прогревочных вызовов перед измерением")
+    bench.addoption("--bench-iterations", type=int, default=DEFAULT_ITERATIONS,
+                    help="Измеряемых вызовов на бенчмарк")
+    bench.addoption("--bench-threshold", type=float, default=DEFAULT_THRESHOLD,
+                    help="Допустимое ухудшение median/p99 относительно базы (0.25 = 25%%)")
+    bench.addoption("--bench-min-delta-ms", type=float, default=DEFAULT_MIN_DELTA_MS,
+                    help="Разница меньше этой (мс) считается шумом и не является регрессией")
+    bench.addoption("--bench-baseline", default=DEFAULT_BASELINE_PATH,
+                    help="Файл базовых значений")
+    bench.addoption("--bench-update-baseline", action="store_true",
+                    help="Записать результаты как новые базовые значения вместо сравнения")
+
+
+def pytest_configure(config):
+    config.addinivalue_line("markers", "heavy: сотни запросов к общему стенду; против live - только с --ads-heavy")
+    config.pluginmanager.register(
+        LatencyReportPlugin(config.getoption("--ads-latency-report"), config.getoption("--ads-slowest")),
+        PLUGIN_NAME,
+    )
+    workerinput = getattr(config, "workerinput", None)
+    config.stash[THROTTLE_RUN_KEY] = workerinput[THROTTLE_RUN_INPUT] if workerinput else uuid.uuid4().hex
+    cassette_mode = config.getoption("--ads-cassette-mode") or os.environ.get("ADS_CASSETTE_MODE")
+    cassette_path = config.getoption("--ads-cassette") or os.environ.get("ADS_CASSETTE")
+    if cassette_mode == "record" and cassette_path and not hasattr(config, "workerinput"):
+        # Кассета создается один раз на прогон (в главном процессе), воркеры xdist дописывают в нее
+        try:
+            start_cassette(cassette_path, overwrite=config.getoption("--ads-cassette-overwrite"))
+        except FileExistsError:
+            raise pytest.UsageError(f"Кассета {cassette_path} уже существует: повторная запись смешала бы "
+                                    f"ответы двух прогонов; удалите файл или добавьте --ads-cassette-overwrite")
+    schedule = config.getoption("--ads-schedule")
+    if schedule == "duration" and cassette_mode:
+        # Кассета записывается и воспроизводится в порядке файлов, а не по истории прошлых прогонов
+        schedule = "file"
+    if schedule != "none":
+        durations = config.getoption("--ads-durations")
+        if durations is None:
+            durations = os.path.join(str(config.rootpath), DEFAULT_HISTORY_FILE)
+        config.pluginmanager.register(
+            SchedulePlugin(durations or None, schedule, config.getoption("--ads-cheap-ms") / 1000),
+            SCHEDULE_PLUGIN_NAME,
+        )
+
+
+@pytest.hookimpl(optionalhook=True)
+def pytest_configure_node(node):
+    """xdist: воркеры делят состояние лимита и выключателя главного процесса"""
+    node.workerinput[THROTTLE_RUN_INPUT] = node.config.stash[THROTTLE_RUN_KEY]
+
+
+def pytest_unconfigure(config):
+    if not hasattr(config, "workerinput") and THROTTLE_RUN_KEY in config.stash:
+        remove_run_state(config.stash[THROTTLE_RUN_KEY])
+
+
+def pytest_terminal_summary(terminalreporter, config):
+    cache = config.stash.get(CACHE_KEY, None)
+    if cache is not None:
+        terminalreporter.write_line(cache.stats.format())
+
+
+@pytest.fixture(scope="session")
+def ads_target(request) -> str:
+    """Выбранный режим: live, local или inprocess"""
+    target = request.config.getoption("--ads-target") or os.environ.get("ADS_API_TARGET", "live")
+    if target not in TARGETS:
+        raise pytest.UsageError(f"ADS_API_TARGET должен быть одним из {TARGETS}, получено {target!r}")
+    return target
+
+
+@pytest.fixture(scope="session")
+def cassette_mode(request):
+    """(режим, путь) кассеты или (None, None), если кассета не используется"""
+    mode = request.config.getoption("--ads-cassette-mode") or os.environ.get("ADS_CASSETTE_MODE")
+    path = request.config.getoption("--ads-cassette") or os.environ.get("ADS_CASSETTE")
+    if not mode:
+        return None, None
+    if mode not in CASSETTE_MODES or not path:
+        raise pytest.UsageError("Для режима кассеты нужны --ads-cassette-mode record|replay и --ads-cassette PATH")
+    return mode, path
+
+
+@pytest.fixture(scope="session")
+def ads_seed(request, cassette_mode):
+    """
+    Зерно случайных данных. Для записи и воспроизведения кассеты sellerID и
+    случайные id должны совпадать между запусками, поэтому зерно фиксируется.
+    """
+    seed = request.config.getoption("--ads-seed") or os.environ.get("ADS_SEED")
+    if seed is None and cassette_mode[0] is not None:
+        seed = "cassette"
+    return seed
+
+
+def _node_key(node) -> str:
+    """Ключ теста или модуля, не зависящий от rootdir: имя файла и путь внутри него"""
+    return f"{node.path.name}::{node.nodeid.split('::', 1)[-1]}"
+
+
+@pytest.fixture(autouse=True)
+def _skip_heavy(request):
+    """Тяжелые тесты не нагружают общий стенд без явного --ads-heavy"""
+    if request.node.get_closest_marker("heavy") is None:
+        return
+    opted_in = request.config.getoption("--ads-heavy") or os.environ.get("ADS_HEAVY") == "1"
+    if request.getfixturevalue("ads_target") == "live" and not opted_in:
+        pytest.skip("тяжелый тест против общего стенда: включается --ads-heavy")
+
+
+@pytest.fixture(autouse=True)
+def _seed_random(request, ads_seed):
+    """Детерминированный random для каждого теста, если задано зерно"""
+    if ads_seed is not None:
+        random.seed(f"{ads_seed}:{_node_key(request.node)}")
+
+
+@pytest.fixture(scope="session")
+def snapshot(request, ads_target) -> Optional[Snapshot]:
+    """Снимок заранее сгенерированных объявлений для заглушки или None"""
+    path = request.config.getoption("--ads-snapshot") or os.environ.get("ADS_SNAPSHOT")
+    if not path:
+        return None
+    if ads_target == "live":
+        raise pytest.UsageError("--ads-snapshot работает только с --ads-target local или inprocess")
+    try:
+        loaded = Snapshot.open(path)
+    except (OSError, SnapshotError) as error:
+        raise pytest.UsageError(f"--ads-snapshot: {error}")
+    request.addfinalizer(loaded.close)
+    return loaded
+
+
+@pytest.fixture(scope="session")
+def stub_app(snapshot) -> AdsStubApp:
+    """Приложение-заглушка API объявлений, общее для сессии"""
+    return AdsStubApp(AdsStore(snapshot=snapshot))
+
+
+@pytest.fixture(scope="session")
+def stub_server(stub_app):
+    """HTTP-заглушка на 127.0.0.1 и эфемерном порту"""
+    with StubServer(stub_app) as server:
+        yield server
+
+
+@pytest.fixture
+def fault_stub_server():
+    """Отдельная пустая HTTP-заглушка для прокси на каждый тест: не зависит от --ads-target,
+    --ads-snapshot и от объявлений, созданных другими тестами"""
+    with StubServer() as server:
+        yield server
+
+
+@pytest.fixture
+def fault_proxy(fault_stub_server):
+    """Прокси со сбоями перед HTTP-заглушкой; сбои задаются fault_proxy.configure(...)"""
+    with FaultProxy(fault_stub_server.base_url) as proxy:
+        yield proxy
+
+
+@pytest.fixture(scope="session")
+def api_client(request, ads_target, cassette_mode):
+    """Один клиент с пулом соединений на всю сессию тестов"""
+    config = request.config
+    mode, cassette_path = cassette_mode
+    transport = None
+    if config.getoption("--ads-faults") and (ads_target != "local" or mode == "replay"):
+        raise pytest.UsageError("--ads-faults работает только с --ads-target local")
+    if mode == "replay":
+        base_url = config.getoption("--ads-base-url") or BASE_URL
+        transport = ReplayAdapter(Cassette(cassette_path))
+    elif ads_target == "local":
+        base_url = request.getfixturevalue("stub_server").base_url
+        faults = config.getoption("--ads-faults")
+        if faults:
+            # Весь прогон через прокси со сбоями: проверка того, что время набора ограничено
+            try:
+                proxy = FaultProxy(base_url, Faults.parse(faults)).start()
+            except (TypeError, ValueError) as error:
+                raise pytest.UsageError(f"--ads-faults: {error}")
+            request.addfinalizer(proxy.stop)
+            base_url = proxy.url
+    elif ads_target == "inprocess":
+        base_url = INPROCESS_BASE_URL
+        transport = InProcessAdapter(request.getfixturevalue("stub_app"))
+    else:
+        base_url = config.getoption("--ads-base-url") or BASE_URL
+    cache = None
+    cache_size = config.getoption("--ads-cache")
+    if cache_size is None:
+        cache_size = int(os.environ.get("ADS_API_CACHE") or 0)
+    if cache_size:
+        if mode is not None:
+            # Ключ кассеты не учитывает If-None-Match: записанные 304 нельзя воспроизвести
+            raise pytest.UsageError("--ads-cache несовместим с кассетами")
+        ttl = config.getoption("--ads-cache-ttl")
+        if ttl is None:
+            ttl = float(os.environ.get("ADS_API_CACHE_TTL") or DEFAULT_TTL)
+        cache = ResponseCache(cache_size, ttl=ttl, include_statistic=config.getoption("--ads-cache-statistic"))
+    rate = config.getoption("--ads-rate-limit")
+    if rate is None:
+        rate = float(os.environ.get("ADS_API_RATE_LIMIT") or (DEFAULT_LIVE_RATE if ads_target == "live" else 0))
+    throttle = None
+    if mode != "replay" and (rate or ads_target == "live"):
+        # Состояние в файле, общем для воркеров xdist этого прогона, работающих с этим base_url
+        state_path = default_state_path(base_url, config.stash[THROTTLE_RUN_KEY])
+        throttle = SharedThrottle(state_path, rate=rate or None,
+                                  threshold=config.getoption("--ads-breaker-threshold"),
+                                  cooldown=config.getoption("--ads-breaker-cooldown"))
+    client = AdsApiClient(
+        base_url=base_url,
+        pool_size=config.getoption("--ads-pool-size"),
+        connect_timeout=config.getoption("--ads-connect-timeout"),
+        read_timeout=config.getoption("--ads-read-timeout"),
+        deadline=config.getoption("--ads-deadline"),
+        retries=config.getoption("--ads-retries"),
+        transport=transport,
+        throttle=throttle,
+        cache=cache,
+    )
+    if mode == "record":
+        client.session.mount(client.base_url,
+                             RecordingAdapter(client.session.get_adapter(client.base_url), cassette_path,
+                                              append=True))
+    latency_plugin = config.pluginmanager.get_plugin(PLUGIN_NAME)
+    if latency_plugin is not None:
+        client.observers.append(latency_plugin.recorder)
+    if cache is not None:
+        config.stash[CACHE_KEY] = cache
+    yield client
+    client.close()
+
+
+@pytest.fixture(scope="session")
+def seller_ids(api_client, ads_seed, snapshot) -> SellerIdAllocator:
+    """
+    Выдача sellerID из среза текущего воркера xdist.
+    Один запрос списка объявлений на блок sellerID, а не на каждый тест.
+    """
+    def is_busy(seller_id: int) -> bool:
+        response = api_client.get(f"/{seller_id}/item")
+        return response.status_code == 200 and bool(response.json())
+
+    low, high = SELLER_ID_MIN, SELLER_ID_MAX
+    try:
+        if snapshot is not None and len(snapshot):
+            # Тестам - больший свободный участок ниже или выше продавцов снимка
+            low, high = free_range(snapshot.seller_range)
+        return SellerIdAllocator.from_environment(probe=is_busy, nonce=ads_seed, low=low, high=high)
+    except ValueError as error:
+        raise pytest.UsageError(f"--ads-snapshot: {error}")
+
+
+@pytest.fixture
+def test_seller_ids(request, seller_ids, ads_seed) -> SellerIdAllocator:
+    """
+    sellerID для текущего теста. С зерном (и в режиме кассеты) они зависят только от зерна
+    и теста, поэтому записанный тест воспроизводится отдельно и в любом порядке;
+    без зерна - общий аллокатор воркера.
+    """
+    if ads_seed is None:
+        return seller_ids
+    return seller_ids.keyed(_node_key(request.node))
+
+
+@pytest.fixture(scope="session")
+def wait_timeouts(request) -> Dict[str, float]:
+    """
+    Дедлайны ожидания видимости по эндпоинтам ("GET /:sellerID/item" -> секунды)
+    из профиля задержек; пустой словарь - используются значения по умолчанию
+    """
+    path = request.config.getoption("--ads-lag-profile") or os.environ.get("ADS_LAG_PROFILE")
+    if not path:
+        return {}
+    try:
+        return load_deadlines(path)
+    except LagProfileError as error:
+        raise pytest.UsageError(str(error))
+
+
+@pytest.fixture(scope="session")
+def ad_pool(request, api_client, seller_ids, ads_seed, wait_timeouts) -> AdPool:
+    """
+    Пул заранее созданных и уже видимых объявлений для тестов, которым нужен
+    существующий item_id. Создается один раз на сессию (на воркер xdist).
+    """
+    if ads_seed is not None:
+        # Продавец пула не должен зависеть от того, сколько sellerID выдано до первого теста с пулом
+        seller_id = seller_ids.keyed(f"ad_pool:{os.environ.get('PYTEST_XDIST_WORKER', 'gw0')}").next()
+    else:
+        seller_id = seller_ids.next()
+    return AdPool(api_client, seller_id, size=request.config.getoption("--ads-pool-ads"),
+                  timeout=wait_timeouts.get(LISTING, DEFAULT_TIMEOUT)).fill()
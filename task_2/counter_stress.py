@@ -0,0 +1,391 @@
+"""
+Нагрузочная проверка корректности счетчика статистики одного объявления.
+
+На каждом уровне конкуренции (число одновременных потоков) отправляется смесь
+GET /statistic/:id к одному объявлению и POST /item тому же продавцу. По итогам уровня
+проверяется:
+- потерянные обновления: если каждый запрос статистики увеличивает viewCount на
+  increment, то разница между двумя контрольными чтениями до и после уровня
+  равна (успешных чтений + 1) * increment; меньше - обновления потеряны, больше -
+  лишние. При increment > 0 у двух чтений не может быть одинакового значения;
+- немонотонные чтения: чтение, начатое после завершения другого, не может
+  вернуть меньшее значение (проверка по интервалам [start, end] всех чтений);
+- деградация задержки: p99 чтения на уровне относительно первого уровня.
+
+Результат - кривая «конкуренция -> пропускная способность и задержка».
+С increment=None значение счетчика не предсказывается, проверяется только монотонность.
+
+Чтения статистики отправляются без повторов клиента (retries=0): повторенный GET мог
+увеличить счетчик дважды, а учтен был бы один раз. Каждая неудачная попытка - ошибка чтения,
+ответ 200 не в формате статистики - тоже.
+
+Потоки, а не процессы: запросы отпускают GIL на вводе-выводе, а пул соединений
+клиента общий. Если пул меньше уровня конкуренции, в задержку попадает и ожидание
+свободного соединения на стороне клиента.
+
+Запуск:
+    python counter_stress.py --local                     # заглушка, считающая просмотры
+    python counter_stress.py --levels 1,4,16 --operations 200 --increment none
+"""
+
+import argparse
+import bisect
+import json
+import random
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import requests
+
+from ads import build_ad_payload, parse_item_id
+from api_client import BASE_URL, AdsApiClient
+from latency import LatencyHistogram
+from seller_ids import SellerIdAllocator
+from waiting import wait_until
+
+
+COUNTER = "viewCount"
+DEFAULT_LEVELS = (1, 2, 4, 8, 16, 32, 64)
+DEFAULT_OPERATIONS = 500
+DEFAULT_CREATE_RATIO = 0.1
+# Ожидание TC-022: каждый запрос статистики - это просмотр
+DEFAULT_INCREMENT = 1
+# Во сколько раз p99 чтения может вырасти относительно первого уровня
+DEFAULT_DEGRADATION = 5.0
+DEFAULT_REPORTED = 5
+# Попыток контрольного чтения счетчика до и после уровня
+CONTROL_ATTEMPTS = 5
+DEFAULT_SEED = "counter-stress"
+
+READ = "read"
+CREATE = "create"
+
+
+class CounterStressError(RuntimeError):
+    """Не удалось подготовить объявление или прочитать счетчик"""
+
+
+@dataclass
+class Read:
+    """Успешное чтение счетчика: моменты отправки и ответа (perf_counter) и значение"""
+    start: float
+    end: float
+    value: int
+
+
+def _get_statistic(client: AdsApiClient, item_id: str) -> requests.Response:
+    """Одна попытка чтения статистики: без повторов клиента и мимо кэша ответов"""
+    return client.get(f"/statistic/{item_id}", retries=0, cache=False)
+
+
+def _counter_value(response: requests.Response) -> Optional[int]:
+    """viewCount из ответа 200; None - ошибка или ответ не в формате статистики"""
+    if response.status_code != 200:
+        return None
+    try:
+        data = response.json()
+    except ValueError:
+        return None
+    if not isinstance(data, list) or not data or not isinstance(data[0], dict):
+        return None
+    value = data[0].get(COUNTER)
+    return value if type(value) is int else None
+
+
+def read_counter(client: AdsApiClient, item_id: str, attempts: int = CONTROL_ATTEMPTS) -> Tuple[int, int]:
+    """
+    Контрольное чтение: значение счетчика и число неудачных попыток перед ним.
+    Неудачная попытка могла увеличить счетчик, поэтому вызывающий учитывает их как ошибки чтения.
+    """
+    problem = ""
+    for failed in range(attempts):
+        try:
+            response = _get_statistic(client, item_id)
+        except Exception as error:
+            problem = f"{type(error).__name__}: {error}"
+            continue
+        value = _counter_value(response)
+        if value is not None:
+            return value, failed
+        problem = f"статус {response.status_code}, ответ {response.text[:200]}"
+    raise CounterStressError(f"GET /statistic/{item_id}: {attempts} неудачных попыток, последняя - {problem}")
+
+
+def find_non_monotonic(reads: Sequence[Read]) -> List[Tuple[Read, Read]]:
+    """
+    Пары (раньше завершенное чтение, позже начатое чтение с меньшим значением).
+    Для каждого чтения берется максимум среди чтений, завершенных до его начала.
+    """
+    by_end = sorted(reads, key=lambda read: read.end)
+    ends = [read.end for read in by_end]
+    # prefix[i] - чтение с наибольшим значением среди by_end[:i + 1]
+    prefix: List[Read] = []
+    for read in by_end:
+        prefix.append(read if not prefix or read.value > prefix[-1].value else prefix[-1])
+    pairs = []
+    for read in reads:
+        finished = bisect.bisect_left(ends, read.start)
+        if finished and prefix[finished - 1].value > read.value:
+            pairs.append((prefix[finished - 1], read))
+    return pairs
+
+
+@dataclass
+class LevelResult:
+    """Итог одного уровня конкуренции"""
+    concurrency: int
+    before: int
+    after: int
+    reads: List[Read] = field(default_factory=list)
+    read_latency: LatencyHistogram = field(default_factory=LatencyHistogram)
+    create_latency: LatencyHistogram = field(default_factory=LatencyHistogram)
+    read_errors: int = 0
+    create_errors: int = 0
+    elapsed: float = 0.0
+
+    @property
+    def operations(self) -> int:
+        return self.read_latency.count + self.create_latency.count
+
+    @property
+    def throughput(self) -> float:
+        return self.operations / self.elapsed if self.elapsed else 0.0
+
+    def unaccounted(self, increment: Optional[int]) -> int:
+        """
+        Расхождение счетчика в обновлениях: < 0 - потерянные, > 0 - лишние, 0 - сходится.
+        Ровно одно из двух контрольных чтений учитывает собственное увеличение, отсюда + 1;
+        чтения с ошибкой могли как увеличить счетчик, так и нет.
+        """
+        if not increment:
+            return 0
+        delta = (self.after - self.before) // increment
+        low = len(self.reads) + 1
+        high = low + self.read_errors
+        return delta - low if delta < low else max(0, delta - high)
+
+    def duplicates(self, increment: Optional[int]) -> int:
+        """Чтения с уже виденным значением: при увеличении на каждом чтении их быть не может"""
+        if not increment:
+            return 0
+        return len(self.reads) - len({read.value for read in self.reads})
+
+    def non_monotonic(self) -> List[Tuple[Read, Read]]:
+        pairs = find_non_monotonic(self.reads)
+        # Контрольные чтения ограничивают все значения уровня
+        pairs += [(Read(0.0, 0.0, self.before), read) for read in self.reads if read.value < self.before]
+        pairs += [(read, Read(0.0, 0.0, self.after)) for read in self.reads if read.value > self.after]
+        return pairs
+
+
+@dataclass
+class StressReport:
+    """Кривая конкуренции и найденные нарушения"""
+    item_id: str
+    levels: List[LevelResult] = field(default_factory=list)
+    increment: Optional[int] = DEFAULT_INCREMENT
+    degradation: float = DEFAULT_DEGRADATION
+
+    def slowdown(self, level: LevelResult) -> float:
+        """p99 чтения относительно первого уровня"""
+        baseline = self.levels[0].read_latency.percentile_us(99.0) if self.levels else 0
+        return level.read_latency.percentile_us(99.0) / baseline if baseline else 0.0
+
+    def violations(self) -> List[str]:
+        """Нарушения корректности счетчика (задержка сюда не входит)"""
+        problems = []
+        for level in self.levels:
+            prefix = f"конкуренция {level.concurrency}"
+            unaccounted = level.unaccounted(self.increment)
+            if unaccounted < 0:
+                problems.append(f"{prefix}: потеряно обновлений {-unaccounted} "
+                                f"({COUNTER} {level.before} -> {level.after}, чтений {len(level.reads)})")
+            elif unaccounted > 0:
+                problems.append(f"{prefix}: лишних обновлений {unaccounted}")
+            duplicates = level.duplicates(self.increment)
+            if duplicates:
+                problems.append(f"{prefix}: повторных значений {COUNTER}: {duplicates}")
+            pairs = level.non_monotonic()
+            if pairs:
+                earlier, later = pairs[0]
+                problems.append(f"{prefix}: немонотонных чтений {len(pairs)}, например {earlier.value} -> {later.value}")
+        return problems
+
+    def degraded(self) -> List[LevelResult]:
+        return [level for level in self.levels if self.slowdown(level) > self.degradation]
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "item_id": self.item_id,
+            "increment": self.increment,
+            "curve": [{"concurrency": level.concurrency,
+                       "operations": level.operations,
+                       "throughput_rps": round(level.throughput, 1),
+                       "read": level.read_latency.summary(),
+                       "create": level.create_latency.summary(),
+                       "errors": {"read": level.read_errors, "create": level.create_errors},
+                       "slowdown": round(self.slowdown(level), 2),
+                       "counter": {"before": level.before, "after": level.after,
+                                   "unaccounted": level.unaccounted(self.increment),
+                                   "duplicates": level.duplicates(self.increment),
+                                   "non_monotonic": len(level.non_monotonic())}}
+                      for level in self.levels],
+            "violations": self.violations(),
+            "degraded": [level.concurrency for level in self.degraded()],
+        }
+
+    def format(self, limit: int = DEFAULT_REPORTED) -> str:
+        lines = [f"Объявление {self.item_id}, ожидаемое увеличение {COUNTER} на чтение: "
+                 f"{'не проверяется' if self.increment is None else self.increment}",
+                 f"{'потоков':>7}  {'запр/с':>8}  {'p50 чтения':>11}  {'p99 чтения':>11}  "
+                 f"{'p99 создания':>13}  {'рост p99':>8}  {'ошибок':>6}"]
+        for level in self.levels:
+            slowdown = self.slowdown(level)
+            mark = "  !" if slowdown > self.degradation else ""
+            lines.append(f"{level.concurrency:>7}  {level.throughput:>8.0f}  "
+                         f"{level.read_latency.percentile_ms(50.0):>8.2f} мс  "
+                         f"{level.read_latency.percentile_ms(99.0):>8.2f} мс  "
+                         f"{level.create_latency.percentile_ms(99.0):>10.2f} мс  "
+                         f"{slowdown:>7.1f}x  {level.read_errors + level.create_errors:>6}{mark}")
+        violations = self.violations()
+        lines.append(f"Нарушений корректности счетчика: {len(violations)}")
+        lines.extend(f"  {problem}" for problem in violations[:limit])
+        if len(violations) > limit:
+            lines.append(f"  ... и еще {len(violations) - limit}")
+        degraded = self.degraded()
+        if degraded:
+            lines.append(f"p99 чтения выросла больше чем в {self.degradation:g} раз при конкуренции: "
+                         + ", ".join(str(level.concurrency) for level in degraded))
+        return "\n".join(lines)
+
+
+def prepare_item(client: AdsApiClient, seller_id: int, timeout: float = 20.0) -> str:
+    """Создает объявление со счетчиками 0 и дожидается его статистики"""
+    response = client.post("/item", json=build_ad_payload(seller_id, name="Counter Stress"))
+    item_id = parse_item_id(response.json().get("status")) if response.status_code == 200 else None
+    if item_id is None:
+        raise CounterStressError(f"POST /item: статус {response.status_code}")
+    status = wait_until(lambda: client.get(f"/statistic/{item_id}").status_code, lambda code: code == 200,
+                        timeout=timeout)
+    if status != 200:
+        raise CounterStressError(f"Статистика объявления {item_id} недоступна за {timeout} с")
+    return item_id
+
+
+def run_level(client: AdsApiClient, item_id: str, seller_id: int, concurrency: int,
+              operations: int = DEFAULT_OPERATIONS, create_ratio: float = DEFAULT_CREATE_RATIO,
+              rng: Optional[random.Random] = None) -> LevelResult:
+    """Один уровень: operations запросов из concurrency потоков между двумя контрольными чтениями"""
+    rng = rng or random.Random(DEFAULT_SEED)
+    kinds = [CREATE if rng.random() < create_ratio else READ for _ in range(operations)]
+    payload = build_ad_payload(seller_id, name="Counter Stress Noise")
+    # Неудачные попытки до первого контрольного чтения уже учтены в его значении
+    result = LevelResult(concurrency, before=read_counter(client, item_id)[0], after=0)
+
+    def one(kind: str):
+        start = time.perf_counter()
+        try:
+            if kind == READ:
+                response = _get_statistic(client, item_id)
+            else:
+                response = client.post("/item", json=payload)
+        except Exception:
+            return kind, start, time.perf_counter(), None
+        end = time.perf_counter()
+        value = None
+        if kind == READ:
+            value = _counter_value(response)
+        elif response.status_code == 200:
+            value = 0
+        return kind, start, end, value
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="ads-stress") as executor:
+        outcomes = list(executor.map(one, kinds))
+    result.elapsed = time.perf_counter() - started
+    for kind, start, end, value in outcomes:
+        if kind == READ:
+            if value is None:
+                result.read_errors += 1
+                continue
+            result.read_latency.record(end - start)
+            result.reads.append(Read(start, end, value))
+        elif value is None:
+            result.create_errors += 1
+        else:
+            result.create_latency.record(end - start)
+    # а до второго - попадают между контрольными чтениями
+    result.after, failed = read_counter(client, item_id)
+    result.read_errors += failed
+    return result
+
+
+def run_stress(client: AdsApiClient, item_id: str, seller_id: int, levels: Sequence[int] = DEFAULT_LEVELS,
+               operations: int = DEFAULT_OPERATIONS, create_ratio: float = DEFAULT_CREATE_RATIO,
+               increment: Optional[int] = DEFAULT_INCREMENT, degradation: float = DEFAULT_DEGRADATION,
+               seed: str = DEFAULT_SEED) -> StressReport:
+    """Уровни конкуренции по возрастанию против одного объявления"""
+    report = StressReport(item_id, increment=increment, degradation=degradation)
+    rng = random.Random(seed)
+    for concurrency in levels:
+        report.levels.append(run_level(client, item_id, seller_id, concurrency, operations, create_ratio, rng))
+    return report
+
+
+def _levels(value: str) -> List[int]:
+    return sorted({int(part) for part in value.split(",") if part.strip()})
+
+
+def _increment(value: str) -> Optional[int]:
+    return None if value.lower() == "none" else int(value)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Конкурентная проверка счетчика статистики одного объявления")
+    parser.add_argument("--target", default=BASE_URL, help=f"Base URL API (по умолчанию {BASE_URL})")
+    parser.add_argument("--local", action="store_true",
+                        help="Поднять локальную заглушку, увеличивающую viewCount при каждом чтении статистики")
+    parser.add_argument("--levels", type=_levels, default=list(DEFAULT_LEVELS),
+                        help="Уровни конкуренции через запятую (по умолчанию %(default)s)")
+    parser.add_argument("--operations", type=int, default=DEFAULT_OPERATIONS, help="Запросов на уровень")
+    parser.add_argument("--create-ratio", type=float, default=DEFAULT_CREATE_RATIO,
+                        help="Доля POST /item в смеси запросов")
+    parser.add_argument("--increment", type=_increment, default=DEFAULT_INCREMENT,
+                        help="На сколько чтение статистики увеличивает viewCount; none - только монотонность")
+    parser.add_argument("--degradation", type=float, default=DEFAULT_DEGRADATION,
+                        help="Допустимый рост p99 чтения относительно первого уровня, раз")
+    parser.add_argument("--json", dest="json_path", default=None, help="Сохранить отчет в JSON")
+    args = parser.parse_args(argv)
+
+    server = None
+    target = args.target
+    if args.local:
+        from stub_server import AdsStore, AdsStubApp, StubServer
+        server = StubServer(AdsStubApp(AdsStore(count_views=True))).start()
+        target = server.base_url
+    try:
+        with AdsApiClient(target, pool_size=max(args.levels), retries=0) as client:
+            def is_busy(seller_id: int) -> bool:
+                response = client.get(f"/{seller_id}/item")
+                return response.status_code == 200 and bool(response.json())
+
+            seller_id = SellerIdAllocator.from_environment(probe=is_busy).next()
+            item_id = prepare_item(client, seller_id)
+            report = run_stress(client, item_id, seller_id, args.levels, args.operations, args.create_ratio,
+                                args.increment, args.degradation)
+    finally:
+        if server is not None:
+            server.stop()
+
+    print(report.format())
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as file:
+            json.dump(report.to_dict(), file, ensure_ascii=False, indent=2)
+    return 1 if report.violations() else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,250 @@
+"""
+Локальный TCP-прокси с внесением сетевых сбоев между клиентом и HTTP-сервером
+(обычно - заглушкой stub_server) для проверки таймаутов и устойчивости клиента.
+
+Сбои (Faults) применяются к каждому запросу - порции данных от клиента после
+полученного им ответа:
+- latency - задержка перед первым байтом ответа;
+- bandwidth - ограничение скорости отдачи ответа, байт/с;
+- drop - доля запросов, на которых соединение закрывается, не передав запрос серверу;
+- stall - запрос передается серверу, но ответ клиенту не отдается никогда;
+- trickle - slow-loris: заголовки отдаются сразу, тело - по одному байту с этим интервалом;
+- partial - отдается только столько байт тела ответа, после чего соединение закрывается.
+
+times ограничивает число запросов со сбоями (None - все), после чего прокси
+пропускает трафик без изменений: так проверяются повторы запросов.
+Разбор HTTP минимальный (граница заголовков ответа), поэтому прокси работает
+только с HTTP без TLS.
+"""
+
+import random
+import selectors
+import socket
+import threading
+import time
+from dataclasses import dataclass, field, replace
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlsplit, urlunsplit
+
+
+CHUNK_SIZE = 64 * 1024
+# Ограничение скорости отдается порциями на 1/BANDWIDTH_SLICES секунды
+BANDWIDTH_SLICES = 20
+_HEADER_END = b"\r\n\r\n"
+
+
+@dataclass(frozen=True)
+class Faults:
+    """Набор сбоев прокси; значения по умолчанию - без сбоев"""
+    latency: float = 0.0
+    bandwidth: Optional[int] = None
+    drop: float = 0.0
+    stall: bool = False
+    trickle: Optional[float] = None
+    partial: Optional[int] = None
+    times: Optional[int] = None
+
+    @classmethod
+    def parse(cls, spec: str) -> "Faults":
+        """Разбор строки вида "latency=0.05,bandwidth=50000,drop=0.1,trickle=0.01,partial=10,stall,times=3" """
+        values: Dict[str, object] = {}
+        for part in filter(None, (part.strip() for part in spec.split(","))):
+            name, _, value = part.partition("=")
+            if name == "stall":
+                values[name] = value.lower() not in ("0", "false", "no")
+            elif name in ("bandwidth", "partial", "times"):
+                values[name] = int(value)
+            elif name in ("latency", "drop", "trickle"):
+                values[name] = float(value)
+            else:
+                raise ValueError(f"неизвестный сбой {name!r} в {spec!r}")
+        return cls(**values)
+
+
+@dataclass
+class _Round:
+    """Сбои текущего запроса на соединении и состояние отдачи его ответа"""
+    faults: Faults
+    drop: bool
+    headers_done: bool = False
+    body_sent: int = 0
+    started: bool = False
+
+
+@dataclass
+class ProxyStats:
+    requests: int = 0
+    faulted: int = 0
+    dropped: int = 0
+    connections: int = 0
+    errors: List[str] = field(default_factory=list)
+
+
+class FaultProxy:
+    """TCP-прокси на 127.0.0.1 и эфемерном порту к target_url (http://host:port/...)"""
+
+    def __init__(self, target_url: str, faults: Optional[Faults] = None, seed: Optional[int] = None):
+        parts = urlsplit(target_url)
+        if parts.scheme != "http":
+            raise ValueError(f"FaultProxy поддерживает только http, получено {target_url!r}")
+        self._target_parts = parts
+        self.upstream: Tuple[str, int] = (parts.hostname, parts.port or 80)
+        self.faults = faults or Faults()
+        self.stats = ProxyStats()
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._listener.bind(("127.0.0.1", 0))
+        self._listener.listen(64)
+        self._closed = threading.Event()
+        self._sockets: List[socket.socket] = []
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        """target_url с адресом прокси вместо сервера"""
+        host, port = self._listener.getsockname()[:2]
+        return urlunsplit(self._target_parts._replace(netloc=f"{host}:{port}"))
+
+    def configure(self, faults: Optional[Faults] = None, **changes) -> "FaultProxy":
+        """Новые сбои для следующих запросов: configure(Faults(...)) или configure(latency=0.1)"""
+        with self._lock:
+            self.faults = replace(faults or self.faults, **changes)
+        return self
+
+    def start(self) -> "FaultProxy":
+        self._thread = threading.Thread(target=self._accept_loop, name="fault-proxy", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._closed.set()
+        # close() не прерывает accept() в другом потоке, shutdown() - прерывает
+        try:
+            self._listener.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self._listener.close()
+        with self._lock:
+            sockets, self._sockets = self._sockets, []
+        for sock in sockets:
+            _close(sock)
+        if self._thread is not None:
+            self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def _accept_loop(self):
+        while not self._closed.is_set():
+            try:
+                client, _ = self._listener.accept()
+            except OSError:
+                return
+            threading.Thread(target=self._serve, args=(client,), name="fault-proxy-conn", daemon=True).start()
+
+    def _next_round(self) -> _Round:
+        with self._lock:
+            self.stats.requests += 1
+            faults = self.faults
+            if faults.times is not None:
+                if faults.times <= 0:
+                    return _Round(Faults(), drop=False)
+                self.faults = replace(faults, times=faults.times - 1)
+            self.stats.faulted += 1
+            drop = bool(faults.drop) and self._random.random() < faults.drop
+            self.stats.dropped += drop
+            return _Round(faults, drop=drop)
+
+    def _serve(self, client: socket.socket):
+        try:
+            upstream = socket.create_connection(self.upstream)
+        except OSError as error:
+            self.stats.errors.append(f"upstream: {error}")
+            _close(client)
+            return
+        with self._lock:
+            self.stats.connections += 1
+            self._sockets += [client, upstream]
+        for sock in (client, upstream):
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        current: Optional[_Round] = None
+        selector = selectors.DefaultSelector()
+        selector.register(client, selectors.EVENT_READ)
+        selector.register(upstream, selectors.EVENT_READ)
+        try:
+            while not self._closed.is_set():
+                for key, _ in selector.select(timeout=0.5):
+                    data = key.fileobj.recv(CHUNK_SIZE)
+                    if not data:
+                        return
+                    if key.fileobj is client:
+                        # Данные клиента после начала ответа - следующий запрос на keep-alive соединении
+                        if current is None or current.started:
+                            current = self._next_round()
+                        if current.drop:
+                            return
+                        upstream.sendall(data)
+                    elif not self._respond(client, data, current):
+                        return
+        except OSError:
+            pass
+        finally:
+            selector.close()
+            with self._lock:
+                self._sockets = [sock for sock in self._sockets if sock not in (client, upstream)]
+            _close(client)
+            _close(upstream)
+
+    def _respond(self, client: socket.socket, data: bytes, current: Optional[_Round]) -> bool:
+        """Отдача порции ответа клиенту со сбоями; False - соединение нужно закрыть"""
+        faults = current.faults if current is not None else Faults()
+        if current is not None and not current.started:
+            current.started = True
+            if faults.latency:
+                time.sleep(faults.latency)
+        if faults.stall:
+            return True
+        head = b""
+        if current is not None and not current.headers_done:
+            end = data.find(_HEADER_END)
+            if end < 0:
+                head, data = data, b""
+            else:
+                current.headers_done = True
+                head, data = data[:end + len(_HEADER_END)], data[end + len(_HEADER_END):]
+        if current is not None and faults.partial is not None:
+            data = data[:max(0, faults.partial - current.body_sent)]
+        self._send(client, head, faults)
+        if faults.trickle:
+            for index in range(len(data)):
+                time.sleep(faults.trickle)
+                client.sendall(data[index:index + 1])
+        else:
+            self._send(client, data, faults)
+        if current is not None:
+            current.body_sent += len(data)
+            if faults.partial is not None and current.headers_done and current.body_sent >= faults.partial:
+                return False
+        return True
+
+    @staticmethod
+    def _send(client: socket.socket, data: bytes, faults: Faults):
+        if not faults.bandwidth:
+            client.sendall(data)
+            return
+        step = max(1, faults.bandwidth // BANDWIDTH_SLICES)
+        for start in range(0, len(data), step):
+            piece = data[start:start + step]
+            client.sendall(piece)
+            time.sleep(len(piece) / faults.bandwidth)
+
+
+def _close(sock: socket.socket):
+    try:
+        sock.close()
+    except OSError:
+        pass
@@ -0,0 +1,414 @@
+"""
+Табличный перебор некорректных входных данных для POST /item.
+
+Для каждого поля тела запроса (sellerID, name, price, statistics и его счетчики)
+задан набор граничных значений, значений другого типа и отсутствующего ключа.
+Из них строятся случаи: по одному измененному полю и, при pairs=True, все пары
+изменений разных полей (около 10 000 случаев), плюс заведомо некорректный JSON.
+Одинаковые тела запросов (например, счетчик внутри удаленного statistics)
+отбрасываются. Случаи отправляются параллельно через общий пул соединений
+клиента; против общего стенда частота запросов ограничивается.
+
+Варианты sellerID строятся от выделенного продавца базового тела: тела, которые сервис
+может принять, создают объявления только под ним. sellerID на краях диапазона
+(111111, 999999 и соседние) принадлежат чужим продавцам общего стенда, поэтому
+добавляются только явно (range_edges=True: заглушка или --ads-heavy).
+
+Результат - компактная матрица «поле x статус ответа» и список случаев,
+где статус не совпал с ожидаемым (любой 5xx и обрыв соединения - всегда ошибка).
+
+Запуск:
+    python fuzzing.py --local --pairs           # локальная заглушка, ~10 000 случаев
+    python fuzzing.py --inprocess --pairs       # то же без сокетов
+    python fuzzing.py --rate 5                  # реальный сервис, только одиночные изменения
+    python fuzzing.py --rate 5 --range-edges    # то же с sellerID на краях диапазона
+"""
+
+import argparse
+import copy
+import itertools
+import json
+import sys
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from ads import SELLER_ID_MAX, SELLER_ID_MIN, build_ad_payload
+from api_client import BASE_URL, AdsApiClient
+from seller_ids import SellerIdAllocator
+
+
+DEFAULT_CONCURRENCY = 16
+# Частота запросов к общему стенду по умолчанию; для заглушки ограничения нет
+DEFAULT_LIVE_RATE = 10.0
+DEFAULT_SELLER_ID = 424242
+DEFAULT_REPORTED = 20
+
+JSON_CONTENT_TYPE = "application/json"
+ANY_STATUS: Tuple[int, ...] = ()
+OK = (200,)
+REJECT = (400,)
+OK_OR_REJECT = (200, 400)
+
+
+class _Missing:
+    """Маркер отсутствующего ключа"""
+
+    def __repr__(self) -> str:
+        return "<missing>"
+
+
+MISSING = _Missing()
+
+
+@dataclass(frozen=True)
+class Variant:
+    """
+    Значение поля и допустимые статусы ответа (пусто - допустим любой статус, кроме 5xx).
+    pairwise=False - только одиночный случай (очень большие значения не комбинируются).
+    """
+    value: Any
+    expect: Tuple[int, ...]
+    pairwise: bool = True
+
+
+@dataclass(frozen=True)
+class FuzzCase:
+    """Один запрос перебора"""
+    label: str
+    fields: Tuple[str, ...]
+    body: bytes
+    expect: Tuple[int, ...]
+    content_type: str = JSON_CONTENT_TYPE
+
+    @property
+    def row(self) -> str:
+        """Строка матрицы: измененные поля через «+»"""
+        return "+".join(self.fields)
+
+
+def _variants(expect: Tuple[int, ...], *values: Any, pairwise: bool = True) -> List[Variant]:
+    return [Variant(value, expect, pairwise) for value in values]
+
+
+_WRONG_TYPES = ([], {}, True, False)
+_INT_EDGES = (2 ** 15, 2 ** 16, 2 ** 31 - 1, 2 ** 31, 2 ** 32, 2 ** 53 + 1, 2 ** 63 - 1, 2 ** 63, 10 ** 30)
+_FULLWIDTH_DIGITS = {ord(digit): ord(digit) + 0xFEE0 for digit in "0123456789"}
+
+
+def seller_variants(seller_id: int, range_edges: bool = False) -> List[Variant]:
+    """
+    Варианты sellerID от выделенного продавца; range_edges - добавить допустимые sellerID
+    на краях и в середине диапазона (объявления у чужих продавцов общего стенда)
+    """
+    text = str(seller_id)
+    variants = _variants(OK, seller_id)
+    if range_edges:
+        variants += _variants(OK, SELLER_ID_MIN, SELLER_ID_MIN + 1, (SELLER_ID_MIN + SELLER_ID_MAX) // 2,
+                              SELLER_ID_MAX - 1, SELLER_ID_MAX)
+    return (
+        variants
+        + _variants(REJECT, SELLER_ID_MIN - 1, SELLER_ID_MAX + 1, 0, -1, -seller_id, -SELLER_ID_MAX, *_INT_EDGES,
+                    MISSING, None, "", text, " " + text, text.translate(_FULLWIDTH_DIGITS), seller_id + 0.5, 1e6,
+                    [seller_id], {"id": seller_id}, *_WRONG_TYPES)
+        + _variants(ANY_STATUS, float(seller_id))
+    )
+
+
+# Ожидания совпадают с тестами TC-002..TC-009: нулевая цена и отрицательные счетчики
+# допускают и 200, и 400, отсутствие statistics - 400 (Баг #1)
+# Остальные поля; варианты sellerID зависят от продавца - seller_variants()
+FIELD_VARIANTS: Dict[str, List[Variant]] = {
+    "name": (
+        _variants(OK, "a", "1", "Объявление", "x" * 255, "🚗 авто", "Test\nAd", "Tab\tAd", "ñandú", "العربية")
+        + _variants(REJECT, MISSING, None, "", 0, 123, 1.5, ["a"], *_WRONG_TYPES)
+        + _variants(ANY_STATUS, " ", "   ", "\u0000", "\u200b", "<script>alert(1)</script>", "' OR 1=1 --",
+                    "{{7*7}}", "%s%n", "../../etc/passwd", "x" * 256, "x" * 4096)
+        + _variants(ANY_STATUS, "x" * 100_000, "x" * 1_000_000, pairwise=False)
+    ),
+    "price": (
+        _variants(OK, 1, 2, 100, 999_999, 2 ** 31 - 1)
+        + _variants(OK_OR_REJECT, 0)
+        + _variants(REJECT, MISSING, None, -1, -2, -2 ** 31, -2 ** 63, "1000", "", 0.5, -0.5, float("nan"),
+                    float("inf"), [1000], *_WRONG_TYPES)
+        + _variants(ANY_STATUS, *_INT_EDGES[3:], 1000.0, 1e308)
+    ),
+    "statistics": (
+        _variants(REJECT, MISSING, [], "stats", 1, True)
+        + _variants(ANY_STATUS, None, {}, {"likes": 1, "unknown": 1})
+    ),
+}
+for _counter in ("likes", "viewCount", "contacts"):
+    FIELD_VARIANTS[f"statistics.{_counter}"] = (
+        _variants(OK, 0, 1, 1000, 2 ** 31 - 1)
+        + _variants(OK_OR_REJECT, -1, -2 ** 31)
+        + _variants(REJECT, "1", "", 1.5, [1], *_WRONG_TYPES)
+        + _variants(ANY_STATUS, MISSING, None, 2 ** 31, 2 ** 63, 1.0)
+    )
+
+def raw_cases(seller_id: int = DEFAULT_SELLER_ID) -> List[FuzzCase]:
+    """Тела, которые не являются корректным JSON-объектом, и нестандартный Content-Type"""
+    seller = str(seller_id).encode("ascii")
+    return [
+        FuzzCase(f"raw:{label}", ("<raw>",), body, expect, content_type)
+        for label, body, expect, content_type in (
+            ("empty", b"", REJECT, JSON_CONTENT_TYPE),
+            ("truncated", b'{"sellerID": ' + seller + b', "name": "Te', REJECT, JSON_CONTENT_TYPE),
+            ("trailing-comma", b'{"sellerID": ' + seller + b', "name": "Test", "price": 1,}', REJECT,
+             JSON_CONTENT_TYPE),
+            ("single-quotes", b"{'sellerID': " + seller + b"}", REJECT, JSON_CONTENT_TYPE),
+            ("unquoted", b"{invalid json}", REJECT, JSON_CONTENT_TYPE),
+            ("array", b"[]", REJECT, JSON_CONTENT_TYPE),
+            ("null", b"null", REJECT, JSON_CONTENT_TYPE),
+            ("string", b'"text"', REJECT, JSON_CONTENT_TYPE),
+            ("number", seller, REJECT, JSON_CONTENT_TYPE),
+            ("invalid-utf8", b'{"name": "\xff\xfe"}', REJECT, JSON_CONTENT_TYPE),
+            ("deep-nesting", b"[" * 100_000 + b"]" * 100_000, REJECT, JSON_CONTENT_TYPE),
+            ("text-plain", b"not json", (400, 415), "text/plain"),
+            ("text-plain-valid-json", json.dumps(build_ad_payload(seller_id)).encode(), ANY_STATUS, "text/plain"),
+            ("duplicate-keys", b'{"sellerID": 1, "sellerID": ' + seller + b', "name": "Test", "price": 1, '
+                               b'"statistics": {}}', ANY_STATUS, JSON_CONTENT_TYPE),
+        )
+    ]
+
+
+def _combine(expectations: Sequence[Tuple[int, ...]]) -> Tuple[int, ...]:
+    """Ожидание для нескольких изменений: отказ по любому полю - отказ, иначе объединение допустимого"""
+    if any(expect == REJECT for expect in expectations):
+        return REJECT
+    if any(expect == ANY_STATUS for expect in expectations):
+        return ANY_STATUS
+    return tuple(sorted(set(itertools.chain.from_iterable(expectations))))
+
+
+def _apply(payload: Dict[str, Any], path: str, value: Any) -> bool:
+    """Изменение поля по пути "a.b"; False, если родительского объекта нет (изменение не имеет смысла)"""
+    *parents, key = path.split(".")
+    target = payload
+    for parent in parents:
+        target = target.get(parent)
+        if not isinstance(target, dict):
+            return False
+    if value is MISSING:
+        target.pop(key, None)
+    else:
+        # Копия: вложенное значение варианта может затем измениться вторым изменением пары
+        target[key] = copy.deepcopy(value)
+    return True
+
+
+def _encode(payload: Dict[str, Any]) -> bytes:
+    # sort_keys: одинаковые по смыслу тела дают одинаковые байты и отбрасываются как дубликаты
+    return json.dumps(payload, sort_keys=True, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def _label(path: str, value: Any) -> str:
+    text = repr(value)
+    return f"{path}={text[:24]}...({len(value)})" if len(text) > 32 and hasattr(value, "__len__") else f"{path}={text}"
+
+
+def generate_cases(seller_id: int = DEFAULT_SELLER_ID, pairs: bool = False,
+                   variants: Optional[Dict[str, List[Variant]]] = None, raw: bool = True,
+                   range_edges: bool = False) -> List[FuzzCase]:
+    """
+    Случаи перебора без дубликатов тел: по одному измененному полю, затем (pairs=True)
+    все пары изменений разных полей, затем некорректный JSON (raw=True).
+    range_edges - добавить sellerID на краях диапазона (см. seller_variants)
+    """
+    if variants is None:
+        variants = {"sellerID": seller_variants(seller_id, range_edges), **FIELD_VARIANTS}
+    single = [(path, variant) for path, options in variants.items() for variant in options]
+    mutations: Iterator[Tuple[Tuple[str, Variant], ...]] = ((mutation,) for mutation in single)
+    if pairs:
+        combined = ((a, b) for a, b in itertools.combinations(single, 2)
+                    if a[0] != b[0] and a[1].pairwise and b[1].pairwise)
+        mutations = itertools.chain(mutations, combined)
+
+    cases, seen = [], set()
+    for mutation in mutations:
+        payload = build_ad_payload(seller_id, name="Fuzz Ad")
+        if not all(_apply(payload, path, variant.value) for path, variant in mutation):
+            continue
+        body = _encode(payload)
+        key = (JSON_CONTENT_TYPE, body)
+        if key in seen:
+            continue
+        seen.add(key)
+        cases.append(FuzzCase(
+            label=" & ".join(_label(path, variant.value) for path, variant in mutation),
+            fields=tuple(path for path, _ in mutation),
+            body=body,
+            expect=_combine([variant.expect for _, variant in mutation]),
+        ))
+    if raw:
+        for case in raw_cases(seller_id):
+            if (case.content_type, case.body) not in seen:
+                seen.add((case.content_type, case.body))
+                cases.append(case)
+    return cases
+
+
+class RateLimiter:
+    """Равномерная отправка не чаще rate запросов в секунду из любого числа потоков"""
+
+    def __init__(self, rate: float, clock: Callable[[], float] = time.monotonic,
+                 sleep: Callable[[float], None] = time.sleep):
+        self.interval = 1.0 / rate
+        self._clock = clock
+        self._sleep = sleep
+        self._next = clock()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        with self._lock:
+            now = self._clock()
+            slot = max(self._next, now)
+            self._next = slot + self.interval
+        if slot > now:
+            self._sleep(slot - now)
+
+
+@dataclass
+class CaseResult:
+    """Ответ на случай перебора; status 0 - запрос не выполнен (error)"""
+    case: FuzzCase
+    status: int
+    error: Optional[str] = None
+
+    @property
+    def unexpected(self) -> bool:
+        if self.status == 0 or self.status >= 500:
+            return True
+        return bool(self.case.expect) and self.status not in self.case.expect
+
+
+@dataclass
+class FuzzReport:
+    """Итог перебора: матрица статусов и неожиданные ответы"""
+    results: List[CaseResult] = field(default_factory=list)
+    elapsed: float = 0.0
+
+    @property
+    def unexpected(self) -> List[CaseResult]:
+        return [result for result in self.results if result.unexpected]
+
+    def matrix(self) -> Dict[str, Counter]:
+        """Строка матрицы (измененные поля) -> счетчик статусов"""
+        rows: Dict[str, Counter] = {}
+        for result in self.results:
+            rows.setdefault(result.case.row, Counter())[result.status] += 1
+        return rows
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "cases": len(self.results),
+            "elapsed_s": round(self.elapsed, 3),
+            "matrix": {row: {str(status): count for status, count in sorted(counts.items())}
+                       for row, counts in self.matrix().items()},
+            "unexpected": [{"case": result.case.label, "expect": list(result.case.expect),
+                            "status": result.status, "error": result.error} for result in self.unexpected],
+        }
+
+    def format(self, limit: int = DEFAULT_REPORTED) -> str:
+        matrix = self.matrix()
+        statuses = sorted({status for counts in matrix.values() for status in counts})
+        width = max([len("поле")] + [len(row) for row in matrix])
+        rate = len(self.results) / self.elapsed if self.elapsed else 0.0
+        lines = [f"Случаев: {len(self.results)} за {self.elapsed:.2f} с ({rate:.0f} запросов/с)",
+                 f"{'поле':<{width}}" + "".join(f"{status or 'ERR':>7}" for status in statuses)]
+        for row in sorted(matrix):
+            lines.append(f"{row:<{width}}" + "".join(f"{matrix[row].get(status, 0) or '.':>7}" for status in statuses))
+        unexpected = self.unexpected
+        lines.append(f"Неожиданных ответов: {len(unexpected)}")
+        for result in unexpected[:limit]:
+            expected = "/".join(map(str, result.case.expect)) or "не 5xx"
+            lines.append(f"  {result.status or result.error}  (ожидалось {expected})  {result.case.label}")
+        if len(unexpected) > limit:
+            lines.append(f"  ... и еще {len(unexpected) - limit}")
+        return "\n".join(lines)
+
+
+def run_cases(client: AdsApiClient, cases: Sequence[FuzzCase], concurrency: int = DEFAULT_CONCURRENCY,
+              rate: Optional[float] = None) -> FuzzReport:
+    """Параллельная отправка случаев через пул соединений клиента; rate - ограничение запросов в секунду"""
+    limiter = RateLimiter(rate) if rate else None
+
+    def send(case: FuzzCase) -> CaseResult:
+        if limiter is not None:
+            limiter.acquire()
+        try:
+            response = client.post("/item", data=case.body, headers={"Content-Type": case.content_type})
+        except Exception as error:
+            return CaseResult(case, 0, f"{type(error).__name__}: {error}")
+        return CaseResult(case, response.status_code)
+
+    workers = max(1, min(concurrency, len(cases), client.pool_size))
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="ads-fuzz") as executor:
+        results = list(executor.map(send, cases))
+    return FuzzReport(results, time.perf_counter() - started)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Перебор некорректных входных данных POST /item")
+    parser.add_argument("--target", default=BASE_URL, help=f"Base URL API (по умолчанию {BASE_URL})")
+    parser.add_argument("--local", action="store_true", help="Поднять локальную заглушку stub_server")
+    parser.add_argument("--inprocess", action="store_true",
+                        help="Передавать запросы в заглушку напрямую, без сокетов")
+    parser.add_argument("--pairs", action="store_true", help="Добавить все пары изменений разных полей")
+    parser.add_argument("--seller-id", type=int, default=None,
+                        help=f"sellerID базового тела (по умолчанию {DEFAULT_SELLER_ID} для заглушки, "
+                             f"свободный sellerID для стенда)")
+    parser.add_argument("--range-edges", action="store_true",
+                        help="Добавить sellerID на краях диапазона: на стенде они создают объявления "
+                             "у чужих продавцов (для заглушки включено всегда)")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY, help="Число параллельных запросов")
+    parser.add_argument("--rate", type=float, default=None,
+                        help=f"Запросов в секунду (по умолчанию {DEFAULT_LIVE_RATE:g} для стенда, "
+                             f"без ограничения для --local; 0 - без ограничения)")
+    parser.add_argument("--json", dest="json_path", default=None, help="Сохранить отчет в JSON")
+    args = parser.parse_args(argv)
+
+    server = None
+    transport = None
+    target = args.target
+    rate = args.rate
+    if args.inprocess:
+        from stub_server import INPROCESS_BASE_URL, InProcessAdapter
+        target, transport = INPROCESS_BASE_URL, InProcessAdapter()
+    elif args.local:
+        from stub_server import StubServer
+        server = StubServer().start()
+        target = server.base_url
+    elif rate is None:
+        rate = DEFAULT_LIVE_RATE
+    stub = args.inprocess or args.local
+    try:
+        with AdsApiClient(target, pool_size=args.concurrency, transport=transport) as client:
+            seller_id = args.seller_id
+            if seller_id is None and stub:
+                seller_id = DEFAULT_SELLER_ID
+            elif seller_id is None:
+                def is_busy(candidate: int) -> bool:
+                    response = client.get(f"/{candidate}/item")
+                    return response.status_code == 200 and bool(response.json())
+
+                seller_id = SellerIdAllocator.from_environment(probe=is_busy).next()
+            cases = generate_cases(seller_id, pairs=args.pairs, range_edges=args.range_edges or stub)
+            report = run_cases(client, cases, concurrency=args.concurrency, rate=rate)
+    finally:
+        if server is not None:
+            server.stop()
+
+    print(report.format())
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as file:
+            json.dump(report.to_dict(), file, ensure_ascii=False, indent=2)
+    return 1 if report.unexpected else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,143 @@
+"""
+Замер задержек HTTP-запросов, выполняемых тестами.
+CallRecorder подключается к AdsApiClient как observer и только дописывает кортеж
+в список, поэтому накладные расходы - единицы микросекунд на запрос.
+Шаблоны эндпоинтов, перцентили и отчеты считаются после выполнения теста.
+"""
+
+import heapq
+import itertools
+import json
+import os
+from collections import Counter
+from typing import Any, Dict, List, Optional, Tuple
+
+import pytest
+
+from ads import endpoint_template
+from latency import LatencyHistogram
+
+
+PLUGIN_NAME = "ads_latency"
+USER_PROPERTY = "ads_http_calls"
+DEFAULT_SLOWEST = 10
+
+Call = Tuple[str, str, Optional[int], int, float]
+
+
+class CallRecorder:
+    """Observer для AdsApiClient: накапливает вызовы до следующего drain()"""
+
+    def __init__(self):
+        self.calls: List[Call] = []
+
+    def __call__(self, method: str, path: str, status: Optional[int], size: int, elapsed: float):
+        self.calls.append((method, path, status, size, elapsed))
+
+    def drain(self) -> List[Call]:
+        calls, self.calls = self.calls, []
+        return calls
+
+
+def _call_to_dict(call: Call) -> Dict[str, Any]:
+    method, path, status, size, elapsed = call
+    return {
+        "method": method,
+        "endpoint": endpoint_template(method, path),
+        "path": "/" + path.lstrip("/"),
+        "status": status,
+        "bytes": size,
+        "elapsed_ms": round(elapsed * 1000, 3),
+    }
+
+
+class LatencyReportPlugin:
+    """
+    Плагин pytest: прикрепляет вызовы к отчету каждого теста, в конце сессии
+    сохраняет JSON с перцентилями по эндпоинтам и печатает самые медленные вызовы.
+    Агрегация идет по отчетам тестов, поэтому работает и с pytest-xdist.
+    """
+
+    def __init__(self, report_path: Optional[str] = None, slowest: int = DEFAULT_SLOWEST):
+        self.report_path = report_path
+        self.slowest_count = slowest
+        self.recorder = CallRecorder()
+        self.histograms: Dict[str, LatencyHistogram] = {}
+        self.statuses: Dict[str, Counter] = {}
+        self.bytes: Counter = Counter()
+        # (мс, nodeid, порядковый номер, запись): номер разрешает равенство, dict несравнимы
+        self.slowest: List[Tuple[float, str, int, Dict[str, Any]]] = []
+        self._sequence = itertools.count()
+
+    @pytest.hookimpl(hookwrapper=True)
+    def pytest_runtest_makereport(self, item, call):
+        outcome = yield
+        calls = self.recorder.drain()
+        if not calls:
+            return
+        report = outcome.get_result()
+        records = [_call_to_dict(record) for record in calls]
+        report.user_properties.append((USER_PROPERTY, records))
+        lines = [f"{record['elapsed_ms']:>10.2f} ms  {record['status']}  {record['method']} {record['path']}"
+                 for record in records]
+        report.sections.append((f"HTTP-вызовы ({report.when})", "\n".join(lines)))
+
+    def pytest_runtest_logreport(self, report):
+        for name, records in report.user_properties:
+            if name != USER_PROPERTY:
+                continue
+            for record in records:
+                endpoint = record["endpoint"]
+                self.histograms.setdefault(endpoint, LatencyHistogram()).record_us(
+                    int(record["elapsed_ms"] * 1000))
+                self.statuses.setdefault(endpoint, Counter())[str(record["status"])] += 1
+                self.bytes[endpoint] += record["bytes"]
+                entry = (record["elapsed_ms"], report.nodeid, next(self._sequence), record)
+                if len(self.slowest) < self.slowest_count:
+                    heapq.heappush(self.slowest, entry)
+                elif entry[0] > self.slowest[0][0]:
+                    heapq.heapreplace(self.slowest, entry)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "endpoints": {
+                endpoint: {
+                    "latency": histogram.summary(),
+                    "statuses": dict(self.statuses[endpoint]),
+                    "bytes": self.bytes[endpoint],
+                }
+                for endpoint, histogram in sorted(self.histograms.items())
+            },
+            "slowest": [dict(record, test=nodeid)
+                        for _, nodeid, _, record in sorted(self.slowest, key=lambda entry: -entry[0])],
+        }
+
+    def pytest_sessionfinish(self, session):
+        # Воркеры xdist отчет не пишут - все данные приходят контроллеру через отчеты тестов
+        if hasattr(session.config, "workerinput") or not self.report_path or not self.histograms:
+            return
+        directory = os.path.dirname(self.report_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(self.report_path, "w", encoding="utf-8") as file:
+            json.dump(self.to_dict(), file, ensure_ascii=False, indent=2)
+
+    def pytest_terminal_summary(self, terminalreporter):
+        if not self.histograms:
+            return
+        terminalreporter.write_sep("=", "задержки HTTP-вызовов API объявлений")
+        terminalreporter.write_line(f"{'Эндпоинт':<24}{'вызовов':>9}{'p50 мс':>10}{'p95 мс':>10}"
+                                    f"{'p99 мс':>10}{'max мс':>10}")
+        for endpoint, row in self.to_dict()["endpoints"].items():
+            latency = row["latency"]
+            terminalreporter.write_line(f"{endpoint:<24}{latency['count']:>9}{latency['p50_ms']:>10.2f}"
+                                        f"{latency['p95_ms']:>10.2f}{latency['p99_ms']:>10.2f}"
+                                        f"{latency['max_ms']:>10.2f}")
+        if self.slowest:
+            terminalreporter.write_line("")
+            terminalreporter.write_line(f"Самые медленные вызовы ({len(self.slowest)}):")
+            for elapsed, nodeid, _, record in sorted(self.slowest, key=lambda entry: -entry[0]):
+                terminalreporter.write_line(f"{elapsed:>10.2f} ms  {record['status']}  "
+                                            f"{record['method']} {record['path']}  ({nodeid})")
+        if self.report_path and not hasattr(terminalreporter.config, "workerinput"):
+            terminalreporter.write_line(f"Отчет о задержках: {self.report_path}")
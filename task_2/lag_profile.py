@@ -0,0 +1,319 @@
+"""
+Профилирование задержки согласованности: через сколько после ответа POST /item
+объявление становится видимым через GET /:sellerID/item, GET /item/:id и GET /statistic/:id.
+
+Для каждого образца создается объявление (у каждого образца свой sellerID), и сразу
+после ответа POST каждый эндпоинт опрашивается в своем потоке с минимальным
+интервалом. Задержка образца - время от ответа POST до ответа первого успешного
+GET: именно столько ждет тест. Точность - промежуток между последним неуспешным
+и первым успешным опросом, он выводится в отчете.
+
+По распределению задержек для каждого эндпоинта рекомендуется дедлайн ожидания:
+p99 с запасом (safety), но не меньше MIN_DEADLINE. Образцы, не ставшие видимыми за
+horizon секунд, делают рекомендацию невозможной - дедлайн не выдается. Ошибка опроса
+(транспорт, дедлайн клиента, ответ 200 не в JSON) завершает только этот образец эндпоинта:
+он учитывается отдельно и попадает в список неудачных, остальные измерения сохраняются.
+
+Отчет в JSON (--json) читается тестами через --ads-lag-profile: дедлайны ожидания
+берутся из него вместо фиксированных waiting.DEFAULT_TIMEOUT.
+
+Запуск:
+    python lag_profile.py --samples 200 --json lag_profile.json   # реальный сервис
+    python lag_profile.py --local --visibility-delay 0.05         # локальная заглушка
+"""
+
+import argparse
+import json
+import math
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from ads import build_ad_payload, parse_item_id
+from api_client import BASE_URL, AdsApiClient
+from latency import LatencyHistogram
+from seller_ids import SellerIdAllocator
+
+
+LISTING = "GET /:sellerID/item"
+ITEM = "GET /item/:id"
+STATISTIC = "GET /statistic/:id"
+ENDPOINTS = (LISTING, ITEM, STATISTIC)
+
+DEFAULT_SAMPLES = 50
+DEFAULT_CONCURRENCY = 4
+# Интервал опроса одного эндпоинта; против общего стенда - реже, чтобы не создавать нагрузку
+DEFAULT_POLL_INTERVAL = 0.001
+DEFAULT_LIVE_POLL_INTERVAL = 0.05
+DEFAULT_HORIZON = 60.0
+DEFAULT_PERCENTILE = 99.0
+DEFAULT_SAFETY = 2.0
+MIN_DEADLINE = 1.0
+REPORT_VERSION = 1
+
+
+class LagProfileError(RuntimeError):
+    """Профиль задержек не удалось получить или прочитать"""
+
+
+def _listing_visible(item_id: str) -> Callable[[Any], bool]:
+    return lambda data: isinstance(data, list) and any(
+        isinstance(ad, dict) and ad.get("id") == item_id for ad in data)
+
+
+def _probes(seller_id: int, item_id: str) -> Dict[str, tuple]:
+    """Эндпоинт -> (путь, условие видимости по JSON ответа 200)"""
+    return {
+        LISTING: (f"/{seller_id}/item", _listing_visible(item_id)),
+        ITEM: (f"/item/{item_id}", _listing_visible(item_id)),
+        STATISTIC: (f"/statistic/{item_id}", lambda data: isinstance(data, list) and bool(data)),
+    }
+
+
+@dataclass
+class LagSample:
+    """
+    Один опрос эндпоинта после создания объявления.
+    lag - от ответа POST до ответа первого успешного GET (None - не стало видимым за horizon),
+    resolution - от отправки последнего неуспешного GET до ответа первого успешного,
+    error - опрос прерван исключением (lag тогда None)
+    """
+    endpoint: str
+    item_id: str
+    lag: Optional[float]
+    resolution: float
+    polls: int
+    error: Optional[str] = None
+
+
+@dataclass
+class EndpointLag:
+    """Распределение задержек одного эндпоинта и рекомендуемый дедлайн"""
+    endpoint: str
+    histogram: LatencyHistogram = field(default_factory=LatencyHistogram)
+    resolution: LatencyHistogram = field(default_factory=LatencyHistogram)
+    invisible: int = 0
+    errors: int = 0
+    polls: int = 0
+
+    def add(self, sample: LagSample):
+        self.polls += sample.polls
+        if sample.error is not None:
+            self.errors += 1
+            return
+        if sample.lag is None:
+            self.invisible += 1
+            return
+        self.histogram.record(sample.lag)
+        self.resolution.record(sample.resolution)
+
+    def recommended_deadline(self, percentile: float = DEFAULT_PERCENTILE,
+                             safety: float = DEFAULT_SAFETY) -> Optional[float]:
+        """Дедлайн ожидания в секундах (округление вверх до 0.1 с); None - данных недостаточно"""
+        if self.invisible or not self.histogram.count:
+            return None
+        seconds = self.histogram.percentile_ms(percentile) / 1000.0 * safety
+        return max(MIN_DEADLINE, math.ceil(seconds * 10) / 10)
+
+
+@dataclass
+class LagProfile:
+    """Итог профилирования по всем эндпоинтам"""
+    endpoints: Dict[str, EndpointLag]
+    samples: int = 0
+    failed: List[str] = field(default_factory=list)
+    elapsed: float = 0.0
+    horizon: float = DEFAULT_HORIZON
+    percentile: float = DEFAULT_PERCENTILE
+    safety: float = DEFAULT_SAFETY
+
+    def deadlines(self) -> Dict[str, Optional[float]]:
+        return {name: lag.recommended_deadline(self.percentile, self.safety) for name, lag in self.endpoints.items()}
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "v": REPORT_VERSION,
+            "samples": self.samples,
+            "failed": self.failed,
+            "elapsed_s": round(self.elapsed, 3),
+            "horizon_s": self.horizon,
+            "percentile": self.percentile,
+            "safety": self.safety,
+            "endpoints": {name: {"lag": lag.histogram.summary((50.0, 90.0, 99.0, 99.9)),
+                                 "resolution_p50_ms": lag.resolution.percentile_ms(50.0),
+                                 "invisible": lag.invisible,
+                                 "errors": lag.errors,
+                                 "polls": lag.polls}
+                          for name, lag in self.endpoints.items()},
+            "deadlines_s": self.deadlines(),
+        }
+
+    def format(self) -> str:
+        width = max(len(name) for name in self.endpoints)
+        lines = [f"Образцов: {self.samples} за {self.elapsed:.2f} с, неудачных: {len(self.failed)}",
+                 f"{'эндпоинт':<{width}}  {'p50':>9}  {'p90':>9}  {'p99':>9}  {'max':>9}  "
+                 f"{'точность':>9}  {'не видно':>8}  {'ошибок':>6}  {'дедлайн':>8}"]
+        deadlines = self.deadlines()
+        for name, lag in self.endpoints.items():
+            histogram = lag.histogram
+            deadline = deadlines[name]
+            lines.append(f"{name:<{width}}  " + "  ".join(f"{histogram.percentile_ms(p):>6.1f} мс"
+                                                         for p in (50.0, 90.0, 99.0))
+                         + f"  {histogram.max_us / 1000.0:>6.1f} мс  {lag.resolution.percentile_ms(50.0):>6.2f} мс"
+                         + f"  {lag.invisible:>8}  {lag.errors:>6}  " + (f"{deadline:>6.1f} с" if deadline is not None else "       -"))
+        lines.append(f"Дедлайн: p{self.percentile:g} x {self.safety:g}, не меньше {MIN_DEADLINE:g} с; "
+                     f"'-' - часть объявлений не стала видимой за {self.horizon:g} с")
+        return "\n".join(lines)
+
+
+def _poll(client: AdsApiClient, endpoint: str, path: str, visible: Callable[[Any], bool], item_id: str,
+          created_at: float, horizon: float, interval: float) -> LagSample:
+    last_miss = created_at
+    polls = 0
+    while True:
+        sent = time.perf_counter()
+        response = client.get(path)
+        received = time.perf_counter()
+        polls += 1
+        if response.status_code == 200 and visible(response.json()):
+            return LagSample(endpoint, item_id, received - created_at, received - last_miss, polls)
+        last_miss = sent
+        if received - created_at >= horizon:
+            return LagSample(endpoint, item_id, None, received - last_miss, polls)
+        if interval:
+            time.sleep(interval)
+
+
+def measure_sample(client: AdsApiClient, seller_id: int, endpoints: Sequence[str] = ENDPOINTS,
+                   horizon: float = DEFAULT_HORIZON, interval: float = DEFAULT_POLL_INTERVAL) -> List[LagSample]:
+    """Создает одно объявление и опрашивает каждый эндпоинт в своем потоке до видимости"""
+    response = client.post("/item", json=build_ad_payload(seller_id, name="Lag Probe"))
+    created_at = time.perf_counter()
+    item_id = parse_item_id(response.json().get("status")) if response.status_code == 200 else None
+    if item_id is None:
+        raise LagProfileError(f"POST /item для sellerID {seller_id}: статус {response.status_code}")
+    probes = _probes(seller_id, item_id)
+    samples: List[Optional[LagSample]] = [None] * len(endpoints)
+
+    def run(index: int):
+        endpoint = endpoints[index]
+        path, visible = probes[endpoint]
+        try:
+            samples[index] = _poll(client, endpoint, path, visible, item_id, created_at, horizon, interval)
+        except Exception as error:
+            # Исключение в потоке опроса иначе потерялось бы, а образец остался бы пустым
+            samples[index] = LagSample(endpoint, item_id, None, 0.0, 0, f"{type(error).__name__}: {error}")
+
+    # Первый эндпоинт опрашивается в текущем потоке, остальные - параллельно
+    threads = [threading.Thread(target=run, args=(index,), daemon=True) for index in range(1, len(endpoints))]
+    for thread in threads:
+        thread.start()
+    run(0)
+    for thread in threads:
+        thread.join()
+    return samples
+
+
+def profile(client: AdsApiClient, seller_ids: Callable[[], int], samples: int = DEFAULT_SAMPLES,
+            concurrency: int = DEFAULT_CONCURRENCY, endpoints: Sequence[str] = ENDPOINTS,
+            horizon: float = DEFAULT_HORIZON, interval: float = DEFAULT_POLL_INTERVAL,
+            percentile: float = DEFAULT_PERCENTILE, safety: float = DEFAULT_SAFETY) -> LagProfile:
+    """
+    samples образцов, до concurrency одновременно; seller_ids - источник нового sellerID на образец.
+    Каждый образец занимает len(endpoints) соединений пула, поэтому параллельность ограничена пулом.
+    """
+    result = LagProfile({name: EndpointLag(name) for name in endpoints}, horizon=horizon,
+                        percentile=percentile, safety=safety)
+    lock = threading.Lock()
+
+    def one(_):
+        seller_id = seller_ids()
+        try:
+            measured = measure_sample(client, seller_id, endpoints, horizon, interval)
+        except Exception as error:
+            with lock:
+                result.failed.append(f"{type(error).__name__}: {error}")
+            return
+        with lock:
+            result.samples += 1
+            for sample in measured:
+                result.endpoints[sample.endpoint].add(sample)
+                if sample.error is not None:
+                    result.failed.append(f"{sample.endpoint} {sample.item_id}: {sample.error}")
+
+    workers = max(1, min(concurrency, samples, client.pool_size // len(endpoints)))
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="ads-lag") as executor:
+        list(executor.map(one, range(samples)))
+    result.elapsed = time.perf_counter() - started
+    return result
+
+
+def load_deadlines(path: str) -> Dict[str, float]:
+    """Рекомендованные дедлайны из отчета (--json); эндпоинты без рекомендации пропускаются"""
+    try:
+        with open(path, encoding="utf-8") as file:
+            data = json.load(file)
+    except (OSError, ValueError) as error:
+        raise LagProfileError(f"Не удалось прочитать профиль задержек {path}: {error}") from None
+    if data.get("v") != REPORT_VERSION:
+        raise LagProfileError(f"Неизвестная версия профиля задержек {path}: {data.get('v')!r}")
+    return {name: float(seconds) for name, seconds in data.get("deadlines_s", {}).items() if seconds is not None}
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Задержка видимости объявления после POST /item по эндпоинтам")
+    parser.add_argument("--target", default=BASE_URL, help=f"Base URL API (по умолчанию {BASE_URL})")
+    parser.add_argument("--local", action="store_true", help="Поднять локальную заглушку stub_server")
+    parser.add_argument("--visibility-delay", type=float, default=0.0,
+                        help="Для --local: задержка видимости объявлений в заглушке, сек")
+    parser.add_argument("--samples", type=int, default=DEFAULT_SAMPLES, help="Число создаваемых объявлений")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY,
+                        help="Сколько объявлений профилируется одновременно")
+    parser.add_argument("--interval", type=float, default=None,
+                        help=f"Интервал опроса, сек (по умолчанию {DEFAULT_LIVE_POLL_INTERVAL:g} для стенда, "
+                             f"{DEFAULT_POLL_INTERVAL:g} для --local)")
+    parser.add_argument("--horizon", type=float, default=DEFAULT_HORIZON,
+                        help="Сколько ждать видимости одного объявления, сек")
+    parser.add_argument("--percentile", type=float, default=DEFAULT_PERCENTILE, help="Перцентиль для дедлайна")
+    parser.add_argument("--safety", type=float, default=DEFAULT_SAFETY, help="Множитель запаса для дедлайна")
+    parser.add_argument("--json", dest="json_path", default=None,
+                        help="Сохранить отчет в JSON (используется тестами через --ads-lag-profile)")
+    args = parser.parse_args(argv)
+
+    server = None
+    target = args.target
+    interval = args.interval
+    if args.local:
+        from stub_server import AdsStore, AdsStubApp, StubServer
+        server = StubServer(AdsStubApp(AdsStore(visibility_delay=args.visibility_delay))).start()
+        target = server.base_url
+    if interval is None:
+        interval = DEFAULT_POLL_INTERVAL if args.local else DEFAULT_LIVE_POLL_INTERVAL
+    pool_size = args.concurrency * len(ENDPOINTS) + 1
+    try:
+        with AdsApiClient(target, pool_size=pool_size) as client:
+            def is_busy(seller_id: int) -> bool:
+                response = client.get(f"/{seller_id}/item")
+                return response.status_code == 200 and bool(response.json())
+
+            allocator = SellerIdAllocator.from_environment(probe=is_busy)
+            report = profile(client, allocator.next, samples=args.samples, concurrency=args.concurrency,
+                             horizon=args.horizon, interval=interval, percentile=args.percentile,
+                             safety=args.safety)
+    finally:
+        if server is not None:
+            server.stop()
+
+    print(report.format())
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as file:
+            json.dump(report.to_dict(), file, ensure_ascii=False, indent=2)
+    return 1 if report.failed or not report.samples else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
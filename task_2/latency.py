@@ -0,0 +1,96 @@
+"""
+Гистограмма задержек в стиле HdrHistogram: логарифмически-линейные корзины
+с фиксированной относительной точностью (~1%), запись за O(1) без хранения
+отдельных измерений. Значения хранятся в микросекундах.
+"""
+
+from typing import Dict, Iterable, Optional
+
+
+SUB_BUCKET_BITS = 7
+SUB_BUCKET_COUNT = 1 << SUB_BUCKET_BITS
+SUB_BUCKET_HALF = SUB_BUCKET_COUNT >> 1
+
+DEFAULT_PERCENTILES = (50.0, 95.0, 99.0)
+
+
+def _bucket_index(value: int) -> int:
+    if value < SUB_BUCKET_COUNT:
+        return value
+    shift = value.bit_length() - SUB_BUCKET_BITS
+    return shift * SUB_BUCKET_HALF + (value >> shift)
+
+
+def _bucket_upper(index: int) -> int:
+    """Наибольшее значение, попадающее в корзину index"""
+    if index < SUB_BUCKET_COUNT:
+        return index
+    shift = index // SUB_BUCKET_HALF - 1
+    sub = index - shift * SUB_BUCKET_HALF
+    return ((sub + 1) << shift) - 1
+
+
+class LatencyHistogram:
+    """Гистограмма задержек; record принимает секунды, отчеты - в миллисекундах"""
+
+    def __init__(self):
+        self.counts: Dict[int, int] = {}
+        self.count = 0
+        self.total_us = 0
+        self.min_us: Optional[int] = None
+        self.max_us = 0
+
+    def record(self, seconds: float):
+        self.record_us(int(seconds * 1_000_000))
+
+    def record_us(self, value: int):
+        value = max(value, 0)
+        index = _bucket_index(value)
+        self.counts[index] = self.counts.get(index, 0) + 1
+        self.count += 1
+        self.total_us += value
+        if self.min_us is None or value < self.min_us:
+            self.min_us = value
+        if value > self.max_us:
+            self.max_us = value
+
+    def merge(self, other: "LatencyHistogram") -> "LatencyHistogram":
+        for index, count in other.counts.items():
+            self.counts[index] = self.counts.get(index, 0) + count
+        self.count += other.count
+        self.total_us += other.total_us
+        if other.min_us is not None and (self.min_us is None or other.min_us < self.min_us):
+            self.min_us = other.min_us
+        self.max_us = max(self.max_us, other.max_us)
+        return self
+
+    def percentile_us(self, percentile: float) -> int:
+        """Значение, не меньше которого percentile% измерений (верхняя граница корзины)"""
+        if not self.count:
+            return 0
+        rank = max(1, int(round(percentile / 100.0 * self.count)))
+        seen = 0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            if seen >= rank:
+                return min(_bucket_upper(index), self.max_us)
+        return self.max_us
+
+    def percentile_ms(self, percentile: float) -> float:
+        return self.percentile_us(percentile) / 1000.0
+
+    @property
+    def mean_ms(self) -> float:
+        return self.total_us / self.count / 1000.0 if self.count else 0.0
+
+    def summary(self, percentiles: Iterable[float] = DEFAULT_PERCENTILES) -> Dict[str, float]:
+        """Сводка в миллисекундах: count, min, mean, pXX, max"""
+        result = {
+            "count": self.count,
+            "min_ms": (self.min_us or 0) / 1000.0,
+            "mean_ms": round(self.mean_ms, 3),
+        }
+        for percentile in percentiles:
+            result[f"p{percentile:g}_ms"] = self.percentile_ms(percentile)
+        result["max_ms"] = self.max_us / 1000.0
+        return result
@@ -0,0 +1,324 @@
+"""
+Нагрузочный режим для API объявлений.
+Использует те же формы запросов, что и функциональные тесты (build_ad_payload,
+список объявлений продавца, статистика), и неблокирующий ввод-вывод asyncio,
+поэтому один процесс выдерживает тысячи запросов в секунду.
+
+Примеры:
+    python loadgen.py --duration 30 --rps 500
+    python loadgen.py --target http://127.0.0.1:8080/api/1 --concurrency 64 --duration 10 \\
+        --mix create=1,item=4,seller=2,statistic=3
+    python loadgen.py --local --duration 5 --concurrency 32
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import ssl
+import sys
+import time
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+from ads import build_ad_payload, parse_item_id
+from api_client import BASE_URL
+from latency import LatencyHistogram
+from seller_ids import SellerIdAllocator
+
+
+ENDPOINTS = {
+    "create": "POST /item",
+    "item": "GET /item/:id",
+    "seller": "GET /:sellerID/item",
+    "statistic": "GET /statistic/:id",
+}
+DEFAULT_MIX = {"create": 1, "item": 3, "seller": 3, "statistic": 3}
+
+DEFAULT_DURATION = 10.0
+DEFAULT_CONCURRENCY = 32
+DEFAULT_TIMEOUT = 10.0
+DEFAULT_SELLER_COUNT = 16
+DEFAULT_SEED_ADS = 20
+MAX_KNOWN_ITEMS = 10_000
+
+
+class HttpError(Exception):
+    """Некорректный ответ сервера на уровне протокола HTTP"""
+
+
+class AsyncHttpConnection:
+    """Одно keep-alive соединение HTTP/1.1 поверх asyncio streams"""
+
+    def __init__(self, host: str, port: int, use_ssl: bool):
+        self.host = host
+        self.port = port
+        self.ssl_context = ssl.create_default_context() if use_ssl else None
+        self.host_header = host if port in (80, 443) else f"{host}:{port}"
+        self.reader: Optional[asyncio.StreamReader] = None
+        self.writer: Optional[asyncio.StreamWriter] = None
+
+    async def _open(self):
+        self.reader, self.writer = await asyncio.open_connection(self.host, self.port, ssl=self.ssl_context)
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+        self.reader = self.writer = None
+
+    async def request(self, method: str, path: str, body: Optional[bytes] = None) -> Tuple[int, bytes]:
+        if self.writer is None:
+            await self._open()
+        head = (f"{method} {path} HTTP/1.1\r\nHost: {self.host_header}\r\n"
+                f"Accept: application/json\r\nConnection: keep-alive\r\n")
+        if body is not None:
+            head += f"Content-Type: application/json\r\nContent-Length: {len(body)}\r\n"
+        self.writer.write(head.encode("latin-1") + b"\r\n" + (body or b""))
+        await self.writer.drain()
+
+        status_line = await self.reader.readline()
+        parts = status_line.split(None, 2)
+        if len(parts) < 2 or not parts[1].isdigit():
+            raise HttpError(f"некорректная строка статуса: {status_line!r}")
+        status = int(parts[1])
+        headers = {}
+        while True:
+            line = await self.reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+
+        if headers.get("transfer-encoding", "").lower() == "chunked":
+            chunks = []
+            while True:
+                size = int((await self.reader.readline()).split(b";")[0], 16)
+                if size == 0:
+                    await self.reader.readline()
+                    break
+                chunks.append(await self.reader.readexactly(size))
+                await self.reader.readline()
+            payload = b"".join(chunks)
+        elif "content-length" in headers:
+            payload = await self.reader.readexactly(int(headers["content-length"]))
+        else:
+            payload = await self.reader.read()
+            headers["connection"] = "close"
+        if headers.get("connection", "").lower() == "close":
+            self.close()
+        return status, payload
+
+
+class EndpointStats:
+    """Статистика по одному эндпоинту: гистограмма задержек и коды ответов"""
+
+    def __init__(self):
+        self.latency = LatencyHistogram()
+        self.statuses: Counter = Counter()
+
+    @property
+    def errors(self) -> int:
+        return sum(count for status, count in self.statuses.items()
+                   if not (isinstance(status, int) and status < 400))
+
+
+class LoadReport:
+    """Итоги прогона: пропускная способность, ошибки и перцентили по эндпоинтам"""
+
+    def __init__(self, elapsed: float, stats: Dict[str, EndpointStats]):
+        self.elapsed = elapsed
+        self.stats = stats
+
+    @property
+    def total(self) -> int:
+        return sum(endpoint.latency.count for endpoint in self.stats.values())
+
+    def to_dict(self) -> Dict:
+        endpoints = {}
+        for name, endpoint in self.stats.items():
+            endpoints[ENDPOINTS[name]] = {
+                "throughput_rps": round(endpoint.latency.count / self.elapsed, 1) if self.elapsed else 0.0,
+                "statuses": {str(status): count for status, count in endpoint.statuses.items()},
+                "error_rate": round(endpoint.errors / endpoint.latency.count, 4) if endpoint.latency.count else 0.0,
+                "latency": endpoint.latency.summary(),
+            }
+        return {
+            "elapsed_s": round(self.elapsed, 3),
+            "requests": self.total,
+            "throughput_rps": round(self.total / self.elapsed, 1) if self.elapsed else 0.0,
+            "endpoints": endpoints,
+        }
+
+    def format(self) -> str:
+        data = self.to_dict()
+        lines = [f"Запросов: {data['requests']} за {data['elapsed_s']} с, {data['throughput_rps']} rps", "",
+                 f"{'Эндпоинт':<22}{'rps':>9}{'ошибки':>9}{'p50 мс':>10}{'p95 мс':>10}"
+                 f"{'p99 мс':>10}{'max мс':>10}  коды"]
+        for endpoint, row in data["endpoints"].items():
+            latency = row["latency"]
+            statuses = ", ".join(f"{status}: {count}" for status, count in sorted(row["statuses"].items()))
+            lines.append(f"{endpoint:<22}{row['throughput_rps']:>9}{row['error_rate']:>9.2%}"
+                         f"{latency['p50_ms']:>10.2f}{latency['p95_ms']:>10.2f}"
+                         f"{latency['p99_ms']:>10.2f}{latency['max_ms']:>10.2f}  {statuses}")
+        return "\n".join(lines)
+
+
+class LoadRunner:
+    """
+    Нагрузка смесью запросов к четырем эндпоинтам.
+    rps задан - открытая модель: запросы отправляются по расписанию, задержка считается
+    от запланированного момента (без coordinated omission); иначе - закрытая модель
+    с concurrency одновременными клиентами.
+    """
+
+    def __init__(self, base_url: str = BASE_URL, mix: Optional[Dict[str, float]] = None,
+                 duration: float = DEFAULT_DURATION, rps: Optional[float] = None,
+                 concurrency: int = DEFAULT_CONCURRENCY, timeout: float = DEFAULT_TIMEOUT,
+                 seller_count: int = DEFAULT_SELLER_COUNT, seed_ads: int = DEFAULT_SEED_ADS):
+        parts = urlsplit(base_url.rstrip("/"))
+        self.host = parts.hostname
+        self.use_ssl = parts.scheme == "https"
+        self.port = parts.port or (443 if self.use_ssl else 80)
+        self.prefix = parts.path
+        self.mix = {name: weight for name, weight in (mix or DEFAULT_MIX).items() if weight > 0}
+        unknown = set(self.mix) - set(ENDPOINTS)
+        if unknown:
+            raise ValueError(f"Неизвестные эндпоинты в смеси: {sorted(unknown)}")
+        self.duration = duration
+        self.rps = rps
+        self.concurrency = concurrency
+        self.timeout = timeout
+        allocator = SellerIdAllocator(nonce=f"load-{time.time_ns()}")
+        self.seller_ids = [allocator.next() for _ in range(seller_count)]
+        self.seed_ads = seed_ads
+        self.item_ids: List[str] = []
+        self.stats = {name: EndpointStats() for name in ENDPOINTS}
+        self._names = list(self.mix)
+        self._weights = [self.mix[name] for name in self._names]
+
+    def _build(self, name: str) -> Tuple[str, str, Optional[bytes]]:
+        if name == "create":
+            payload = build_ad_payload(random.choice(self.seller_ids), name="Load Test Ad",
+                                       price=random.randint(1, 100_000))
+            return "POST", f"{self.prefix}/item", json.dumps(payload).encode("utf-8")
+        if name == "seller":
+            return "GET", f"{self.prefix}/{random.choice(self.seller_ids)}/item", None
+        item_id = random.choice(self.item_ids)
+        path = f"/item/{item_id}" if name == "item" else f"/statistic/{item_id}"
+        return "GET", self.prefix + path, None
+
+    async def _issue(self, pool: asyncio.Queue, name: str, started: float):
+        # Пока нет известных id, чтения по id заменяются созданием
+        if name in ("item", "statistic") and not self.item_ids:
+            name = "create"
+        method, path, body = self._build(name)
+        connection = await pool.get()
+        try:
+            status, payload = await asyncio.wait_for(connection.request(method, path, body), self.timeout)
+        except Exception as exc:
+            connection.close()
+            status, payload = f"error:{type(exc).__name__}", b""
+        finally:
+            pool.put_nowait(connection)
+        stats = self.stats[name]
+        stats.latency.record(time.perf_counter() - started)
+        stats.statuses[status] += 1
+        if name == "create" and status == 200 and len(self.item_ids) < MAX_KNOWN_ITEMS:
+            try:
+                item_id = parse_item_id(json.loads(payload).get("status"))
+            except ValueError:
+                item_id = None
+            if item_id:
+                self.item_ids.append(item_id)
+
+    async def _closed_loop(self, pool: asyncio.Queue, deadline: float):
+        while time.perf_counter() < deadline:
+            name = random.choices(self._names, self._weights)[0]
+            await self._issue(pool, name, time.perf_counter())
+
+    async def _open_loop(self, pool: asyncio.Queue, deadline: float):
+        interval = 1.0 / self.rps
+        scheduled = time.perf_counter()
+        tasks = set()
+        while scheduled < deadline:
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            name = random.choices(self._names, self._weights)[0]
+            task = asyncio.ensure_future(self._issue(pool, name, scheduled))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+            scheduled += interval
+        if tasks:
+            await asyncio.gather(*tasks)
+
+    async def run(self) -> LoadReport:
+        pool: asyncio.Queue = asyncio.Queue()
+        for _ in range(self.concurrency):
+            pool.put_nowait(AsyncHttpConnection(self.host, self.port, self.use_ssl))
+        # Предварительно создаем объявления, чтобы было что читать по id
+        await asyncio.gather(*(self._issue(pool, "create", time.perf_counter()) for _ in range(self.seed_ads)))
+        self.stats = {name: EndpointStats() for name in ENDPOINTS}
+
+        started = time.perf_counter()
+        deadline = started + self.duration
+        try:
+            if self.rps:
+                await self._open_loop(pool, deadline)
+            else:
+                await asyncio.gather(*(self._closed_loop(pool, deadline) for _ in range(self.concurrency)))
+        finally:
+            while not pool.empty():
+                pool.get_nowait().close()
+        elapsed = time.perf_counter() - started
+        return LoadReport(elapsed, {name: stats for name, stats in self.stats.items() if stats.latency.count})
+
+
+def parse_mix(value: str) -> Dict[str, float]:
+    """Разбор смеси вида create=1,item=3,seller=3,statistic=3"""
+    mix = {}
+    for part in value.split(","):
+        name, _, weight = part.partition("=")
+        mix[name.strip()] = float(weight or 1)
+    return mix
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Нагрузочный прогон API объявлений")
+    parser.add_argument("--target", default=BASE_URL, help=f"Base URL API (по умолчанию {BASE_URL})")
+    parser.add_argument("--local", action="store_true",
+                        help="Поднять локальную заглушку stub_server и нагружать ее")
+    parser.add_argument("--duration", type=float, default=DEFAULT_DURATION, help="Длительность, сек")
+    parser.add_argument("--rps", type=float, default=None, help="Целевая частота запросов (открытая модель)")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY,
+                        help="Число соединений / одновременных клиентов")
+    parser.add_argument("--mix", type=parse_mix, default=DEFAULT_MIX,
+                        help="Веса эндпоинтов: create=1,item=3,seller=3,statistic=3")
+    parser.add_argument("--timeout", type=float, default=DEFAULT_TIMEOUT, help="Таймаут запроса, сек")
+    parser.add_argument("--json", dest="json_path", default=None, help="Сохранить отчет в JSON")
+    args = parser.parse_args(argv)
+
+    server = None
+    target = args.target
+    if args.local:
+        from stub_server import StubServer
+        server = StubServer().start()
+        target = server.base_url
+    try:
+        runner = LoadRunner(target, mix=args.mix, duration=args.duration, rps=args.rps,
+                            concurrency=args.concurrency, timeout=args.timeout)
+        report = asyncio.run(runner.run())
+    finally:
+        if server is not None:
+            server.stop()
+
+    print(report.format())
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as file:
+            json.dump(report.to_dict(), file, ensure_ascii=False, indent=2)
+    return 0 if report.total else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
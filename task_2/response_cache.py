@@ -0,0 +1,184 @@
+"""
+Необязательный кэш ответов GET для клиента API объявлений.
+
+Ключ - путь запроса вместе с параметрами. Хранятся только ответы 200 на
+GET /item/:id и GET /:sellerID/item (GET /statistic/:id - только при
+include_statistic: это счетчики, и каждое чтение может их менять).
+
+Согласованность сохраняется так:
+- запись с ETag не отдается без запроса: клиент переспрашивает сервер с
+  If-None-Match и при 304 возвращает сохраненное тело (экономится тело ответа,
+  но не обращение к серверу);
+- запись без ETag отдается без запроса только ttl секунд (по умолчанию 0 - никогда),
+  поэтому ожидание видимости запаздывает не больше чем на ttl;
+- успешный POST /item удаляет список продавца из тела запроса;
+- кэшируются только 200: отсутствующее объявление при следующем запросе
+  проверяется заново.
+"""
+
+import json
+import re
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Optional
+from urllib.parse import urlencode
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+
+DEFAULT_MAX_ENTRIES = 256
+DEFAULT_TTL = 0.0
+
+_ITEM_RE = re.compile(r"^/item/[^/]+$")
+_SELLER_RE = re.compile(r"^/(\d+)/item$")
+_STATISTIC_RE = re.compile(r"^/statistic/[^/]+$")
+
+
+def _route(path: str) -> str:
+    return "/" + path.split("?", 1)[0].strip("/")
+
+
+@dataclass
+class CacheEntry:
+    status: int
+    headers: Dict[str, str]
+    content: bytes
+    url: str
+    encoding: Optional[str]
+    etag: Optional[str]
+    stored_at: float
+
+    @classmethod
+    def from_response(cls, response: requests.Response, now: float) -> "CacheEntry":
+        return cls(response.status_code, dict(response.headers), response.content, response.url,
+                   response.encoding, response.headers.get("ETag"), now)
+
+    def response(self) -> requests.Response:
+        """Новый объект ответа на каждое обращение: вызывающий код может менять результат json()"""
+        response = requests.Response()
+        response.status_code = self.status
+        response.headers = CaseInsensitiveDict(self.headers)
+        response._content = self.content
+        response._content_consumed = True
+        response.url = self.url
+        response.encoding = self.encoding
+        return response
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    revalidated: int = 0
+    misses: int = 0
+    evictions: int = 0
+    invalidations: int = 0
+
+    def format(self) -> str:
+        return (f"кэш ответов: без запроса {self.hits}, 304 {self.revalidated}, промахов {self.misses}, "
+                f"вытеснено {self.evictions}, сброшено {self.invalidations}")
+
+
+class ResponseCache:
+    """Потокобезопасный LRU-кэш ответов GET с проверкой по ETag"""
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES, ttl: float = DEFAULT_TTL,
+                 include_statistic: bool = False, clock: Callable[[], float] = time.monotonic):
+        if max_entries < 1:
+            raise ValueError(f"max_entries должен быть положительным, получено {max_entries}")
+        self.max_entries = max_entries
+        # Сколько секунд запись без ETag отдается без обращения к серверу
+        self.ttl = ttl
+        self.include_statistic = include_statistic
+        self.stats = CacheStats()
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, CacheEntry]" = OrderedDict()
+        # Номер сброса: ответ запроса, начатого до POST, не должен вернуть в кэш старый список
+        self.generation = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def cacheable(self, path: str) -> bool:
+        route = _route(path)
+        if _ITEM_RE.match(route) or _SELLER_RE.match(route):
+            return True
+        return self.include_statistic and bool(_STATISTIC_RE.match(route))
+
+    @staticmethod
+    def key(path: str, params: Any = None) -> str:
+        key = _route(path)
+        if params:
+            items = params.items() if isinstance(params, dict) else params
+            key += "?" + urlencode(sorted((str(name), str(value)) for name, value in items))
+        return key
+
+    def lookup(self, key: str) -> Optional[CacheEntry]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def fresh(self, entry: CacheEntry) -> bool:
+        """Можно ли отдать запись без обращения к серверу"""
+        return entry.etag is None and self._clock() - entry.stored_at < self.ttl
+
+    def hit(self, entry: CacheEntry) -> requests.Response:
+        with self._lock:
+            self.stats.hits += 1
+        return entry.response()
+
+    def revalidated(self, entry: CacheEntry) -> requests.Response:
+        """Сервер ответил 304: сохраненное тело по-прежнему актуально"""
+        with self._lock:
+            self.stats.revalidated += 1
+            entry.stored_at = self._clock()
+        return entry.response()
+
+    def store(self, key: str, response: requests.Response, generation: int):
+        """Сохранение ответа запроса, начатого при номере сброса generation"""
+        with self._lock:
+            self.stats.misses += 1
+            if response.status_code != 200 or generation != self.generation:
+                self._entries.pop(key, None)
+                return
+            self._entries[key] = CacheEntry.from_response(response, self._clock())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.stats.evictions += 1
+
+    def invalidate_seller(self, seller_id: Optional[int]):
+        """Сброс списка продавца (с любыми параметрами); None - всех списков"""
+        with self._lock:
+            self.generation += 1
+            stale = []
+            for key in self._entries:
+                match = _SELLER_RE.match(key.split("?", 1)[0])
+                if match and (seller_id is None or int(match.group(1)) == seller_id):
+                    stale.append(key)
+            for key in stale:
+                del self._entries[key]
+            self.stats.invalidations += len(stale)
+
+    def invalidate_create(self, path: str, kwargs: Dict[str, Any]):
+        """Успешный POST /item: сброс списка продавца из тела запроса (или всех списков, если его не разобрать)"""
+        if _route(path) != "/item":
+            return
+        payload = kwargs.get("json")
+        if payload is None and kwargs.get("data") is not None:
+            try:
+                payload = json.loads(kwargs["data"])
+            except (TypeError, ValueError):
+                payload = None
+        seller_id = payload.get("sellerID") if isinstance(payload, dict) else None
+        self.invalidate_seller(seller_id if isinstance(seller_id, int) else None)
+
+    def clear(self):
+        with self._lock:
+            self.generation += 1
+            self._entries.clear()
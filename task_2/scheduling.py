@@ -0,0 +1,276 @@
+"""
+Порядок и распределение тестов по сохраненной истории длительностей.
+
+После каждого прогона длительность теста (setup + call + teardown) сглаживается
+с прошлыми значениями и сохраняется в JSON. В следующем прогоне тесты идут от
+долгих к коротким: ожидающие согласованности данных тесты стартуют первыми и не
+оказываются в хвосте на одном воркере. Дешевые тесты (быстрее порога) одного
+модуля собираются в одну пачку и выполняются подряд. С pytest-xdist и
+--dist loadgroup тесты раскладываются по воркерам жадным алгоритмом LPT
+(самый долгий - на наименее загруженный воркер) через метки xdist_group.
+
+В итогах печатаются прогнозный и фактический критический путь - воркер,
+который заканчивает последним, и его самые долгие тесты.
+
+Планирование включается явно (--ads-schedule duration или file): иначе обычный
+прогон менял бы порядок тестов по прошлому запуску и переписывал файл истории.
+"""
+
+import heapq
+import json
+import os
+import statistics
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Sequence, Set, Tuple
+
+import pytest
+
+
+PLUGIN_NAME = "ads_schedule"
+HISTORY_VERSION = 1
+DEFAULT_HISTORY_FILE = ".ads_durations.json"
+# none - плагин не подключается: порядок файлов, история не читается и не пишется
+MODES = ("none", "duration", "file")
+# Вес нового замера при сглаживании: половина - последний прогон, половина - история
+DEFAULT_SMOOTHING = 0.5
+# Тесты быстрее порога считаются дешевыми и объединяются в пачку
+DEFAULT_CHEAP_SECONDS = 0.05
+# Оценка для тестов без истории, если истории нет совсем
+DEFAULT_UNKNOWN_SECONDS = 1.0
+GROUP_PREFIX = "ads-lpt-"
+MAIN_WORKER = "main"
+DEFAULT_PATH_TESTS = 5
+
+
+def history_key(nodeid: str) -> str:
+    """
+    Ключ истории: имя файла и путь внутри него. nodeid зависит от rootdir,
+    а под xdist --dist loadgroup еще и содержит суффикс «@группа».
+    """
+    if nodeid.rfind("@") > nodeid.rfind("]"):
+        nodeid = nodeid[:nodeid.rfind("@")]
+    file_part, _, test_path = nodeid.partition("::")
+    return f"{os.path.basename(file_part)}::{test_path}"
+
+
+def _module_of(key: str) -> str:
+    return key.partition("::")[0]
+
+
+class DurationHistory:
+    """Сглаженные длительности тестов, сохраняемые между прогонами"""
+
+    def __init__(self, path: Optional[str], smoothing: float = DEFAULT_SMOOTHING):
+        self.path = path
+        self.smoothing = smoothing
+        self.durations: Dict[str, float] = {}
+        if path and os.path.exists(path):
+            with open(path, encoding="utf-8") as file:
+                data = json.load(file)
+            if data.get("v") == HISTORY_VERSION:
+                self.durations = {key: float(value) for key, value in data.get("durations", {}).items()}
+
+    def estimate(self, key: str) -> float:
+        """Прогноз длительности; для нового теста - медиана известных"""
+        if key in self.durations:
+            return self.durations[key]
+        return self.default_estimate
+
+    @property
+    def default_estimate(self) -> float:
+        if not self.durations:
+            return DEFAULT_UNKNOWN_SECONDS
+        return statistics.median(self.durations.values())
+
+    def update(self, measured: Dict[str, float]):
+        for key, seconds in measured.items():
+            previous = self.durations.get(key)
+            self.durations[key] = seconds if previous is None else (
+                self.smoothing * seconds + (1 - self.smoothing) * previous)
+
+    def save(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(self.path, "w", encoding="utf-8") as file:
+            json.dump({"v": HISTORY_VERSION,
+                       "durations": {key: round(value, 4) for key, value in sorted(self.durations.items())}},
+                      file, ensure_ascii=False, indent=1)
+            file.write("\n")
+
+
+def plan(keys: Sequence[str], history: DurationHistory, workers: int = 1,
+         cheap_seconds: float = DEFAULT_CHEAP_SECONDS) -> List[List[int]]:
+    """
+    Расписание: для каждого воркера - индексы тестов в порядке выполнения.
+    Единица распределения - дорогой тест или пачка дешевых тестов одного модуля;
+    единицы раздаются LPT. Внутри воркера тесты одного модуля идут подряд
+    (иначе фикстуры scope="module" пересоздаются), модули - по убыванию суммарной
+    длительности, в модуле - дорогие по убыванию, затем пачка дешевых в исходном порядке.
+    """
+    estimates = [history.estimate(key) for key in keys]
+    units: List[Tuple[float, List[int]]] = []
+    cheap: Dict[str, List[int]] = OrderedDict()
+    for index, key in enumerate(keys):
+        if key in history.durations and estimates[index] < cheap_seconds:
+            cheap.setdefault(_module_of(key), []).append(index)
+        else:
+            units.append((estimates[index], [index]))
+    units.extend((sum(estimates[index] for index in batch), batch) for batch in cheap.values())
+    # sorted устойчив: при равных оценках сохраняется исходный порядок
+    units.sort(key=lambda unit: -unit[0])
+
+    bins: List[List[int]] = [[] for _ in range(max(1, workers))]
+    loads = [(0.0, number) for number in range(len(bins))]
+    for cost, indexes in units:
+        load, number = heapq.heappop(loads)
+        bins[number].extend(indexes)
+        heapq.heappush(loads, (load + cost, number))
+
+    ordered = []
+    for indexes in bins:
+        modules: Dict[str, List[int]] = OrderedDict()
+        for index in indexes:
+            modules.setdefault(_module_of(keys[index]), []).append(index)
+        totals = {module: sum(estimates[index] for index in members) for module, members in modules.items()}
+        ordered.append([index for module in sorted(modules, key=lambda name: -totals[name])
+                        for index in modules[module]])
+    return ordered
+
+
+def simulate(durations: Sequence[float], workers: int) -> List[List[int]]:
+    """Раздача по порядку на первый освободившийся воркер (как --dist load); индексы по воркерам"""
+    bins: List[List[int]] = [[] for _ in range(max(1, workers))]
+    loads = [(0.0, number) for number in range(len(bins))]
+    for index, seconds in enumerate(durations):
+        load, number = heapq.heappop(loads)
+        bins[number].append(index)
+        heapq.heappush(loads, (load + seconds, number))
+    return bins
+
+
+def _group_of(nodeid: str) -> Optional[str]:
+    if nodeid.rfind("@") > nodeid.rfind("]"):
+        return nodeid[nodeid.rfind("@") + 1:]
+    return None
+
+
+class SchedulePlugin:
+    """Плагин pytest: порядок по истории, метки xdist_group, запись длительностей и отчет о критическом пути"""
+
+    def __init__(self, history_path: Optional[str], mode: str = "duration",
+                 cheap_seconds: float = DEFAULT_CHEAP_SECONDS):
+        self.history = DurationHistory(history_path)
+        # Снимок истории до обновления в sessionfinish - прогноз сравнивается с фактом в итогах
+        self.estimates = dict(self.history.durations)
+        self.default_estimate = self.history.default_estimate
+        self.mode = mode
+        self.cheap_seconds = cheap_seconds
+        self.workers = 1
+        self.worker_nodes: Set[str] = set()
+        self.collected: List[str] = []
+        self.measured: Dict[str, float] = {}
+        self.worker_of: Dict[str, str] = {}
+
+    @pytest.hookimpl(tryfirst=True)
+    def pytest_collection_modifyitems(self, config, items):
+        # tryfirst: метки xdist_group должны появиться до того, как xdist допишет группу к nodeid
+        workerinput = getattr(config, "workerinput", None)
+        # На воркере xdist сбрасывает dist в "no", а --dist loadgroup сохраняет в option.loadgroup
+        loadgroup = workerinput is not None and bool(getattr(config.option, "loadgroup", False))
+        workers = workerinput["workercount"] if loadgroup else 1
+        if self.mode == "duration":
+            keys = [history_key(item.nodeid) for item in items]
+            bins = plan(keys, self.history, workers, self.cheap_seconds)
+            reordered = []
+            for number, indexes in enumerate(bins):
+                for index in indexes:
+                    item = items[index]
+                    if loadgroup and not item.get_closest_marker("xdist_group"):
+                        item.add_marker(pytest.mark.xdist_group(f"{GROUP_PREFIX}{number}"))
+                    reordered.append(item)
+            items[:] = reordered
+
+    def pytest_collection_finish(self, session):
+        # После отбора по -k/-m; на воркерах xdist порядок контроллеру передает сам xdist
+        if not hasattr(session.config, "workerinput"):
+            self.collected = [item.nodeid for item in session.items]
+
+    @pytest.hookimpl(optionalhook=True)
+    def pytest_xdist_node_collection_finished(self, node, ids):
+        # Контроллер xdist сам тесты не собирает: порядок и группы приходят от воркеров
+        self.collected = list(ids)
+        self.worker_nodes.add(node.gateway.id)
+        self.workers = len(self.worker_nodes)
+
+    def pytest_runtest_logreport(self, report):
+        key = history_key(report.nodeid)
+        self.measured[key] = self.measured.get(key, 0.0) + report.duration
+        node = getattr(report, "node", None)
+        self.worker_of[key] = node.gateway.id if node is not None else MAIN_WORKER
+
+    def pytest_sessionfinish(self, session):
+        # Историю пишет только контроллер: отчеты воркеров xdist приходят к нему
+        if hasattr(session.config, "workerinput") or not self.history.path or not self.measured:
+            return
+        self.history.update(self.measured)
+        self.history.save()
+
+    def estimate(self, key: str) -> float:
+        return self.estimates.get(key, self.default_estimate)
+
+    def predicted_path(self, estimates: Dict[str, float]) -> Tuple[float, str, List[str]]:
+        """(длительность, воркер, тесты) прогнозного критического пути по собранному порядку"""
+        keys = [history_key(nodeid) for nodeid in self.collected]
+        groups = [_group_of(nodeid) for nodeid in self.collected]
+        if any(groups):
+            lanes: Dict[str, List[str]] = OrderedDict()
+            for key, group in zip(keys, groups):
+                lanes.setdefault(group or key, []).append(key)
+        else:
+            bins = simulate([estimates[key] for key in keys], self.workers)
+            lanes = OrderedDict((f"#{number}", [keys[index] for index in indexes])
+                                for number, indexes in enumerate(bins))
+        lane, members = max(lanes.items(), key=lambda entry: sum(estimates[key] for key in entry[1]))
+        return sum(estimates[key] for key in members), lane, members
+
+    def actual_path(self) -> Tuple[float, str, List[str]]:
+        """(длительность, воркер, тесты) фактического критического пути"""
+        lanes: Dict[str, List[str]] = OrderedDict()
+        for key, worker in self.worker_of.items():
+            lanes.setdefault(worker, []).append(key)
+        lane, members = max(lanes.items(), key=lambda entry: sum(self.measured[key] for key in entry[1]))
+        return sum(self.measured[key] for key in members), lane, members
+
+    def to_dict(self, estimates: Dict[str, float]) -> Dict[str, Any]:
+        result: Dict[str, Any] = {"workers": self.workers}
+        if self.collected:
+            seconds, lane, members = self.predicted_path(estimates)
+            result["predicted"] = {"seconds": round(seconds, 3), "lane": lane, "tests": len(members)}
+        if self.measured:
+            seconds, lane, members = self.actual_path()
+            result["actual"] = {"seconds": round(seconds, 3), "lane": lane, "tests": len(members),
+                                "slowest": [{"test": key, "seconds": round(self.measured[key], 3),
+                                             "predicted": round(estimates.get(key, 0.0), 3)}
+                                            for key in sorted(members, key=lambda name: -self.measured[name])
+                                            [:DEFAULT_PATH_TESTS]]}
+        return result
+
+    def pytest_terminal_summary(self, terminalreporter):
+        if hasattr(terminalreporter.config, "workerinput") or not self.measured:
+            return
+        keys = {history_key(nodeid) for nodeid in self.collected} | set(self.measured)
+        estimates = {key: self.estimate(key) for key in keys}
+        summary = self.to_dict(estimates)
+        terminalreporter.write_sep("=", "критический путь тестов")
+        if "predicted" in summary:
+            predicted = summary["predicted"]
+            terminalreporter.write_line(f"Прогноз:     {predicted['seconds']:>8.2f} с  ({predicted['lane']}, "
+                                        f"тестов: {predicted['tests']}, воркеров: {self.workers})")
+        actual = summary["actual"]
+        terminalreporter.write_line(f"Фактически:  {actual['seconds']:>8.2f} с  ({actual['lane']}, "
+                                    f"тестов: {actual['tests']})")
+        for entry in actual["slowest"]:
+            terminalreporter.write_line(f"  {entry['seconds']:>8.2f} с  (прогноз {entry['predicted']:.2f} с)  "
+                                        f"{entry['test']}")
+
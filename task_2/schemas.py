@@ -0,0 +1,197 @@
+"""
+Декларативные схемы ответов API объявлений и их компиляция в функции проверки.
+
+Схема описывается один раз (ITEM, STATISTICS, CREATE_RESPONSE ниже), а compile_schema генерирует по ней
+исходный код функции без циклов по описанию полей и без рекурсии по схеме -
+только прямые проверки типов. Списки объявлений проверяются за один проход,
+все нарушения собираются, а не обрываются на первом.
+
+Расхождение sellerId/sellerID описано явно: поле sellerId принимает алиас sellerID,
+если заданы оба - значения обязаны совпадать.
+"""
+
+import re
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+
+Violations = List[str]
+Validator = Callable[[Any], Violations]
+
+_MISSING = object()
+_is_uuid = re.compile(r"[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}").fullmatch
+
+
+@dataclass(frozen=True)
+class Field:
+    """Описание поля: тип, обязательность, алиасы и дополнительные ограничения"""
+    type: type
+    required: bool = True
+    aliases: Tuple[str, ...] = ()
+    minimum: Optional[int] = None
+    non_empty: bool = False
+    uuid: bool = False
+    schema: Optional["Schema"] = None
+
+
+@dataclass(frozen=True)
+class Schema:
+    """Схема JSON-объекта: имя (для сгенерированной функции) и поля"""
+    name: str
+    fields: Tuple[Tuple[str, Field], ...]
+
+    @classmethod
+    def of(cls, name: str, fields: Dict[str, Field]) -> "Schema":
+        return cls(name, tuple(fields.items()))
+
+
+def _field_lines(name: str, field: Field, nested: Dict[str, str]) -> List[str]:
+    lines = [f"    value = obj.get({name!r}, _MISSING)"]
+    for alias in field.aliases:
+        lines += [
+            f"    alias = obj.get({alias!r}, _MISSING)",
+            "    if value is _MISSING:",
+            "        value = alias",
+            "    elif alias is not _MISSING and alias != value:",
+            f"        errors.append(path + '.{name}: значения {name} и {alias} различаются')",
+        ]
+    missing = "    if value is _MISSING:"
+    if field.required:
+        names = " / ".join((name,) + field.aliases)
+        lines += [missing, f"        errors.append(path + '.{name}: отсутствует обязательное поле {names}')"]
+    else:
+        lines += [missing, "        pass"]
+    type_name = field.type.__name__
+    lines += [
+        f"    elif type(value) is not {type_name}:",
+        f"        errors.append(path + '.{name}: ожидался {type_name}, получен ' + type(value).__name__)",
+    ]
+    if field.minimum is not None:
+        lines += [
+            f"    elif value < {field.minimum!r}:",
+            f"        errors.append(path + '.{name}: значение ' + repr(value) + ' меньше {field.minimum!r}')",
+        ]
+    if field.non_empty:
+        lines += ["    elif not value:", f"        errors.append(path + '.{name}: пустое значение')"]
+    if field.uuid:
+        lines += ["    elif not _is_uuid(value):",
+                  f"        errors.append(path + '.{name}: ' + repr(value) + ' не является UUID')"]
+    if field.schema is not None:
+        lines += ["    else:", f"        {nested[field.schema.name]}(value, path + '.{name}', errors)"]
+    return lines
+
+
+def _generate(schema: Schema, namespace: Dict[str, Any]) -> str:
+    """Генерирует функцию check_<name>(obj, path, errors) и вложенные для нее"""
+    function_name = f"check_{schema.name}"
+    if function_name in namespace:
+        return function_name
+    nested = {}
+    for _, field in schema.fields:
+        if field.schema is not None:
+            nested[field.schema.name] = _generate(field.schema, namespace)
+    lines = [
+        f"def {function_name}(obj, path, errors):",
+        "    if type(obj) is not dict:",
+        "        errors.append(path + ': ожидался объект, получен ' + type(obj).__name__)",
+        "        return",
+    ]
+    for name, field in schema.fields:
+        lines += _field_lines(name, field, nested)
+    exec(compile("\n".join(lines), f"<schema {schema.name}>", "exec"), namespace)
+    return function_name
+
+
+def _namespace() -> Dict[str, Any]:
+    return {"_MISSING": _MISSING, "_is_uuid": _is_uuid}
+
+
+def compile_schema(schema: Schema) -> Validator:
+    """Функция проверки одного объекта: возвращает список нарушений (пустой - объект валиден)"""
+    namespace = _namespace()
+    check = namespace[_generate(schema, namespace)]
+
+    def validate(obj: Any, path: str = "$") -> Violations:
+        errors: Violations = []
+        check(obj, path, errors)
+        return errors
+
+    return validate
+
+
+def compile_list_schema(schema: Schema, owner_field: Optional[str] = None) -> Callable[..., Violations]:
+    """
+    Функция проверки JSON-массива объектов за один проход с накоплением всех нарушений.
+    owner_field - поле, значение которого можно сверить с ожидаемым (validate(data, owner=...)).
+    """
+    namespace = _namespace()
+    check = namespace[_generate(schema, namespace)]
+    owner_aliases = dict(schema.fields)[owner_field].aliases if owner_field else ()
+
+    def validate(data: Any, path: str = "$", owner: Any = None) -> Violations:
+        if type(data) is not list:
+            return [f"{path}: ожидался массив, получен {type(data).__name__}"]
+        errors: Violations = []
+        for index, obj in enumerate(data):
+            # Путь строится только при нарушениях: на валидных данных это лишняя строка на элемент
+            seen = len(errors)
+            check(obj, "", errors)
+            if owner is not None and type(obj) is dict:
+                value = obj.get(owner_field, _MISSING)
+                for alias in owner_aliases:
+                    if value is _MISSING:
+                        value = obj.get(alias, _MISSING)
+                if value is not _MISSING and value != owner:
+                    errors.append(f".{owner_field}: значение {value!r}, ожидалось {owner!r}")
+            if len(errors) != seen:
+                errors[seen:] = [f"{path}[{index}]{error}" for error in errors[seen:]]
+        return errors
+
+    return validate
+
+
+STATISTICS = Schema.of("statistics", {
+    "likes": Field(int, minimum=0),
+    "viewCount": Field(int, minimum=0),
+    "contacts": Field(int, minimum=0),
+})
+
+ITEM = Schema.of("item", {
+    "id": Field(str, uuid=True),
+    "sellerId": Field(int, aliases=("sellerID",)),
+    "name": Field(str),
+    "price": Field(int),
+    "statistics": Field(dict, schema=STATISTICS),
+    "createdAt": Field(str, non_empty=True),
+})
+
+CREATE_RESPONSE = Schema.of("create_response", {
+    "status": Field(str, non_empty=True),
+})
+
+validate_item = compile_schema(ITEM)
+validate_item_list = compile_list_schema(ITEM, owner_field="sellerId")
+validate_statistic = compile_schema(STATISTICS)
+validate_statistic_list = compile_list_schema(STATISTICS)
+validate_create_response = compile_schema(CREATE_RESPONSE)
+
+
+def seller_id_of(ad: Dict[str, Any]) -> Any:
+    """sellerId объявления с учетом алиаса sellerID (см. схему ITEM)"""
+    return ad["sellerId"] if "sellerId" in ad else ad.get("sellerID")
+
+
+def listing_violations(data: Any, seller_id: Optional[int] = None, path: str = "$") -> Violations:
+    """Проверка списка объявлений по схеме и, если задан seller_id, принадлежности продавцу"""
+    return validate_item_list(data, path, owner=seller_id)
+
+
+def format_violations(errors: Sequence[str], limit: int = 20, total: Optional[int] = None) -> str:
+    """
+    Сообщение для assert: первые limit нарушений и общее число.
+    total - общее число, если errors содержит только часть нарушений (потоковая проверка).
+    """
+    total = len(errors) if total is None else total
+    shown = "\n".join(errors[:limit])
+    rest = f"\n... и еще {total - min(limit, len(errors))}" if total > min(limit, len(errors)) else ""
+    return f"Нарушений схемы: {total}\n{shown}{rest}"
@@ -0,0 +1,127 @@
+"""
+Выдача sellerID без коллизий между параллельными воркерами pytest-xdist
+и одновременными запусками CI на общем сервисе.
+
+Диапазон 111111-999999 делится на непересекающиеся срезы по номеру воркера.
+Внутри среза sellerID выдаются блоками; начальный блок зависит от nonce запуска,
+поэтому разные запуски стартуют в разных местах. Перед использованием блока
+делается одна проверка: у первого sellerID блока не должно быть объявлений.
+
+keyed(key) дает sellerID, которые зависят только от nonce и ключа (например, теста),
+а не от порядка вызовов: так тест с заданным зерном воспроизводится и отдельно,
+и в другом порядке, и на другом воркере.
+"""
+
+import hashlib
+import os
+import threading
+from typing import Callable, Optional, Set, Tuple
+
+from ads import SELLER_ID_MAX, SELLER_ID_MIN
+
+
+DEFAULT_BLOCK_SIZE = 64
+MAX_BUSY_BLOCKS = 32
+
+
+def _worker_from_env():
+    """Номер воркера и число воркеров xdist (0 и 1 без xdist)"""
+    worker = os.environ.get("PYTEST_XDIST_WORKER", "gw0")
+    index = int(worker[2:]) if worker.startswith("gw") and worker[2:].isdigit() else 0
+    count = int(os.environ.get("PYTEST_XDIST_WORKER_COUNT") or 1)
+    return index, max(count, 1)
+
+
+def free_range(taken: Tuple[int, int], low: int = SELLER_ID_MIN,
+               high: int = SELLER_ID_MAX) -> Tuple[int, int]:
+    """Больший из свободных участков low..high ниже или выше занятого диапазона taken (включительно)"""
+    below = (low, min(high, taken[0] - 1))
+    above = (max(low, taken[1] + 1), high)
+    best = max(below, above, key=lambda part: part[1] - part[0])
+    if best[1] < best[0]:
+        raise ValueError(f"Диапазон {taken[0]}-{taken[1]} занимает все sellerID {low}-{high}")
+    return best
+
+
+def run_nonce() -> str:
+    """
+    Идентификатор запуска: ADS_RUN_NONCE (например, номер пайплайна CI),
+    иначе общий для всех воркеров testrunuid xdist, иначе случайное значение
+    """
+    return (os.environ.get("ADS_RUN_NONCE")
+            or os.environ.get("PYTEST_XDIST_TESTRUNUID")
+            or os.urandom(8).hex())
+
+
+class SellerIdAllocator:
+    """Потокобезопасная выдача sellerID из среза воркера"""
+
+    def __init__(self, worker_index: int = 0, worker_count: int = 1, nonce: str = "",
+                 block_size: int = DEFAULT_BLOCK_SIZE, probe: Optional[Callable[[int], bool]] = None,
+                 low: int = SELLER_ID_MIN, high: int = SELLER_ID_MAX):
+        if not 0 <= worker_index < worker_count:
+            raise ValueError(f"Некорректный номер воркера {worker_index} из {worker_count}")
+        self.nonce = nonce
+        self.low, self.high = low, high
+        span = (high - low + 1) // worker_count
+        if span < 1:
+            raise ValueError(f"В диапазоне {low}-{high} не хватает sellerID на {worker_count} воркеров")
+        self.slice_start = low + worker_index * span
+        self.slice_end = high + 1 if worker_index == worker_count - 1 else self.slice_start + span
+        self.block_size = min(block_size, self.slice_end - self.slice_start)
+        self.block_count = (self.slice_end - self.slice_start) // self.block_size
+        # probe(seller_id) -> True, если sellerID уже занят (у него есть объявления)
+        self.probe = probe
+        digest = hashlib.sha256(f"{nonce}:{worker_index}".encode()).digest()
+        self._block = int.from_bytes(digest[:8], "big") % self.block_count
+        self._next: Optional[int] = None
+        self._block_end = 0
+        self._blocks_used = 0
+        self._lock = threading.Lock()
+        # Начала блоков, занятых этим аллокатором и его keyed-аллокаторами в текущем процессе
+        self._claimed: Set[int] = set()
+        self._claimed_lock = threading.Lock()
+
+    @classmethod
+    def from_environment(cls, probe: Optional[Callable[[int], bool]] = None,
+                         block_size: int = DEFAULT_BLOCK_SIZE, nonce: Optional[str] = None,
+                         low: int = SELLER_ID_MIN, high: int = SELLER_ID_MAX) -> "SellerIdAllocator":
+        """Аллокатор для текущего воркера xdist и текущего запуска (nonce - явный идентификатор запуска)"""
+        index, count = _worker_from_env()
+        return cls(index, count, nonce=nonce or run_nonce(), block_size=block_size, probe=probe,
+                   low=low, high=high)
+
+    def _claim_block(self):
+        for _ in range(MAX_BUSY_BLOCKS):
+            if self._blocks_used >= self.block_count:
+                break
+            start = self.slice_start + self._block * self.block_size
+            self._block = (self._block + 1) % self.block_count
+            self._blocks_used += 1
+            with self._claimed_lock:
+                if start in self._claimed:
+                    continue
+                self._claimed.add(start)
+            if self.probe is None or not self.probe(start):
+                self._next, self._block_end = start, start + self.block_size
+                return
+        raise RuntimeError(f"Нет свободных блоков sellerID в срезе {self.slice_start}-{self.slice_end - 1}")
+
+    def keyed(self, key: str) -> "SellerIdAllocator":
+        """
+        Аллокатор на всем диапазоне, чей начальный блок зависит только от nonce и key.
+        Блоки, уже занятые в этом процессе, пропускаются; занятые другими - отсеивает probe.
+        """
+        allocator = SellerIdAllocator(nonce=f"{self.nonce}:{key}", block_size=self.block_size,
+                                      probe=self.probe, low=self.low, high=self.high)
+        allocator._claimed, allocator._claimed_lock = self._claimed, self._claimed_lock
+        return allocator
+
+    def next(self) -> int:
+        """Следующий свободный sellerID"""
+        with self._lock:
+            if self._next is None or self._next >= self._block_end:
+                self._claim_block()
+            seller_id = self._next
+            self._next += 1
+            return seller_id
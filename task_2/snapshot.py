@@ -0,0 +1,314 @@
+"""
+Снимок большого набора объявлений для локальной заглушки и генератор таких снимков.
+
+Объявления одним файлом, который открывается через mmap за миллисекунды и
+не загружается в память целиком: заглушка читает только нужные записи.
+
+Формат (little-endian, секции выровнены по 8 байт):
+- заголовок _HEADER;
+- записи _RECORD по 64 байта, отсортированные по 16 байтам UUID (поиск по id - двоичный);
+- таблица продавцов _SELLER по возрастанию sellerID: число объявлений и начало в порядке продавцов;
+- порядок продавцов: номера записей (uint32), сгруппированные по продавцам, внутри - по createdAt;
+- названия объявлений в UTF-8 подряд.
+
+Генератор пишет миллионы объявлений за секунды, без POST /item. Распределение по продавцам
+задается неравномерным (закон Ципфа с показателем skew) и списком «тяжелых» продавцов
+с заданным числом объявлений (например, 3 продавца по 100 000). Продавцы занимают
+непрерывный диапазон sellerID в конце допустимого (по умолчанию), чтобы тесты выдавали
+sellerID вне его.
+
+Запуск:
+    python snapshot.py ads.snap --ads 1000000 --sellers 20000 --skew 1.1 --heavy 3x100000
+    pytest test_api.py --ads-target inprocess --ads-snapshot ads.snap
+"""
+
+import argparse
+import mmap
+import os
+import random
+import struct
+import sys
+import time
+import uuid
+from array import array
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from ads import SELLER_ID_MAX, SELLER_ID_MIN
+
+
+MAGIC = b"ADSSNAP\0"
+VERSION = 1
+# magic, version, размер записи, объявлений, продавцов, смещения записей, продавцов, порядка, названий, размер названий
+_HEADER = struct.Struct("<8sIIQQQQQQQ")
+# id, смещение названия, price, createdAt (мкс от эпохи), sellerID, длина названия, likes, viewCount, contacts, резерв
+_RECORD = struct.Struct("<16sQqqIIIIII")
+# sellerID, число объявлений, начало в порядке продавцов
+_SELLER = struct.Struct("<IIQ")
+_INDEX = struct.Struct("<I")
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+_CREATED_FORMAT = "%Y-%m-%d %H:%M:%S.%f %z"
+DEFAULT_SEED = 2025
+DEFAULT_MAX_PRICE = 1_000_000
+DEFAULT_MAX_COUNTER = 1000
+
+
+class SnapshotError(ValueError):
+    """Файл не является снимком объявлений или поврежден"""
+
+
+def _align(offset: int) -> int:
+    return (offset + 7) & ~7
+
+
+class Snapshot:
+    """Снимок только для чтения; потокобезопасен (чтение по смещениям, без seek)"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, "rb")
+        try:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self._file.close()
+            raise SnapshotError(f"{path}: пустой файл") from None
+        if len(self._map) < _HEADER.size:
+            self.close()
+            raise SnapshotError(f"{path}: файл короче заголовка")
+        (magic, version, record_size, self.ad_count, self.seller_count, self._records, self._sellers,
+         self._order, self._names, names_size) = _HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC or version != VERSION or record_size != _RECORD.size:
+            self.close()
+            raise SnapshotError(f"{path}: не снимок объявлений версии {VERSION}")
+        if self._names + names_size > len(self._map):
+            self.close()
+            raise SnapshotError(f"{path}: файл обрезан")
+
+    @classmethod
+    def open(cls, path: str) -> "Snapshot":
+        return cls(path)
+
+    def close(self):
+        self._map.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __len__(self) -> int:
+        return self.ad_count
+
+    @property
+    def seller_range(self) -> Tuple[int, int]:
+        """Наименьший и наибольший sellerID снимка; (0, 0) для пустого"""
+        if not self.seller_count:
+            return 0, 0
+        first = _SELLER.unpack_from(self._map, self._sellers)[0]
+        last = _SELLER.unpack_from(self._map, self._sellers + (self.seller_count - 1) * _SELLER.size)[0]
+        return first, last
+
+    def _key(self, index: int) -> bytes:
+        offset = self._records + index * _RECORD.size
+        return self._map[offset:offset + 16]
+
+    def find(self, item_id: str) -> Optional[int]:
+        """Номер записи по id объявления или None"""
+        try:
+            key = uuid.UUID(item_id).bytes
+        except ValueError:
+            return None
+        low, high = 0, self.ad_count
+        while low < high:
+            middle = (low + high) // 2
+            if self._key(middle) < key:
+                low = middle + 1
+            else:
+                high = middle
+        return low if low < self.ad_count and self._key(low) == key else None
+
+    def record(self, index: int) -> Dict[str, Any]:
+        """Объявление в формате ответа API"""
+        (key, name_offset, price, created_us, seller_id, name_length, likes, views, contacts,
+         _) = _RECORD.unpack_from(self._map, self._records + index * _RECORD.size)
+        start = self._names + name_offset
+        created = _EPOCH + timedelta(microseconds=created_us)
+        return {
+            "id": str(uuid.UUID(bytes=key)),
+            "sellerId": seller_id,
+            "name": self._map[start:start + name_length].decode("utf-8"),
+            "price": price,
+            "statistics": {"likes": likes, "viewCount": views, "contacts": contacts},
+            "createdAt": created.strftime(_CREATED_FORMAT),
+        }
+
+    def get(self, item_id: str) -> Optional[Dict[str, Any]]:
+        index = self.find(item_id)
+        return None if index is None else self.record(index)
+
+    def _seller_entry(self, number: int) -> Tuple[int, int, int]:
+        return _SELLER.unpack_from(self._map, self._sellers + number * _SELLER.size)
+
+    def seller_indexes(self, seller_id: int) -> Sequence[int]:
+        """Номера записей продавца в порядке создания"""
+        low, high = 0, self.seller_count
+        while low < high:
+            middle = (low + high) // 2
+            if self._seller_entry(middle)[0] < seller_id:
+                low = middle + 1
+            else:
+                high = middle
+        if low == self.seller_count:
+            return ()
+        found, count, start = self._seller_entry(low)
+        if found != seller_id or not count:
+            return ()
+        return struct.unpack_from(f"<{count}I", self._map, self._order + start * _INDEX.size)
+
+    def by_seller(self, seller_id: int) -> List[Dict[str, Any]]:
+        return [self.record(index) for index in self.seller_indexes(seller_id)]
+
+    def sellers(self) -> Iterator[Tuple[int, int]]:
+        """(sellerID, число объявлений) по возрастанию sellerID"""
+        for number in range(self.seller_count):
+            seller_id, count, _ = self._seller_entry(number)
+            yield seller_id, count
+
+    def largest(self, count: int = 1) -> List[Tuple[int, int]]:
+        """count продавцов с наибольшим числом объявлений: (sellerID, число объявлений)"""
+        return sorted(self.sellers(), key=lambda entry: (-entry[1], entry[0]))[:count]
+
+
+def seller_counts(ads: int, sellers: int, skew: float = 0.0, heavy: Sequence[Tuple[int, int]] = (),
+                  first_seller: Optional[int] = None) -> List[Tuple[int, int]]:
+    """
+    Распределение ads объявлений по sellers продавцам с подряд идущими sellerID: [(sellerID, число)].
+    heavy - (продавцов, объявлений у каждого) для первых sellerID; остальные объявления делятся
+    между прочими продавцами пропорционально 1 / ранг^skew (skew=0 - поровну).
+    """
+    heavy_sellers = [size for number, size in heavy for _ in range(number)]
+    rest = ads - sum(heavy_sellers)
+    others = sellers - len(heavy_sellers)
+    if rest < 0 or others < 0 or (rest and not others):
+        raise ValueError(f"{ads} объявлений на {sellers} продавцов не вмещают тяжелых продавцов {list(heavy)}")
+    if first_seller is None:
+        first_seller = SELLER_ID_MAX - sellers + 1
+    if first_seller < SELLER_ID_MIN or first_seller + sellers - 1 > SELLER_ID_MAX:
+        raise ValueError(f"Продавцы {first_seller}..{first_seller + sellers - 1} вне {SELLER_ID_MIN}-{SELLER_ID_MAX}")
+    weights = [1.0 / (rank + 1) ** skew for rank in range(others)]
+    total = sum(weights)
+    counts = [int(rest * weight / total) for weight in weights]
+    for rank in range(rest - sum(counts)):
+        counts[rank % others] += 1
+    return [(first_seller + number, count) for number, count in enumerate(heavy_sellers + counts)]
+
+
+def _random_uuid(rng: random.Random) -> bytes:
+    value = rng.getrandbits(128)
+    value = (value & ~(0xF000 << 64)) | (0x4000 << 64)  # версия 4
+    value = (value & ~(0xC000 << 48)) | (0x8000 << 48)  # вариант RFC 4122
+    return value.to_bytes(16, "big")
+
+
+def write_snapshot(path: str, sellers: Sequence[Tuple[int, int]], seed: Any = DEFAULT_SEED,
+                   created_from: Optional[datetime] = None) -> int:
+    """
+    Пишет снимок для [(sellerID, число объявлений)] по возрастанию sellerID; возвращает число объявлений.
+    Данные детерминированы зерном seed; createdAt идут с шагом в 1 мс от created_from.
+    """
+    sellers = sorted(sellers)
+    if len({seller_id for seller_id, _ in sellers}) != len(sellers):
+        raise ValueError("sellerID в снимке должны быть уникальны")
+    rng = random.Random(seed)
+    total = sum(count for _, count in sellers)
+    ids = [_random_uuid(rng) for _ in range(total)]
+    # Порядок создания (по продавцам) -> номер записи в порядке id
+    by_id = sorted(range(total), key=ids.__getitem__)
+    position = array("I", bytes(_INDEX.size * total))
+    for record_index, created_index in enumerate(by_id):
+        position[created_index] = record_index
+    del by_id
+
+    created_us = int(((created_from or datetime(2025, 1, 1, tzinfo=timezone.utc)) - _EPOCH).total_seconds()
+                     * 1_000_000)
+    records = bytearray(_RECORD.size * total)
+    seller_table = bytearray(_SELLER.size * len(sellers))
+    names = bytearray()
+    pack_record, getrandbits = _RECORD.pack_into, rng.getrandbits
+    created_index = 0
+    for number, (seller_id, count) in enumerate(sellers):
+        _SELLER.pack_into(seller_table, number * _SELLER.size, seller_id, count, created_index)
+        for ordinal in range(count):
+            name = f"Seed Ad {seller_id}-{ordinal + 1}".encode("utf-8")
+            # Одно случайное число на объявление: цена и три счетчика из разных его битов (randrange в 4 раза дольше)
+            bits = getrandbits(64)
+            pack_record(records, position[created_index] * _RECORD.size, ids[created_index], len(names),
+                        1 + (bits >> 34) % (DEFAULT_MAX_PRICE - 1), created_us + created_index * 1000, seller_id,
+                        len(name), (bits & 0x3FF) % DEFAULT_MAX_COUNTER, (bits >> 10 & 0x3FF) % DEFAULT_MAX_COUNTER,
+                        (bits >> 20 & 0x3FF) % DEFAULT_MAX_COUNTER, 0)
+            names += name
+            created_index += 1
+    ids.sort()
+    for previous, current in zip(ids, ids[1:]):
+        if previous == current:
+            raise ValueError("Совпали случайные id объявлений; смените seed")
+    if sys.byteorder != "little":
+        position.byteswap()
+
+    records_offset = _align(_HEADER.size)
+    sellers_offset = _align(records_offset + len(records))
+    order_offset = _align(sellers_offset + len(seller_table))
+    names_offset = _align(order_offset + _INDEX.size * total)
+    temporary = f"{path}.tmp"
+    with open(temporary, "wb") as file:
+        file.write(_HEADER.pack(MAGIC, VERSION, _RECORD.size, total, len(sellers), records_offset,
+                                sellers_offset, order_offset, names_offset, len(names)))
+        for offset, data in ((records_offset, records), (sellers_offset, seller_table),
+                             (order_offset, position.tobytes()), (names_offset, names)):
+            file.write(bytes(offset - file.tell()))
+            file.write(data)
+    # Заглушка, уже открывшая старый снимок, продолжает читать его: файл заменяется, а не переписывается
+    os.replace(temporary, path)
+    return total
+
+
+def _heavy(value: str) -> Tuple[int, int]:
+    number, _, size = value.lower().partition("x")
+    return int(number), int(size)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Генерация снимка объявлений для локальной заглушки")
+    parser.add_argument("path", help="Файл снимка")
+    parser.add_argument("--ads", type=int, default=1_000_000, help="Всего объявлений")
+    parser.add_argument("--sellers", type=int, default=10_000, help="Всего продавцов")
+    parser.add_argument("--skew", type=float, default=1.0,
+                        help="Показатель закона Ципфа для обычных продавцов (0 - поровну)")
+    parser.add_argument("--heavy", type=_heavy, action="append", default=[],
+                        help="Тяжелые продавцы: NxM - N продавцов по M объявлений (можно повторять)")
+    parser.add_argument("--first-seller", type=int, default=None,
+                        help="Первый sellerID (по умолчанию продавцы занимают конец диапазона)")
+    parser.add_argument("--seed", default=DEFAULT_SEED, help="Зерно данных")
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    counts = seller_counts(args.ads, args.sellers, args.skew, args.heavy, args.first_seller)
+    total = write_snapshot(args.path, counts, seed=args.seed)
+    written = time.perf_counter() - started
+    started = time.perf_counter()
+    with Snapshot.open(args.path) as snapshot:
+        opened = time.perf_counter() - started
+        first, last = snapshot.seller_range
+        print(f"{args.path}: {total} объявлений, {snapshot.seller_count} продавцов ({first}-{last}), "
+              f"{os.path.getsize(args.path) / 2 ** 20:.1f} МиБ")
+        print(f"Запись {written:.2f} с, открытие {opened * 1000:.2f} мс")
+        print("Крупнейшие продавцы: " + ", ".join(f"{seller_id} ({count})"
+                                                  for seller_id, count in snapshot.largest(5)))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
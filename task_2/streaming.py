@@ -0,0 +1,243 @@
+"""
+Потоковая проверка больших списков объявлений (GET /:sellerID/item).
+
+Ответ не загружается целиком через response.json(): JSON-массив разбирается
+по одному элементу из потока (iter_content), и каждый элемент сразу проверяется -
+схема, принадлежность продавцу, уникальность id. В памяти остаются только
+текущий кусок ответа и компактное множество id (16 байт на UUID вместо
+строки и элемента set), поэтому расход памяти не зависит от размера объявлений
+и растет лишь на 16-32 байта на каждый уникальный id.
+"""
+
+import codecs
+import hashlib
+import json
+import re
+from dataclasses import dataclass, field
+from typing import Any, Iterable, Iterator, List, Optional
+
+from api_client import AdsApiClient
+from schemas import seller_id_of, validate_item
+
+
+DEFAULT_CHUNK_SIZE = 64 * 1024
+DEFAULT_MAX_REPORTED = 20
+# Элемент массива больше этого размера считается ошибкой формата, а не поводом копить буфер дальше
+MAX_ITEM_CHARS = 1024 * 1024
+
+_SLOT = 16
+_EMPTY_SLOT = bytes(_SLOT)
+_WHITESPACE = re.compile(r"[ \t\n\r]*")
+_NUMBER_CHARS = frozenset("-+.eE0123456789")
+
+_EXPECT_ARRAY, _FIRST_VALUE, _VALUE, _SEPARATOR, _DONE = range(5)
+
+
+class StreamFormatError(ValueError):
+    """Поток не является корректным JSON-массивом"""
+
+
+class _ArrayParser:
+    """Инкрементальный разбор JSON-массива верхнего уровня: feed() возвращает готовые элементы"""
+
+    def __init__(self):
+        self._decoder = json.JSONDecoder()
+        self._buffer = ""
+        self._state = _EXPECT_ARRAY
+        self.consumed = 0
+
+    def feed(self, text: str, final: bool = False) -> List[Any]:
+        buffer = self._buffer + text
+        position = 0
+        items = []
+        while True:
+            position = _WHITESPACE.match(buffer, position).end()
+            if position == len(buffer):
+                break
+            char = buffer[position]
+            if self._state == _EXPECT_ARRAY:
+                if char != "[":
+                    raise StreamFormatError(f"ожидался JSON-массив, получен символ {char!r}")
+                self._state = _FIRST_VALUE
+                position += 1
+            elif self._state == _SEPARATOR:
+                if char == ",":
+                    self._state = _VALUE
+                elif char == "]":
+                    self._state = _DONE
+                else:
+                    raise StreamFormatError(f"ожидалась ',' или ']' после элемента {self.consumed}, получен {char!r}")
+                position += 1
+            elif self._state == _FIRST_VALUE and char == "]":
+                self._state = _DONE
+                position += 1
+            elif self._state == _DONE:
+                raise StreamFormatError(f"лишние данные после конца массива: {buffer[position:position + 20]!r}")
+            else:
+                try:
+                    value, end = self._decoder.raw_decode(buffer, position)
+                except json.JSONDecodeError as error:
+                    if final or len(buffer) - position > MAX_ITEM_CHARS:
+                        raise StreamFormatError(f"элемент {self.consumed}: {error.msg}") from None
+                    break
+                # Число в конце куска может быть неполным ("12" из "123", "-0" из "-0.5") - ждем следующий кусок
+                if not final and char in _NUMBER_CHARS and (end == len(buffer) or buffer[end] in _NUMBER_CHARS):
+                    break
+                items.append(value)
+                self.consumed += 1
+                self._state = _SEPARATOR
+                position = end
+        self._buffer = buffer[position:]
+        if final and self._state != _DONE:
+            raise StreamFormatError(f"поток оборвался внутри массива после {self.consumed} элементов")
+        return items
+
+
+def iter_json_array(chunks: Iterable[bytes]) -> Iterator[Any]:
+    """Элементы JSON-массива из потока байтовых кусков (UTF-8) по мере их поступления"""
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    parser = _ArrayParser()
+    for chunk in chunks:
+        if chunk:
+            yield from parser.feed(decoder.decode(chunk))
+    yield from parser.feed(decoder.decode(b"", final=True), final=True)
+
+
+class UuidSet:
+    """
+    Множество id в виде открытой адресации по bytearray с ячейками по 16 байт.
+    UUID хранится как 16 байт, прочие строки - как 16-байтовый blake2b-хеш.
+    """
+
+    def __init__(self, capacity: int = 1024):
+        size = 8
+        while size < capacity:
+            size *= 2
+        self._mask = size - 1
+        self._slots = bytearray(size * _SLOT)
+        self._count = 0
+        self._has_nil = False
+
+    @staticmethod
+    def _key(value: str) -> bytes:
+        if len(value) == 36 and value[8] == value[13] == value[18] == value[23] == "-":
+            try:
+                return bytes.fromhex(value.replace("-", ""))
+            except ValueError:
+                pass
+        return hashlib.blake2b(value.encode("utf-8"), digest_size=_SLOT, person=b"non-uuid-id").digest()
+
+    def _find(self, key: bytes) -> int:
+        """Смещение ячейки с key или первой пустой ячейки на его пути (линейное пробирование)"""
+        slots, mask = self._slots, self._mask
+        index = hash(key) & mask
+        while True:
+            offset = index * _SLOT
+            slot = slots[offset:offset + _SLOT]
+            if slot == key or slot == _EMPTY_SLOT:
+                return offset
+            index = (index + 1) & mask
+
+    def _grow(self):
+        old = bytes(self._slots)
+        mask = self._mask = self._mask * 2 + 1
+        slots = self._slots = bytearray(len(old) * 2)
+        for start in range(0, len(old), _SLOT):
+            key = old[start:start + _SLOT]
+            if key == _EMPTY_SLOT:
+                continue
+            index = hash(key) & mask
+            while slots[index * _SLOT:index * _SLOT + _SLOT] != _EMPTY_SLOT:
+                index = (index + 1) & mask
+            slots[index * _SLOT:index * _SLOT + _SLOT] = key
+
+    def add(self, value: str) -> bool:
+        """Добавляет id; False, если он уже был"""
+        key = self._key(value)
+        if key == _EMPTY_SLOT:
+            # Нулевой UUID совпадает с маркером пустой ячейки и хранится флагом
+            added, self._has_nil = not self._has_nil, True
+            self._count += added
+            return added
+        # Пробирование повторяет _find: это самый частый вызов при проверке списка
+        slots, mask = self._slots, self._mask
+        index = hash(key) & mask
+        while True:
+            offset = index * _SLOT
+            slot = slots[offset:offset + _SLOT]
+            if slot == key:
+                return False
+            if slot == _EMPTY_SLOT:
+                break
+            index = (index + 1) & mask
+        slots[offset:offset + _SLOT] = key
+        self._count += 1
+        if self._count * 2 > mask + 1:
+            self._grow()
+        return True
+
+    def __contains__(self, value: str) -> bool:
+        key = self._key(value)
+        if key == _EMPTY_SLOT:
+            return self._has_nil
+        offset = self._find(key)
+        return self._slots[offset:offset + _SLOT] == key
+
+    def __len__(self) -> int:
+        return self._count
+
+    @property
+    def nbytes(self) -> int:
+        """Размер таблицы в байтах"""
+        return len(self._slots)
+
+
+@dataclass
+class ListingReport:
+    """Итог потоковой проверки списка: счетчики и первые max_reported нарушений"""
+    status_code: int = 200
+    count: int = 0
+    ids: UuidSet = field(default_factory=UuidSet)
+    duplicates: List[str] = field(default_factory=list)
+    duplicate_count: int = 0
+    violations: List[str] = field(default_factory=list)
+    violation_count: int = 0
+
+    def __len__(self) -> int:
+        # Позволяет использовать отчет с предикатами waiting.has_at_least
+        return self.count
+
+    @property
+    def ok(self) -> bool:
+        return self.status_code == 200 and not self.duplicate_count and not self.violation_count
+
+
+def check_listing_stream(chunks: Iterable[bytes], seller_id: Optional[int] = None, path: str = "$",
+                         max_reported: int = DEFAULT_MAX_REPORTED) -> ListingReport:
+    """Разбор и проверка списка объявлений из потока: схема, принадлежность seller_id, уникальность id"""
+    report = ListingReport()
+    for index, item in enumerate(iter_json_array(chunks)):
+        report.count += 1
+        errors = validate_item(item, f"{path}[{index}]")
+        if type(item) is dict:
+            owner = seller_id_of(item)
+            if seller_id is not None and owner is not None and owner != seller_id:
+                errors.append(f"{path}[{index}].sellerId: значение {owner!r}, ожидалось {seller_id!r}")
+            item_id = item.get("id")
+            if isinstance(item_id, str) and not report.ids.add(item_id):
+                report.duplicate_count += 1
+                if len(report.duplicates) < max_reported:
+                    report.duplicates.append(item_id)
+        if errors:
+            report.violation_count += len(errors)
+            report.violations.extend(errors[:max_reported - len(report.violations)])
+    return report
+
+
+def stream_seller_listing(client: AdsApiClient, seller_id: int, chunk_size: int = DEFAULT_CHUNK_SIZE,
+                          max_reported: int = DEFAULT_MAX_REPORTED) -> ListingReport:
+    """Потоковый GET /:sellerID/item с проверкой на лету; при статусе не 200 - пустой отчет с этим статусом"""
+    with client.get(f"/{seller_id}/item", stream=True) as response:
+        if response.status_code != 200:
+            return ListingReport(status_code=response.status_code)
+        return check_listing_stream(response.iter_content(chunk_size), seller_id, max_reported=max_reported)
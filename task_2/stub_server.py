@@ -0,0 +1,322 @@
+"""
+Локальная заглушка API микросервиса объявлений.
+Реализует POST /item, GET /item/:id, GET /:sellerID/item и GET /statistic/:id
+с правилами валидации из TESTCASES.md и BUGS.md. Успешные ответы GET содержат ETag,
+на совпадающий If-None-Match возвращается 304 без тела.
+
+Два режима работы:
+- StubServer - HTTP-сервер на 127.0.0.1 и эфемерном порту;
+- InProcessAdapter - транспорт requests без сокетов, вызывает приложение напрямую.
+"""
+
+import hashlib
+import io
+import json
+import re
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+from requests.adapters import HTTPAdapter
+from urllib3 import HTTPResponse
+
+from ads import SELLER_ID_MAX, SELLER_ID_MIN
+from snapshot import Snapshot
+
+
+API_PREFIX = "/api/1"
+INPROCESS_BASE_URL = "http://ads.inprocess" + API_PREFIX
+
+STATISTICS_FIELDS = ("likes", "viewCount", "contacts")
+
+Reply = Tuple[int, Dict[str, str], bytes]
+
+_ITEM_RE = re.compile(r"^/item/([^/]*)$")
+_SELLER_RE = re.compile(r"^/([^/]+)/item$")
+_STATISTIC_RE = re.compile(r"^/statistic/([^/]*)$")
+
+
+def _is_int(value: Any) -> bool:
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def _is_uuid(value: str) -> bool:
+    try:
+        uuid.UUID(value)
+    except ValueError:
+        return False
+    return True
+
+
+class AdsStore:
+    """Потокобезопасное хранилище объявлений в памяти"""
+
+    def __init__(self, visibility_delay: float = 0.0, count_views: bool = False,
+                 snapshot: Optional[Snapshot] = None):
+        # visibility_delay имитирует Баг #2: объявление доступно для чтения не сразу
+        self.visibility_delay = visibility_delay
+        # count_views: каждый GET /statistic/:id увеличивает viewCount (ожидание TC-022)
+        self.count_views = count_views
+        # snapshot: заранее сгенерированные объявления (snapshot.py), видимые сразу и только для чтения
+        self.snapshot = snapshot
+        self._lock = threading.Lock()
+        self._ads: Dict[str, Dict[str, Any]] = {}
+        self._by_seller: Dict[int, List[str]] = {}
+        self._visible_at: Dict[str, float] = {}
+        # Измененная статистика объявлений снимка (сам снимок не меняется)
+        self._snapshot_statistics: Dict[str, Dict[str, int]] = {}
+
+    def add(self, seller_id: int, name: str, price: int, statistics: Dict[str, int]) -> str:
+        item_id = str(uuid.uuid4())
+        ad = {
+            "id": item_id,
+            "sellerId": seller_id,
+            "name": name,
+            "price": price,
+            "statistics": dict(statistics),
+            "createdAt": datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S.%f %z"),
+        }
+        with self._lock:
+            self._ads[item_id] = ad
+            self._by_seller.setdefault(seller_id, []).append(item_id)
+            self._visible_at[item_id] = time.monotonic() + self.visibility_delay
+        return item_id
+
+    def _visible(self, item_id: str) -> bool:
+        return self._visible_at[item_id] <= time.monotonic()
+
+    def get(self, item_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            if item_id in self._ads:
+                return self._ads[item_id] if self._visible(item_id) else None
+            return self._from_snapshot(item_id)
+
+    def _from_snapshot(self, item_id: str) -> Optional[Dict[str, Any]]:
+        if self.snapshot is None:
+            return None
+        ad = self.snapshot.get(item_id)
+        if ad is not None and ad["id"] in self._snapshot_statistics:
+            ad["statistics"] = dict(self._snapshot_statistics[ad["id"]])
+        return ad
+
+    def view(self, item_id: str) -> Optional[Dict[str, int]]:
+        """Статистика объявления; с count_views - после увеличения viewCount на единицу"""
+        with self._lock:
+            if item_id in self._ads:
+                if not self._visible(item_id):
+                    return None
+                statistics = self._ads[item_id]["statistics"]
+            else:
+                ad = self._from_snapshot(item_id)
+                if ad is None:
+                    return None
+                statistics = self._snapshot_statistics.setdefault(ad["id"], ad["statistics"])
+            if self.count_views:
+                statistics["viewCount"] += 1
+            return dict(statistics)
+
+    def by_seller(self, seller_id: int) -> List[Dict[str, Any]]:
+        with self._lock:
+            ads = self._snapshot_by_seller(seller_id) if self.snapshot is not None else []
+            ads.extend(self._ads[item_id] for item_id in self._by_seller.get(seller_id, [])
+                       if self._visible(item_id))
+            return ads
+
+    def _snapshot_by_seller(self, seller_id: int) -> List[Dict[str, Any]]:
+        ads = self.snapshot.by_seller(seller_id)
+        if self._snapshot_statistics:
+            for ad in ads:
+                if ad["id"] in self._snapshot_statistics:
+                    ad["statistics"] = dict(self._snapshot_statistics[ad["id"]])
+        return ads
+
+
+class AdsStubApp:
+    """Обработчик запросов к API объявлений без привязки к транспорту"""
+
+    def __init__(self, store: Optional[AdsStore] = None, etags: bool = True):
+        self.store = store or AdsStore()
+        # etags=False - сервер без ETag и условных запросов
+        self.etags = etags
+
+    def handle(self, method: str, path: str, headers: Dict[str, str], body: bytes) -> Reply:
+        """Обработка запроса; path - путь URL вместе с префиксом /api/1"""
+        path = urlsplit(path).path
+        if not path.startswith(API_PREFIX + "/"):
+            return self._error(404, "route not found")
+        route = path[len(API_PREFIX):]
+
+        if route == "/item":
+            if method != "POST":
+                return self._error(405, "method not allowed", {"Allow": "POST"})
+            return self._create(body)
+
+        for pattern, handler in ((_ITEM_RE, self._get_item),
+                                 (_STATISTIC_RE, self._get_statistic),
+                                 (_SELLER_RE, self._get_by_seller)):
+            match = pattern.match(route)
+            if match:
+                if method != "GET":
+                    return self._error(405, "method not allowed", {"Allow": "GET"})
+                reply = handler(match.group(1))
+                return self._conditional(reply, headers) if self.etags else reply
+        return self._error(404, "route not found")
+
+    @staticmethod
+    def _conditional(reply: Reply, headers: Dict[str, str]) -> Reply:
+        """ETag успешного ответа GET; 304 без тела, если клиент прислал тот же ETag в If-None-Match"""
+        status, reply_headers, body = reply
+        if status != 200:
+            return reply
+        etag = '"' + hashlib.blake2b(body, digest_size=12).hexdigest() + '"'
+        reply_headers["ETag"] = etag
+        if_none_match = next((value for name, value in headers.items() if name.lower() == "if-none-match"), "")
+        if etag in (tag.strip() for tag in if_none_match.split(",")):
+            return 304, {"ETag": etag}, b""
+        return status, reply_headers, body
+
+    def _create(self, body: bytes) -> Reply:
+        try:
+            payload = json.loads(body.decode("utf-8"))
+        except (UnicodeDecodeError, ValueError, RecursionError):
+            # RecursionError - слишком глубокая вложенность: для клиента это тоже некорректное тело
+            return self._error(400, "invalid JSON body")
+        if not isinstance(payload, dict):
+            return self._error(400, "request body must be a JSON object")
+
+        seller_id = payload.get("sellerID")
+        if not _is_int(seller_id) or not SELLER_ID_MIN <= seller_id <= SELLER_ID_MAX:
+            return self._error(400, f"поле sellerID должно быть в диапазоне {SELLER_ID_MIN}-{SELLER_ID_MAX}")
+        name = payload.get("name")
+        if not isinstance(name, str) or not name:
+            return self._error(400, "поле name обязательно")
+        # Как и в реальном сервисе, нулевое значение считается отсутствующим
+        price = payload.get("price")
+        if not _is_int(price) or price <= 0:
+            return self._error(400, "поле price обязательно и должно быть положительным")
+        # Баг #1: statistics обязательно
+        statistics = payload.get("statistics")
+        if not isinstance(statistics, dict):
+            return self._error(400, "поле statistics обязательно")
+        for field in STATISTICS_FIELDS:
+            value = statistics.get(field, 0)
+            if not _is_int(value) or value < 0:
+                return self._error(400, f"поле statistics.{field} должно быть неотрицательным целым")
+
+        item_id = self.store.add(seller_id, name, price,
+                                 {field: statistics.get(field, 0) for field in STATISTICS_FIELDS})
+        return self._json(200, {"status": f"Сохранили объявление - {item_id}"})
+
+    def _get_item(self, item_id: str) -> Reply:
+        if not item_id:
+            return self._error(404, "route not found")
+        if not _is_uuid(item_id):
+            return self._error(400, "передан некорректный идентификатор объявления")
+        ad = self.store.get(item_id)
+        if ad is None:
+            return self._error(404, f"item {item_id} not found")
+        return self._json(200, [ad])
+
+    def _get_by_seller(self, seller_id: str) -> Reply:
+        # Баг #3: диапазон sellerID в GET не проверяется, только формат
+        if not seller_id.isdigit():
+            return self._error(400, "передан некорректный идентификатор продавца")
+        return self._json(200, self.store.by_seller(int(seller_id)))
+
+    def _get_statistic(self, item_id: str) -> Reply:
+        if not item_id:
+            return self._error(404, "route not found")
+        if not _is_uuid(item_id):
+            return self._error(400, "передан некорректный идентификатор объявления")
+        statistics = self.store.view(item_id)
+        if statistics is None:
+            return self._error(404, f"statistic {item_id} not found")
+        return self._json(200, [statistics])
+
+    @staticmethod
+    def _json(status: int, data: Any, headers: Optional[Dict[str, str]] = None) -> Reply:
+        body = json.dumps(data, ensure_ascii=False).encode("utf-8")
+        reply_headers = {"Content-Type": "application/json; charset=utf-8",
+                         "Content-Length": str(len(body))}
+        reply_headers.update(headers or {})
+        return status, reply_headers, body
+
+    def _error(self, status: int, message: str, headers: Optional[Dict[str, str]] = None) -> Reply:
+        return self._json(status, {"result": {"messages": {}, "message": message},
+                                   "status": str(status)}, headers)
+
+
+class _StubRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    app: AdsStubApp
+
+    def _dispatch(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length) if length else b""
+        status, headers, payload = self.app.handle(self.command, self.path, dict(self.headers), body)
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    do_GET = do_POST = do_PUT = do_DELETE = do_PATCH = _dispatch
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StubServer:
+    """HTTP-сервер заглушки на эфемерном порту в фоновом потоке"""
+
+    def __init__(self, app: Optional[AdsStubApp] = None, host: str = "127.0.0.1", port: int = 0):
+        self.app = app or AdsStubApp()
+        handler = type("StubRequestHandler", (_StubRequestHandler,), {"app": self.app})
+        self._server = ThreadingHTTPServer((host, port), handler)
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}{API_PREFIX}"
+
+    def start(self) -> "StubServer":
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+class InProcessAdapter(HTTPAdapter):
+    """Транспорт requests, который вызывает AdsStubApp напрямую, без сокетов"""
+
+    def __init__(self, app: Optional[AdsStubApp] = None):
+        super().__init__()
+        self.app = app or AdsStubApp()
+
+    def send(self, request, stream=False, timeout=None, verify=True, cert=None, proxies=None):
+        body = request.body or b""
+        if isinstance(body, str):
+            body = body.encode("utf-8")
+        status, headers, payload = self.app.handle(request.method, request.path_url,
+                                                   dict(request.headers), body)
+        raw = HTTPResponse(body=io.BytesIO(payload), headers=headers, status=status,
+                           preload_content=False, decode_content=False)
+        return self.build_response(request, raw)
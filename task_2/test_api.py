@@ -5,31 +5,46 @@ Base URL: https://qa-internship.avito.com/api/1
 """
 
 import pytest
-import requests
 import random
-import time
 import uuid
 from typing import Dict, Any, Optional, List
 
-
-BASE_URL = "https://qa-internship.avito.com/api/1"
+from ad_pool import AdPool
+from ads import DEFAULT_BULK_CONCURRENCY, BulkCreateResult, build_ad_payload, create_ads_bulk
+from api_client import AdsApiClient
+from counter_stress import prepare_item, run_stress
+from fuzzing import generate_cases, run_cases
+from lag_profile import LISTING
+from schemas import (format_violations, listing_violations, seller_id_of, validate_create_response,
+                     validate_item_list, validate_statistic_list)
+from seller_ids import SellerIdAllocator
+from streaming import ListingReport, stream_seller_listing
+from waiting import DEFAULT_TIMEOUT, contains_item, has_at_least, wait_until
 
 
 class TestAdsAPI:
     """Класс для тестирования API объявлений"""
     
     @pytest.fixture(autouse=True)
-    def setup(self):
+    def setup(self, api_client: AdsApiClient, test_seller_ids: SellerIdAllocator, wait_timeouts: Dict[str, float]):
         """Настройка перед каждым тестом"""
-        self.base_url = BASE_URL
+        self.client = api_client
+        self.seller_ids = test_seller_ids
+        # Дедлайн ожидания видимости: из профиля задержек (--ads-lag-profile) или по умолчанию
+        self.listing_timeout = wait_timeouts.get(LISTING, DEFAULT_TIMEOUT)
+        self.base_url = api_client.base_url
         self.created_ads = []  # Список созданных объявлений для очистки
-        self.test_seller_id = random.randint(111111, 999999)
+        self.test_seller_id = test_seller_ids.next()
         yield
         # Очистка после теста (если нужна)
     
     def generate_unique_seller_id(self) -> int:
-        """Генерация уникального sellerID"""
-        return random.randint(111111, 999999)
+        """Генерация уникального sellerID (без пересечений между воркерами и запусками)"""
+        return self.seller_ids.next()
+    
+    def fake_item_id(self) -> str:
+        """Случайный UUID несуществующего объявления; зависит от random, чтобы воспроизводиться по зерну"""
+        return str(uuid.UUID(int=random.getrandbits(128), version=4))
     
     def create_ad(self, seller_id: Optional[int] = None, name: str = "Test Ad", 
                   price: int = 1000, statistics: Optional[Dict] = None) -> Dict[str, Any]:
@@ -37,45 +52,59 @@ class TestAdsAPI:
         if seller_id is None:
             seller_id = self.test_seller_id
         
-        if statistics is None:
-            statistics = {
-                "contacts": 0,
-                "likes": 0,
-                "viewCount": 0
-            }
-        
-        payload = {
-            "sellerID": seller_id,
-            "name": name,
-            "price": price,
-            "statistics": statistics
-        }
+        payload = build_ad_payload(seller_id, name=name, price=price, statistics=statistics)
         
-        response = requests.post(f"{self.base_url}/item", json=payload)
+        response = self.client.post("/item", json=payload)
         if response.status_code == 200:
             # Сохраняем seller_id для последующего получения объявлений
             self.created_ads.append({"seller_id": seller_id, "name": name})
             return response.json()
         return response.json() if response.text else {}
     
+    def create_ads_bulk(self, seller_id: int, specs: List[Dict[str, Any]],
+                        concurrency: int = DEFAULT_BULK_CONCURRENCY) -> BulkCreateResult:
+        """Вспомогательный метод для параллельного создания нескольких объявлений"""
+        result = create_ads_bulk(self.client, seller_id, specs, concurrency=concurrency)
+        for item_id, spec in zip(result.item_ids, specs):
+            if item_id is not None:
+                self.created_ads.append({"seller_id": seller_id, "name": spec.get("name"), "id": item_id})
+        return result
+    
     def get_ad_by_id(self, item_id: str) -> List[Dict]:
         """Вспомогательный метод для получения объявления по ID"""
-        response = requests.get(f"{self.base_url}/item/{item_id}")
+        response = self.client.get(f"/item/{item_id}")
         if response.status_code == 200:
             return response.json()
         return []
     
-    def get_ads_by_seller(self, seller_id: int, max_retries: int = 5, delay: float = 1.0) -> List[Dict]:
-        """Вспомогательный метод для получения объявлений продавца с повторными попытками"""
-        for attempt in range(max_retries):
-            response = requests.get(f"{self.base_url}/{seller_id}/item")
-            if response.status_code == 200:
-                ads = response.json()
-                if len(ads) > 0 or attempt == max_retries - 1:
-                    return ads
-            time.sleep(delay)
+    def fetch_ads_by_seller(self, seller_id: int) -> List[Dict]:
+        """Однократное получение объявлений продавца; пустой список при ошибке"""
+        response = self.client.get(f"/{seller_id}/item")
+        if response.status_code == 200:
+            return response.json()
         return []
     
+    def get_ads_by_seller(self, seller_id: int, min_count: int = 1, item_id: Optional[str] = None,
+                          timeout: Optional[float] = None) -> List[Dict]:
+        """
+        Получение объявлений продавца с ожиданием согласованности данных:
+        ждем, пока в списке не окажется минимум min_count объявлений (и item_id, если задан)
+        """
+        def is_ready(ads: List[Dict]) -> bool:
+            return has_at_least(min_count)(ads) and (item_id is None or contains_item(item_id)(ads))
+        
+        return wait_until(lambda: self.fetch_ads_by_seller(seller_id), is_ready,
+                          timeout=self.listing_timeout if timeout is None else timeout)
+    
+    def stream_ads_by_seller(self, seller_id: int, min_count: int = 1,
+                             timeout: Optional[float] = None) -> ListingReport:
+        """
+        Потоковая проверка объявлений продавца (схема, принадлежность, уникальность id)
+        без загрузки всего списка в память; ждем, пока в списке не окажется минимум min_count объявлений
+        """
+        return wait_until(lambda: stream_seller_listing(self.client, seller_id), has_at_least(min_count),
+                          timeout=self.listing_timeout if timeout is None else timeout)
+    
     # ========== Ручка 1: Создание объявления (POST /api/1/item) ==========
     
     def test_create_ad_success(self):
@@ -92,11 +121,12 @@ class TestAdsAPI:
             }
         }
         
-        response = requests.post(f"{self.base_url}/item", json=payload)
+        response = self.client.post("/item", json=payload)
         
         assert response.status_code == 200, f"Ожидался статус 200, получен {response.status_code}"
         data = response.json()
-        assert "status" in data, "В ответе отсутствует поле status"
+        errors = validate_create_response(data)
+        assert not errors, format_violations(errors)
     
     def test_create_ad_invalid_seller_id_low(self):
         """TC-002: Создание объявления с невалидным sellerID (меньше 111111)"""
@@ -107,7 +137,7 @@ class TestAdsAPI:
             "statistics": {"contacts": 0, "likes": 0, "viewCount": 0}
         }
         
-        response = requests.post(f"{self.base_url}/item", json=payload)
+        response = self.client.post("/item", json=payload)
         assert response.status_code == 400, f"Ожидался статус 400, получен {response.status_code}"
     
     def test_create_ad_invalid_seller_id_high(self):
@@ -119,7 +149,7 @@ class TestAdsAPI:
             "statistics": {"contacts": 0, "likes": 0, "viewCount": 0}
         }
         
-        response = requests.post(f"{self.base_url}/item", json=payload)
+        response = self.client.post("/item", json=payload)
         assert response.status_code == 400, f"Ожидался статус 400, получен {response.status_code}"
     
     def test_create_ad_missing_name(self):
@@ -131,7 +161,7 @@ class TestAdsAPI:
             "statistics": {"contacts": 0, "likes": 0, "viewCount": 0}
         }
         
-        response = requests.post(f"{self.base_url}/item", json=payload)
+        response = self.client.post("/item", json=payload)
         assert response.status_code == 400, f"Ожидался статус 400, получен {response.status_code}"
     
     def test_create_ad_negative_price(self):
@@ -144,7 +174,7 @@ class TestAdsAPI:
             "statistics": {"contacts": 0, "likes": 0, "viewCount": 0}
         }
         
-        response = requests.post(f"{self.base_url}/item", json=payload)
+        response = self.client.post("/item", json=payload)
         assert response.status_code == 400, f"Ожидался статус 400, получен {response.status_code}"
     
     def test_create_ad_empty_name(self):
@@ -157,7 +187,7 @@ class TestAdsAPI:
             "statistics": {"contacts": 0, "likes": 0, "viewCount": 0}
         }
         
-        response = requests.post(f"{self.base_url}/item", json=payload)
+        response = self.client.post("/item", json=payload)
         assert response.status_code == 400, f"Ожидался статус 400, получен {response.status_code}"
     
     def test_create_ad_zero_price(self):
@@ -170,7 +200,7 @@ class TestAdsAPI:
             "statistics": {"contacts": 0, "likes": 0, "viewCount": 0}
         }
         
-        response = requests.post(f"{self.base_url}/item", json=payload)
+        response = self.client.post("/item", json=payload)
         # Может быть 200 или 400 в зависимости от бизнес-логики
         assert response.status_code in [200, 400], f"Неожиданный статус {response.status_code}"
     
@@ -183,7 +213,7 @@ class TestAdsAPI:
             "price": 1000
         }
         
-        response = requests.post(f"{self.base_url}/item", json=payload)
+        response = self.client.post("/item", json=payload)
         # API требует поле statistics, поэтому ожидаем 400
         assert response.status_code == 400, f"Ожидался статус 400, получен {response.status_code}"
     
@@ -201,53 +231,45 @@ class TestAdsAPI:
             }
         }
         
-        response = requests.post(f"{self.base_url}/item", json=payload)
+        response = self.client.post("/item", json=payload)
         # Может быть 400 или 200 в зависимости от валидации
         assert response.status_code in [200, 400], f"Неожиданный статус {response.status_code}"
     
     # ========== Ручка 2: Получение объявления по идентификатору (GET /api/1/item/:id) ==========
     
-    def test_get_ad_by_id_success(self):
+    def test_get_ad_by_id_success(self, ad_pool: AdPool):
         """TC-010: Успешное получение существующего объявления"""
-        # Создаем объявление
-        seller_id = self.generate_unique_seller_id()
-        response = self.create_ad(seller_id=seller_id, name="Test Ad")
-        assert response.get("status") is not None, "Объявление не было создано"
-        
-        # Получаем все объявления продавца с повторными попытками
-        ads = self.get_ads_by_seller(seller_id, max_retries=10, delay=2.0)
-        assert len(ads) > 0, "Не удалось получить созданное объявление"
-        
-        item_id = ads[0].get("id")
-        assert item_id is not None, "В ответе отсутствует id"
-        
-        # Получаем объявление по id
-        response = requests.get(f"{self.base_url}/item/{item_id}")
-        
-        assert response.status_code == 200, f"Ожидался статус 200, получен {response.status_code}"
-        data = response.json()
-        assert isinstance(data, list), "Ответ должен быть массивом"
-        assert len(data) > 0, "Массив не должен быть пустым"
-        assert data[0].get("id") == item_id, "id не соответствует запрошенному"
-        assert "name" in data[0], "В ответе отсутствует name"
-        assert "sellerId" in data[0] or "sellerID" in data[0], "В ответе отсутствует sellerId"
+        # Берем уже созданное и видимое объявление из пула на время всех проверок
+        with ad_pool.lease() as ad:
+            item_id = ad.get("id")
+            assert item_id is not None, "В ответе отсутствует id"
+            
+            # Получаем объявление по id
+            response = self.client.get(f"/item/{item_id}")
+            
+            assert response.status_code == 200, f"Ожидался статус 200, получен {response.status_code}"
+            data = response.json()
+            errors = validate_item_list(data)
+            assert not errors, format_violations(errors)
+            assert len(data) > 0, "Массив не должен быть пустым"
+            assert data[0]["id"] == item_id, "id не соответствует запрошенному"
     
     def test_get_ad_by_id_not_found(self):
         """TC-011: Получение несуществующего объявления"""
-        fake_id = str(uuid.uuid4())
-        response = requests.get(f"{self.base_url}/item/{fake_id}")
+        fake_id = self.fake_item_id()
+        response = self.client.get(f"/item/{fake_id}")
         
         assert response.status_code == 404, f"Ожидался статус 404, получен {response.status_code}"
     
     def test_get_ad_by_id_invalid_format(self):
         """TC-012: Получение объявления с невалидным форматом id"""
-        response = requests.get(f"{self.base_url}/item/abc123")
+        response = self.client.get("/item/abc123")
         
         assert response.status_code in [400, 404], f"Ожидался статус 400 или 404, получен {response.status_code}"
     
     def test_get_ad_by_id_empty(self):
         """TC-013: Получение объявления с пустым id"""
-        response = requests.get(f"{self.base_url}/item/")
+        response = self.client.get("/item/")
         
         assert response.status_code in [404, 400, 405], f"Ожидался статус 404/400/405, получен {response.status_code}"
     
@@ -258,34 +280,45 @@ class TestAdsAPI:
         seller_id = self.generate_unique_seller_id()
         
         # Создаем несколько объявлений
-        self.create_ad(seller_id=seller_id, name="Ad 1")
-        self.create_ad(seller_id=seller_id, name="Ad 2")
-        self.create_ad(seller_id=seller_id, name="Ad 3")
+        created = self.create_ads_bulk(seller_id, [{"name": f"Ad {i}"} for i in range(1, 4)])
+        assert created.ok, f"Не удалось создать объявления: {created.failures}"
         
-        # Получаем все объявления продавца с повторными попытками
-        ads = self.get_ads_by_seller(seller_id, max_retries=10, delay=2.0)
+        # Ждем, пока все 3 объявления станут видны
+        ads = self.get_ads_by_seller(seller_id, min_count=3)
         
-        assert isinstance(ads, list), "Ответ должен быть массивом"
         assert len(ads) >= 3, f"Ожидалось минимум 3 объявления, получено {len(ads)}"
         
-        # Проверяем, что все объявления принадлежат продавцу
-        for ad in ads:
-            seller_id_in_response = ad.get("sellerId") or ad.get("sellerID")
-            assert seller_id_in_response == seller_id, f"Объявление принадлежит другому продавцу: {seller_id_in_response} != {seller_id}"
+        # Проверяем схему и то, что все объявления принадлежат продавцу, за один проход
+        errors = listing_violations(ads, seller_id=seller_id)
+        assert not errors, format_violations(errors)
     
     def test_get_ads_by_seller_not_found(self):
         """TC-015: Получение объявлений несуществующего продавца"""
-        fake_seller_id = random.randint(111111, 999999)
-        response = requests.get(f"{self.base_url}/{fake_seller_id}/item")
+        fake_seller_id = self.generate_unique_seller_id()
+        response = self.client.get(f"/{fake_seller_id}/item")
         
         assert response.status_code == 200, f"Ожидался статус 200, получен {response.status_code}"
         data = response.json()
-        assert isinstance(data, list), "Ответ должен быть массивом"
+        errors = validate_item_list(data)
+        assert not errors, format_violations(errors)
         # Может быть пустой массив
     
+    def test_get_ads_by_snapshot_seller(self, snapshot):
+        """TC-031: Список самого крупного продавца из снимка (--ads-snapshot) проверяется потоково"""
+        if snapshot is None or not len(snapshot):
+            pytest.skip("Нужен снимок объявлений: --ads-snapshot PATH (python snapshot.py PATH)")
+        seller_id, size = snapshot.largest(1)[0]
+        
+        # Тестам выдаются sellerID ниже диапазона снимка, поэтому список совпадает со снимком
+        report = stream_seller_listing(self.client, seller_id)
+        assert report.status_code == 200, f"Ожидался статус 200, получен {report.status_code}"
+        assert report.count == size, f"Ожидалось {size} объявлений, получено {report.count}"
+        assert report.violation_count == 0, format_violations(report.violations, total=report.violation_count)
+        assert report.duplicate_count == 0, f"Обнаружены дубликаты id: {report.duplicates}"
+    
     def test_get_ads_by_seller_invalid_low(self):
         """TC-016: Получение объявлений продавца с невалидным sellerID (меньше 111111)"""
-        response = requests.get(f"{self.base_url}/100000/item")
+        response = self.client.get("/100000/item")
         
         # GET запросы могут не валидировать sellerID так строго, как POST
         # Возвращают пустой массив или 200, но не 400
@@ -293,7 +326,7 @@ class TestAdsAPI:
     
     def test_get_ads_by_seller_invalid_high(self):
         """TC-017: Получение объявлений продавца с невалидным sellerID (больше 999999)"""
-        response = requests.get(f"{self.base_url}/1000000/item")
+        response = self.client.get("/1000000/item")
         
         # GET запросы могут не валидировать sellerID так строго, как POST
         # Возвращают пустой массив или 200, но не 400
@@ -304,99 +337,72 @@ class TestAdsAPI:
         seller_id = self.generate_unique_seller_id()
         
         # Создаем несколько объявлений
-        self.create_ad(seller_id=seller_id, name="Ad 1")
-        self.create_ad(seller_id=seller_id, name="Ad 2")
-        self.create_ad(seller_id=seller_id, name="Ad 3")
+        created = self.create_ads_bulk(seller_id, [{"name": f"Ad {i}"} for i in range(1, 4)])
+        assert created.ok, f"Не удалось создать объявления: {created.failures}"
         
-        # Получаем все объявления продавца с повторными попытками
-        data = self.get_ads_by_seller(seller_id, max_retries=10, delay=2.0)
-        item_ids = [ad.get("id") for ad in data if ad.get("id")]
+        # Ждем, пока все 3 объявления станут видны; список проверяется потоково
+        report = self.stream_ads_by_seller(seller_id, min_count=3)
+        assert report.status_code == 200, f"Ожидался статус 200, получен {report.status_code}"
+        assert report.count >= 3, f"Ожидалось минимум 3 объявления, получено {report.count}"
+        assert report.violation_count == 0, format_violations(report.violations, total=report.violation_count)
         
         # Проверяем уникальность
-        assert len(item_ids) == len(set(item_ids)), "Обнаружены дубликаты id"
+        assert report.duplicate_count == 0, f"Обнаружены дубликаты id: {report.duplicates}"
     
     # ========== Ручка 4: Получение статистики по itemID (GET /api/1/statistic/:id) ==========
     
-    def test_get_ad_stats_success(self):
+    def test_get_ad_stats_success(self, ad_pool: AdPool):
         """TC-019: Успешное получение статистики существующего объявления"""
-        # Создаем объявление
-        seller_id = self.generate_unique_seller_id()
-        response = self.create_ad(seller_id=seller_id, name="Test Ad")
-        assert response.get("status") is not None, "Объявление не было создано"
-        
-        # Получаем все объявления продавца с повторными попытками
-        ads = self.get_ads_by_seller(seller_id, max_retries=10, delay=2.0)
-        assert len(ads) > 0, "Не удалось получить созданное объявление"
-        
-        item_id = ads[0].get("id")
-        assert item_id is not None, "В ответе отсутствует id"
-        
-        # Получаем статистику
-        response = requests.get(f"{self.base_url}/statistic/{item_id}")
-        
-        assert response.status_code == 200, f"Ожидался статус 200, получен {response.status_code}"
-        data = response.json()
-        assert isinstance(data, list), "Ответ должен быть массивом"
-        assert len(data) > 0, "Массив не должен быть пустым"
-        # Проверяем наличие полей статистики
-        stats = data[0]
-        assert "likes" in stats or "viewCount" in stats or "contacts" in stats, "В ответе отсутствует статистика"
+        # Чтение статистики может менять счетчики просмотров, поэтому берем объявление эксклюзивно
+        with ad_pool.lease(exclusive=True) as ad:
+            item_id = ad.get("id")
+            assert item_id is not None, "В ответе отсутствует id"
+            
+            # Получаем статистику
+            response = self.client.get(f"/statistic/{item_id}")
+            
+            assert response.status_code == 200, f"Ожидался статус 200, получен {response.status_code}"
+            data = response.json()
+            # Проверяем наличие и типы полей статистики
+            errors = validate_statistic_list(data)
+            assert not errors, format_violations(errors)
+            assert len(data) > 0, "Массив не должен быть пустым"
     
     def test_get_ad_stats_not_found(self):
         """TC-020: Получение статистики несуществующего объявления"""
-        fake_id = str(uuid.uuid4())
-        response = requests.get(f"{self.base_url}/statistic/{fake_id}")
+        fake_id = self.fake_item_id()
+        response = self.client.get(f"/statistic/{fake_id}")
         
         assert response.status_code == 404, f"Ожидался статус 404, получен {response.status_code}"
     
     def test_get_ad_stats_invalid_format(self):
         """TC-021: Получение статистики с невалидным форматом id"""
-        response = requests.get(f"{self.base_url}/statistic/abc123")
+        response = self.client.get("/statistic/abc123")
         
         assert response.status_code in [400, 404], f"Ожидался статус 400 или 404, получен {response.status_code}"
     
-    def test_get_ad_stats_view_count_increment(self):
+    def test_get_ad_stats_view_count_increment(self, ad_pool: AdPool):
         """TC-022: Проверка корректности данных статистики (счетчик просмотров)"""
-        # Создаем объявление
-        seller_id = self.generate_unique_seller_id()
-        response = self.create_ad(seller_id=seller_id, name="Test Ad")
-        assert response.get("status") is not None, "Объявление не было создано"
-        
-        # Получаем все объявления продавца с повторными попытками
-        ads = self.get_ads_by_seller(seller_id, max_retries=10, delay=2.0)
-        assert len(ads) > 0, "Не удалось получить созданное объявление"
-        
-        item_id = ads[0].get("id")
-        assert item_id is not None, "В ответе отсутствует id"
-        
-        # Получаем статистику несколько раз
-        response1 = requests.get(f"{self.base_url}/statistic/{item_id}")
-        assert response1.status_code == 200
-        stats1 = response1.json()
-        
-        time.sleep(1)  # Небольшая задержка
-        
-        response2 = requests.get(f"{self.base_url}/statistic/{item_id}")
-        assert response2.status_code == 200
-        stats2 = response2.json()
-        
-        # Извлекаем viewCount из разных возможных структур ответа
-        view_count1 = None
-        view_count2 = None
-        
-        if isinstance(stats1, list) and len(stats1) > 0:
-            view_count1 = stats1[0].get("viewCount")
-        elif isinstance(stats1, dict):
-            view_count1 = stats1.get("viewCount")
-        
-        if isinstance(stats2, list) and len(stats2) > 0:
-            view_count2 = stats2[0].get("viewCount")
-        elif isinstance(stats2, dict):
-            view_count2 = stats2.get("viewCount")
-        
-        # Если viewCount присутствует, проверяем его увеличение
-        if view_count1 is not None and view_count2 is not None:
-            assert view_count2 >= view_count1, "Счетчик просмотров должен увеличиваться"
+        # Тест меняет счетчик просмотров, поэтому берем объявление эксклюзивно
+        with ad_pool.lease(exclusive=True) as ad:
+            item_id = ad.get("id")
+            assert item_id is not None, "В ответе отсутствует id"
+            
+            # Получаем статистику несколько раз
+            response1 = self.client.get(f"/statistic/{item_id}")
+            assert response1.status_code == 200
+            stats1 = response1.json()
+            
+            response2 = self.client.get(f"/statistic/{item_id}")
+            assert response2.status_code == 200
+            stats2 = response2.json()
+            
+            # Проверяем схему обоих ответов: viewCount обязателен и является целым
+            errors = validate_statistic_list(stats1, "$1") + validate_statistic_list(stats2, "$2")
+            assert not errors, format_violations(errors)
+            assert stats1 and stats2, "Массив статистики не должен быть пустым"
+            
+            assert stats2[0]["viewCount"] >= stats1[0]["viewCount"], "Счетчик просмотров должен увеличиваться"
     
     # ========== Интеграционные тесты ==========
     
@@ -408,25 +414,25 @@ class TestAdsAPI:
         response = self.create_ad(seller_id=seller_id, name="Integration Test Ad")
         assert response.get("status") is not None, "Объявление не было создано"
         
-        # 2. Получаем все объявления продавца с повторными попытками
-        seller_ads = self.get_ads_by_seller(seller_id, max_retries=10, delay=2.0)
+        # 2. Ждем появления объявления в списке продавца
+        seller_ads = self.get_ads_by_seller(seller_id)
         assert len(seller_ads) >= 1, "Должно быть минимум одно объявление продавца"
         
         item_id = seller_ads[0].get("id")
         assert item_id is not None, "В ответе отсутствует id"
         
         # 3. Получаем объявление по id
-        response = requests.get(f"{self.base_url}/item/{item_id}")
+        response = self.client.get(f"/item/{item_id}")
         assert response.status_code == 200
         retrieved_data = response.json()
-        assert isinstance(retrieved_data, list), "Ответ должен быть массивом"
+        errors = validate_item_list(retrieved_data)
+        assert not errors, format_violations(errors)
         assert len(retrieved_data) > 0, "Массив не должен быть пустым"
-        assert retrieved_data[0].get("id") == item_id, "id не соответствует"
-        seller_id_in_response = retrieved_data[0].get("sellerId") or retrieved_data[0].get("sellerID")
-        assert seller_id_in_response == seller_id, "sellerID не соответствует"
+        assert retrieved_data[0]["id"] == item_id, "id не соответствует"
+        assert seller_id_of(retrieved_data[0]) == seller_id, "sellerID не соответствует"
         
         # 4. Получаем статистику
-        stats_response = requests.get(f"{self.base_url}/statistic/{item_id}")
+        stats_response = self.client.get(f"/statistic/{item_id}")
         assert stats_response.status_code == 200
         
         # 5. Проверяем, что созданное объявление есть в списке продавца
@@ -438,46 +444,45 @@ class TestAdsAPI:
         seller_id = self.generate_unique_seller_id()
         
         # Создаем 3 объявления
-        self.create_ad(seller_id=seller_id, name="Ad 1")
-        self.create_ad(seller_id=seller_id, name="Ad 2")
-        self.create_ad(seller_id=seller_id, name="Ad 3")
+        created = self.create_ads_bulk(seller_id, [{"name": f"Ad {i}"} for i in range(1, 4)])
+        assert created.ok, f"Не удалось создать объявления: {created.failures}"
         
-        # Получаем все объявления продавца с повторными попытками
-        seller_ads = self.get_ads_by_seller(seller_id, max_retries=10, delay=2.0)
+        # Ждем, пока все 3 объявления станут видны
+        seller_ads = self.get_ads_by_seller(seller_id, min_count=3)
         assert len(seller_ads) >= 3, f"Ожидалось минимум 3 объявления, получено {len(seller_ads)}"
         
         # Проверяем уникальность id
         item_ids = [ad.get("id") for ad in seller_ads if ad.get("id")]
         assert len(item_ids) == len(set(item_ids)), "id должны быть уникальными"
         
-        # Проверяем, что все объявления принадлежат продавцу
-        for ad in seller_ads:
-            seller_id_in_response = ad.get("sellerId") or ad.get("sellerID")
-            assert seller_id_in_response == seller_id, "Все объявления должны принадлежать одному продавцу"
+        # Проверяем схему и то, что все объявления принадлежат продавцу
+        errors = listing_violations(seller_ads, seller_id=seller_id)
+        assert not errors, format_violations(errors)
     
     def test_item_id_uniqueness(self):
         """TC-025: Проверка уникальности id при создании"""
         seller_id = self.generate_unique_seller_id()
         
         # Создаем несколько объявлений
-        self.create_ad(seller_id=seller_id, name="Ad 1")
-        self.create_ad(seller_id=seller_id, name="Ad 2")
-        self.create_ad(seller_id=seller_id, name="Ad 3")
-        self.create_ad(seller_id=seller_id, name="Ad 4")
-        self.create_ad(seller_id=seller_id, name="Ad 5")
+        created = self.create_ads_bulk(seller_id, [{"name": f"Ad {i}"} for i in range(1, 6)])
+        assert created.ok, f"Не удалось создать объявления: {created.failures}"
+        assert len(set(created.item_ids)) == 5, "id созданных объявлений должны быть уникальными"
         
-        # Получаем все объявления продавца с повторными попытками
-        ads = self.get_ads_by_seller(seller_id, max_retries=10, delay=2.0)
-        item_ids = [ad.get("id") for ad in ads if ad.get("id")]
+        # Ждем, пока все 5 объявлений станут видны; список проверяется потоково
+        report = self.stream_ads_by_seller(seller_id, min_count=5)
+        assert report.status_code == 200, f"Ожидался статус 200, получен {report.status_code}"
+        assert report.count >= 5, f"Ожидалось минимум 5 объявлений, получено {report.count}"
+        assert report.violation_count == 0, format_violations(report.violations, total=report.violation_count)
+        assert all(item_id in report.ids for item_id in created.item_ids), "В списке нет созданных объявлений"
         
         # Проверяем уникальность
-        assert len(item_ids) == len(set(item_ids)), "Обнаружены дубликаты id"
+        assert report.duplicate_count == 0, f"Обнаружены дубликаты id: {report.duplicates}"
     
     # ========== Негативные тесты ==========
     
     def test_wrong_http_method(self):
         """TC-026: Отправка запроса с некорректным HTTP методом"""
-        response = requests.put(f"{self.base_url}/item", json={})
+        response = self.client.put("/item", json={})
         
         assert response.status_code in [405, 400, 404], f"Ожидался статус 405/400/404, получен {response.status_code}"
     
@@ -485,7 +490,7 @@ class TestAdsAPI:
         """TC-027: Отправка запроса с некорректным Content-Type"""
         headers = {"Content-Type": "text/plain"}
         payload = "not json"
-        response = requests.post(f"{self.base_url}/item", data=payload, headers=headers)
+        response = self.client.post("/item", data=payload, headers=headers)
         
         assert response.status_code in [400, 415], f"Ожидался статус 400/415, получен {response.status_code}"
     
@@ -493,11 +498,36 @@ class TestAdsAPI:
         """TC-028: Отправка запроса с некорректным JSON"""
         headers = {"Content-Type": "application/json"}
         payload = "{invalid json}"
-        response = requests.post(f"{self.base_url}/item", data=payload, headers=headers)
+        response = self.client.post("/item", data=payload, headers=headers)
         
         assert response.status_code == 400, f"Ожидался статус 400, получен {response.status_code}"
+    
+    @pytest.mark.heavy
+    def test_create_ad_invalid_input_matrix(self):
+        """TC-029: Перебор граничных и некорректных значений полей при создании объявления"""
+        # По одному измененному полю плюс некорректный JSON; частоту к общему стенду ограничивает клиент.
+        # Края диапазона sellerID допустимы: на общем стенде тест идет только с --ads-heavy
+        cases = generate_cases(self.generate_unique_seller_id(), range_edges=True)
+        report = run_cases(self.client, cases)
+        
+        assert len(report.results) == len(cases)
+        assert not report.unexpected, report.format()
+    
+    @pytest.mark.heavy
+    def test_get_ad_stats_concurrent_reads_monotonic(self):
+        """TC-030: Конкурентные чтения статистики одного объявления вперемешку с созданием объявлений"""
+        seller_id = self.generate_unique_seller_id()
+        item_id = prepare_item(self.client, seller_id, timeout=self.listing_timeout)
+        
+        # Увеличение viewCount на каждое чтение сервисом не гарантировано, поэтому проверяется
+        # только монотонность; полный прогон с проверкой потерянных обновлений - counter_stress.py
+        report = run_stress(self.client, item_id, seller_id, levels=(1, 8), operations=60, increment=None)
+        
+        for level in report.levels:
+            assert not level.read_errors and not level.create_errors, report.format()
+            assert len(level.reads) + level.create_latency.count == 60
+        assert not report.violations(), report.format()
 
 
 if __name__ == "__main__":
     pytest.main([__file__, "-v"])
-
@@ -0,0 +1,1053 @@
+"""
+Тесты вспомогательной инфраструктуры: ожидание, заглушка API, клиент.
+Не требуют сети и не зависят от выбранного --ads-target.
+"""
+
+import asyncio
+import itertools
+import json
+import random
+import tempfile
+import threading
+import time
+import uuid
+
+import pytest
+import requests
+
+from ad_pool import AdPool
+from ads import build_ad_payload, create_ads_bulk, endpoint_template, parse_item_id
+from api_client import AdsApiClient, DeadlineExceeded
+from benchmarks import Baseline, BaselineMissing, BenchSession, find_regressions, measure
+from cassette import Cassette, CassetteMiss, RecordingAdapter, ReplayAdapter, request_key
+from counter_stress import CONTROL_ATTEMPTS, LevelResult, Read, find_non_monotonic, prepare_item, run_stress
+from fault_proxy import Faults
+from fuzzing import OK, REJECT, FuzzCase, RateLimiter, Variant, generate_cases, run_cases
+from instrumentation import CallRecorder
+from lag_profile import ENDPOINTS, LISTING, STATISTIC, EndpointLag, LagProfileError, LagSample, load_deadlines, profile
+from latency import LatencyHistogram
+from loadgen import LoadRunner
+from response_cache import ResponseCache
+from schemas import (Field, Schema, compile_schema, listing_violations, seller_id_of,
+                     validate_create_response, validate_item)
+from scheduling import DurationHistory, history_key, plan, simulate
+from seller_ids import SellerIdAllocator, free_range
+from snapshot import Snapshot, SnapshotError, seller_counts, write_snapshot
+from streaming import StreamFormatError, UuidSet, check_listing_stream, iter_json_array, stream_seller_listing
+from stub_server import AdsStore, AdsStubApp, InProcessAdapter, INPROCESS_BASE_URL, StubServer
+from throttling import (CircuitOpenError, SharedThrottle, ThrottleDeadline, ThrottleError, default_state_path,
+                        parse_retry_after, remove_run_state)
+from waiting import contains_item, has_at_least, wait_until
+
+
+class FakeClock:
+    """Управляемые часы: sleep сдвигает время без реального ожидания"""
+
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def __call__(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+@pytest.fixture
+def stub_client():
+    """Клиент, работающий с отдельной заглушкой без сокетов"""
+    app = AdsStubApp()
+    with AdsApiClient(base_url=INPROCESS_BASE_URL, transport=InProcessAdapter(app)) as client:
+        yield client
+
+
+class TestWaitUntil:
+    """Ожидание условия с дедлайном и экспоненциальной паузой"""
+
+    def test_returns_immediately_when_ready(self):
+        clock = FakeClock()
+        result = wait_until(lambda: [1], has_at_least(1), clock=clock, sleep=clock.sleep)
+        assert result == [1]
+        assert clock.sleeps == []
+
+    def test_backoff_grows_and_respects_deadline(self):
+        clock = FakeClock()
+        calls = []
+        result = wait_until(lambda: calls.append(1) or [], has_at_least(1), timeout=1.0,
+                            initial_delay=0.01, max_delay=0.2, clock=clock, sleep=clock.sleep)
+        assert result == []
+        assert clock.now == pytest.approx(1.0)
+        assert all(pause <= 0.2 for pause in clock.sleeps)
+        assert clock.sleeps[0] <= 0.01 < clock.sleeps[4]
+        assert len(calls) == len(clock.sleeps) + 1
+
+    def test_jitter_does_not_consume_global_random(self):
+        clock = FakeClock()
+        random.seed(7)
+        expected = random.random()
+        random.seed(7)
+        wait_until(lambda: [], has_at_least(1), timeout=0.5, clock=clock, sleep=clock.sleep)
+        assert len(clock.sleeps) > 1
+        assert random.random() == expected
+
+    def test_contains_item(self):
+        assert contains_item("b")([{"id": "a"}, {"id": "b"}])
+        assert not contains_item("c")([{"id": "a"}])
+
+    def test_waits_for_delayed_visibility(self):
+        app = AdsStubApp(AdsStore(visibility_delay=0.05))
+        with AdsApiClient(base_url=INPROCESS_BASE_URL, transport=InProcessAdapter(app)) as client:
+            app.store.add(123456, "Ad", 100, {})
+            ads = wait_until(lambda: client.get("/123456/item").json(), has_at_least(1), timeout=2.0)
+        assert len(ads) == 1
+
+
+class TestBulkCreate:
+    """Параллельное создание объявлений"""
+
+    def test_parse_item_id(self):
+        item_id = "0b9c6f3e-5a1d-4c7e-9a2b-3f4e5d6c7b8a"
+        assert parse_item_id(f"Сохранили объявление - {item_id}") == item_id
+        assert parse_item_id("Сохранили объявление") is None
+        assert parse_item_id(None) is None
+
+    def test_returns_ids_in_spec_order(self, stub_client):
+        specs = [{"name": f"Ad {i}"} for i in range(10)]
+        result = create_ads_bulk(stub_client, 123456, specs, concurrency=4)
+        assert result.ok
+        assert len(set(result.item_ids)) == 10
+        for item_id, spec in zip(result.item_ids, specs):
+            assert stub_client.get(f"/item/{item_id}").json()[0]["name"] == spec["name"]
+
+    def test_failures_do_not_abort_batch(self, stub_client):
+        specs = [{"name": "Ad"}, {"name": ""}, {"name": "Ad", "price": -1}, {"name": "Ad"}]
+        result = create_ads_bulk(stub_client, 123456, specs)
+        assert [failure.index for failure in result.failures] == [1, 2]
+        assert all(failure.status_code == 400 for failure in result.failures)
+        assert len(result.created_ids) == 2
+        assert result.item_ids[1] is None and result.item_ids[2] is None
+
+
+class TestSellerIdAllocator:
+    """Выдача sellerID без пересечений между воркерами"""
+
+    def test_workers_get_disjoint_slices(self):
+        allocators = [SellerIdAllocator(index, 4, nonce="run", block_size=8) for index in range(4)]
+        issued = [{allocator.next() for _ in range(100)} for allocator in allocators]
+        for index, ids in enumerate(issued):
+            assert all(allocators[index].slice_start <= seller_id < allocators[index].slice_end
+                       for seller_id in ids)
+            assert all(111111 <= seller_id <= 999999 for seller_id in ids)
+        assert len(set().union(*issued)) == 400
+        assert allocators[-1].slice_end == 1000000
+
+    def test_free_range_around_snapshot_sellers(self):
+        # Продавцы снимка вверху, внизу и посередине диапазона
+        assert free_range((999000, 999999)) == (111111, 998999)
+        assert free_range((111111, 120000)) == (120001, 999999)
+        assert free_range((500000, 600000)) == (600001, 999999)
+        with pytest.raises(ValueError):
+            free_range((111111, 999999))
+        with pytest.raises(ValueError):
+            SellerIdAllocator(0, 4, low=111111, high=111112)
+
+    def test_keyed_ids_do_not_depend_on_call_order(self):
+        first = SellerIdAllocator(nonce="seed")
+        first.next()
+        a_then_b = [first.keyed("test_a").next(), first.keyed("test_b").next()]
+        second = SellerIdAllocator(nonce="seed")
+        b_then_a = [second.keyed("test_b").next(), second.keyed("test_a").next()]
+        assert a_then_b == b_then_a[::-1]
+        assert SellerIdAllocator(nonce="other").keyed("test_a").next() != a_then_b[0]
+
+    def test_keyed_allocators_skip_claimed_blocks(self):
+        allocator = SellerIdAllocator(nonce="seed", block_size=8)
+        ids = [allocator.keyed("same").next() for _ in range(3)]
+        assert len({(seller_id - allocator.slice_start) // 8 for seller_id in ids}) == 3
+
+    def test_nonce_changes_start_block(self):
+        first = SellerIdAllocator(nonce="run-1").next()
+        assert SellerIdAllocator(nonce="run-1").next() == first
+        assert SellerIdAllocator(nonce="run-2").next() != first
+
+    def test_probes_once_per_block_and_skips_busy(self):
+        probed = []
+
+        def probe(seller_id):
+            probed.append(seller_id)
+            return len(probed) == 1  # первый блок занят
+
+        allocator = SellerIdAllocator(nonce="run", block_size=4, probe=probe)
+        ids = [allocator.next() for _ in range(8)]
+        assert len(probed) == 3
+        assert probed[0] not in ids
+        assert ids[:4] == list(range(probed[1], probed[1] + 4))
+
+
+class TestLatencyHistogram:
+    """Гистограмма задержек с относительной точностью ~1%"""
+
+    def test_percentiles_within_precision(self):
+        values = [random.randint(1, 5_000_000) for _ in range(20_000)]
+        histogram = LatencyHistogram()
+        for value in values:
+            histogram.record_us(value)
+        values.sort()
+        for percentile in (50, 95, 99):
+            exact = values[int(len(values) * percentile / 100) - 1]
+            assert histogram.percentile_us(percentile) == pytest.approx(exact, rel=0.02)
+        assert histogram.max_us == values[-1]
+        assert histogram.min_us == values[0]
+
+    def test_merge(self):
+        first, second = LatencyHistogram(), LatencyHistogram()
+        first.record(0.001)
+        second.record(0.003)
+        merged = first.merge(second)
+        assert merged.count == 2
+        assert merged.summary()["max_ms"] == 3.0
+
+
+class TestLoadRunner:
+    """Нагрузочный режим против локальной HTTP-заглушки"""
+
+    @pytest.mark.parametrize("rps", [None, 200])
+    def test_short_run(self, rps):
+        with StubServer() as server:
+            runner = LoadRunner(server.base_url, duration=0.3, rps=rps, concurrency=4, seed_ads=4)
+            report = asyncio.run(runner.run())
+        data = report.to_dict()
+        assert data["requests"] > 0
+        assert set(data["endpoints"]) <= {"POST /item", "GET /item/:id", "GET /:sellerID/item",
+                                          "GET /statistic/:id"}
+        for row in data["endpoints"].values():
+            assert row["error_rate"] == 0.0
+            assert row["latency"]["p50_ms"] <= row["latency"]["p99_ms"] <= row["latency"]["max_ms"]
+
+
+class TestInstrumentation:
+    """Запись HTTP-вызовов клиента"""
+
+    @pytest.mark.parametrize("method, path, expected", [
+        ("POST", "/item", "POST /item"),
+        ("GET", "/item/0b9c6f3e-5a1d-4c7e-9a2b-3f4e5d6c7b8a", "GET /item/:id"),
+        ("GET", "/item/", "GET /item/:id"),
+        ("GET", "/statistic/abc123", "GET /statistic/:id"),
+        ("GET", "/123456/item", "GET /:sellerID/item"),
+        ("GET", "/123456/item?limit=1", "GET /:sellerID/item"),
+    ])
+    def test_endpoint_template(self, method, path, expected):
+        assert endpoint_template(method, path) == expected
+
+    def test_recorder_observes_client(self, stub_client):
+        recorder = CallRecorder()
+        stub_client.observers.append(recorder)
+        stub_client.get("/123456/item")
+        stub_client.get("/statistic/abc123")
+        calls = recorder.drain()
+        assert [(method, path, status) for method, path, status, _, _ in calls] == [
+            ("GET", "/123456/item", 200), ("GET", "/statistic/abc123", 400)]
+        assert all(size > 0 and elapsed > 0 for _, _, _, size, elapsed in calls)
+        assert recorder.drain() == []
+
+
+class TestCassette:
+    """Запись и воспроизведение HTTP-взаимодействий"""
+
+    def test_key_ignores_json_key_order(self):
+        assert request_key("POST", "/api/1/item", b'{"a": 1, "b": 2}') == \
+            request_key("post", "/api/1/item", '{"b":2,"a":1}')
+        assert request_key("GET", "/api/1/item/1", None) != request_key("GET", "/api/1/item/2", None)
+
+    def test_record_then_replay(self, tmp_path):
+        path = str(tmp_path / "cassette.jsonl")
+        app = AdsStubApp()
+        with AdsApiClient(base_url=INPROCESS_BASE_URL,
+                          transport=RecordingAdapter(InProcessAdapter(app), path)) as client:
+            listing_before = client.get("/123456/item").json()
+            created = client.post("/item", json={"sellerID": 123456, "name": "Ad", "price": 1,
+                                                 "statistics": {}}).json()
+            listing_after = client.get("/123456/item").json()
+
+        cassette = Cassette(path)
+        assert len(cassette) == 3
+        with AdsApiClient(base_url="http://replay.invalid/api/1", transport=ReplayAdapter(cassette)) as client:
+            assert client.get("/123456/item").json() == listing_before
+            assert client.post("/item", json={"statistics": {}, "price": 1, "name": "Ad",
+                                              "sellerID": 123456}).json() == created
+            # Повторные запросы получают записанные ответы по порядку, затем последний
+            assert client.get("/123456/item").json() == listing_after
+            assert client.get("/123456/item").json() == listing_after
+            with pytest.raises(CassetteMiss):
+                client.get("/654321/item")
+
+    def test_recording_does_not_mix_runs(self, tmp_path):
+        path = str(tmp_path / "cassette.jsonl")
+        for name in ("first", "second"):
+            app = AdsStubApp()
+            app.store.add(123456, name, 1, {})
+            overwrite = name == "second"
+            with AdsApiClient(base_url=INPROCESS_BASE_URL,
+                              transport=RecordingAdapter(InProcessAdapter(app), path, overwrite=overwrite)) as client:
+                client.get("/123456/item")
+            if not overwrite:
+                # Без overwrite существующая кассета не перезаписывается и не дополняется
+                with pytest.raises(FileExistsError):
+                    RecordingAdapter(InProcessAdapter(app), path)
+        cassette = Cassette(path)
+        assert len(cassette) == 1
+        with AdsApiClient(base_url="http://replay.invalid/api/1", transport=ReplayAdapter(cassette)) as client:
+            assert client.get("/123456/item").json()[0]["name"] == "second"
+
+    def test_records_deeply_nested_body(self, tmp_path):
+        # Тело из TC-029: json.loads падает с RecursionError, ключ строится по байтам
+        path = str(tmp_path / "cassette.jsonl")
+        body = "[" * 100_000 + "]" * 100_000
+        with AdsApiClient(base_url=INPROCESS_BASE_URL,
+                          transport=RecordingAdapter(InProcessAdapter(AdsStubApp()), path)) as client:
+            assert client.post("/item", data=body).status_code == 400
+        with AdsApiClient(base_url="http://replay.invalid/api/1", transport=ReplayAdapter(Cassette(path))) as client:
+            assert client.post("/item", data=body).status_code == 400
+
+    def test_large_cassette_loads_into_index(self, tmp_path):
+        path = tmp_path / "large.jsonl"
+        lines = ['{"v": 1}'] + [f'{{"k":"{index:032x}","s":200,"h":{{}},"b":"[]"}}' for index in range(100_000)]
+        path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+        cassette = Cassette(str(path))
+        assert len(cassette.index) == 100_000
+        assert cassette.next_response(f"{99_999:032x}")["s"] == 200
+
+
+class TestAdPool:
+    """Пул заранее созданных объявлений"""
+
+    def test_fill_waits_for_visibility(self):
+        app = AdsStubApp(AdsStore(visibility_delay=0.05))
+        with AdsApiClient(base_url=INPROCESS_BASE_URL, transport=InProcessAdapter(app)) as client:
+            pool = AdPool(client, 123456, size=3, timeout=2.0).fill()
+            assert len(pool.ads) == 3
+            for ad in pool.ads:
+                assert client.get(f"/item/{ad['id']}").status_code == 200
+
+    def test_exclusive_lease_is_not_shared(self, stub_client):
+        pool = AdPool(stub_client, 123456, size=2).fill()
+        with pool.lease(exclusive=True) as exclusive:
+            assert pool.active_leases == {exclusive["id"]: "exclusive"}
+            shared_ids = set()
+            for _ in range(4):
+                with pool.lease() as ad:
+                    shared_ids.add(ad["id"])
+            assert exclusive["id"] not in shared_ids
+        assert pool.active_leases == {}
+
+    def test_used_exclusive_item_is_replaced(self, stub_client):
+        pool = AdPool(stub_client, 123456, size=1).fill()
+        with pool.lease(exclusive=True) as first:
+            pass
+        with pool.lease(exclusive=True) as second:
+            assert second["id"] != first["id"]
+        assert len(pool.ads) == 2
+
+    def test_creation_does_not_block_other_leases(self):
+        app = AdsStubApp(AdsStore(visibility_delay=0.5))
+        with AdsApiClient(base_url=INPROCESS_BASE_URL, transport=InProcessAdapter(app)) as client:
+            pool = AdPool(client, 123456, size=1, timeout=5.0).fill()
+            with pool.lease(exclusive=True):
+                pass
+            def lease_new():
+                # Единственное объявление уже использовано эксклюзивно: создается новое
+                with pool.lease(exclusive=True):
+                    pass
+
+            creating = threading.Thread(target=lease_new)
+            creating.start()
+            time.sleep(0.05)
+            started = time.perf_counter()
+            with pool.lease() as ad:
+                assert ad["id"] == pool.ads[0]["id"]
+            assert time.perf_counter() - started < 0.2
+            creating.join()
+            assert len(pool.ads) == 2
+
+
+class TestBenchmarks:
+    """Сравнение результатов бенчмарков с базовым уровнем"""
+
+    def test_measure_counts_only_measured_iterations(self):
+        calls = []
+        result = measure("noop", lambda: calls.append(1), warmup=3, iterations=20)
+        assert len(calls) == 23
+        assert len(result.samples_ms) == 20
+        assert result.median_ms <= result.p99_ms
+
+    def test_find_regressions(self):
+        baseline = {"median_ms": 10.0, "p99_ms": 20.0}
+        assert find_regressions({"median_ms": 12.0, "p99_ms": 24.0}, baseline, threshold=0.25) == []
+        regressions = find_regressions({"median_ms": 13.0, "p99_ms": 20.0}, baseline, threshold=0.25)
+        assert len(regressions) == 1 and regressions[0].startswith("median_ms")
+        # Относительно большое, но абсолютно малое ухудшение - шум
+        assert find_regressions({"median_ms": 0.3, "p99_ms": 0.4}, {"median_ms": 0.1, "p99_ms": 0.2},
+                                min_delta_ms=1.0) == []
+
+    def test_baseline_roundtrip_per_target(self, tmp_path):
+        path = str(tmp_path / "baseline.json")
+        session = BenchSession("inprocess", Baseline(path), warmup=0, iterations=5, update=True)
+        assert session.run("noop", lambda: None) == []
+        session.finish()
+        baseline = Baseline(path)
+        assert baseline.get("inprocess", "noop")["iterations"] == 5
+        assert baseline.get("live", "noop") is None
+        slow = {"median_ms": 1000.0, "p99_ms": 1000.0}
+        assert find_regressions(slow, baseline.get("inprocess", "noop"))
+
+    def test_missing_baseline_warns(self, tmp_path):
+        session = BenchSession("local", Baseline(str(tmp_path / "absent.json")), warmup=0, iterations=3)
+        with pytest.warns(BaselineMissing, match="noop"):
+            assert session.run("noop", lambda: None) == []
+        assert session.missing == ["noop"]
+
+
+def _item(**overrides):
+    item = {"id": "0b9c6f3e-5a1d-4c7e-9a2b-3f4e5d6c7b8a", "sellerId": 123456, "name": "Ad", "price": 100,
+            "statistics": {"likes": 0, "viewCount": 0, "contacts": 0}, "createdAt": "2025-01-01"}
+    item.update(overrides)
+    return item
+
+
+class TestSchemas:
+    """Скомпилированные проверки схем ответов"""
+
+    def test_valid_item(self):
+        assert validate_item(_item()) == []
+        assert validate_create_response({"status": "Сохранили объявление - 1"}) == []
+
+    def test_seller_id_alias(self):
+        item = _item()
+        item["sellerID"] = item.pop("sellerId")
+        assert validate_item(item) == []
+        assert seller_id_of(item) == 123456
+        assert validate_item(_item(sellerID=654321)) == ["$.sellerId: значения sellerId и sellerID различаются"]
+        assert "отсутствует обязательное поле sellerId / sellerID" in validate_item({"id": "x"})[1]
+
+    def test_collects_all_violations_with_paths(self):
+        data = [_item(), _item(price="100", statistics={"likes": -1, "viewCount": 0}), "oops", _item(sellerId=1)]
+        assert listing_violations(data, seller_id=123456) == [
+            "$[1].price: ожидался int, получен str",
+            "$[1].statistics.likes: значение -1 меньше 0",
+            "$[1].statistics.contacts: отсутствует обязательное поле contacts",
+            "$[2]: ожидался объект, получен str",
+            "$[3].sellerId: значение 1, ожидалось 123456",
+        ]
+        assert listing_violations({"id": 1}) == ["$: ожидался массив, получен dict"]
+
+    def test_bool_is_not_int(self):
+        assert validate_item(_item(price=True)) == ["$.price: ожидался int, получен bool"]
+
+    def test_custom_schema(self):
+        validate = compile_schema(Schema.of("custom", {"code": Field(str, required=False, non_empty=True)}))
+        assert validate({}) == []
+        assert validate({"code": ""}) == ["$.code: пустое значение"]
+
+    def test_large_listing_single_pass(self):
+        listing = [_item() for _ in range(100_000)]
+        assert listing_violations(listing, seller_id=123456) == []
+
+
+def _chunks(data: bytes, size: int):
+    return [data[start:start + size] for start in range(0, len(data), size)]
+
+
+class TestStreaming:
+    """Потоковый разбор и проверка списков объявлений"""
+
+    @pytest.mark.parametrize("chunk_size", [1, 3, 7, 4096])
+    def test_parses_array_split_anywhere(self, chunk_size):
+        data = [{"name": "Объявление \"ё\"", "n": 12345}, -0.5, "x", [1, [2]], None, True, 1e3]
+        raw = json.dumps(data, ensure_ascii=False, indent=1).encode("utf-8")
+        assert list(iter_json_array(_chunks(raw, chunk_size))) == data
+        assert list(iter_json_array([b" [ ] "])) == []
+
+    @pytest.mark.parametrize("raw", [b'{"id": 1}', b"[1 2]", b"[1, 2", b"[1,]", b"[1] 2", b""])
+    def test_rejects_malformed_stream(self, raw):
+        with pytest.raises(StreamFormatError):
+            list(iter_json_array(_chunks(raw, 2)))
+
+    def test_uuid_set(self):
+        ids = [str(uuid.UUID(int=random.getrandbits(128), version=4)) for _ in range(5000)]
+        ids += ["not-a-uuid", str(uuid.UUID(int=0))]
+        ids_set = UuidSet(capacity=8)
+        assert all(ids_set.add(item_id) for item_id in ids)
+        assert not any(ids_set.add(item_id.upper()) for item_id in ids[:100])
+        assert len(ids_set) == len(ids)
+        assert all(item_id in ids_set for item_id in ids)
+        assert "00000000-0000-4000-8000-000000000001" not in ids_set
+        assert ids_set.nbytes <= 4 * 16 * len(ids)
+
+    def test_reports_duplicates_owner_and_schema(self):
+        item_id = _item()["id"]
+        listing = [_item(), _item(id=item_id), _item(sellerId=1, id=str(uuid.uuid4())), {"id": str(uuid.uuid4())}]
+        report = check_listing_stream(_chunks(json.dumps(listing).encode(), 50), seller_id=123456, max_reported=2)
+        assert report.count == 4 and not report.ok
+        assert (report.duplicate_count, report.duplicates) == (1, [item_id])
+        assert report.violation_count == 6
+        assert report.violations == ["$[2].sellerId: значение 1, ожидалось 123456",
+                                     "$[3].sellerId: отсутствует обязательное поле sellerId / sellerID"]
+
+    def test_stream_seller_listing(self, stub_client):
+        created = create_ads_bulk(stub_client, 123456, [{"name": f"Ad {index}"} for index in range(50)])
+        report = stream_seller_listing(stub_client, 123456, chunk_size=256)
+        assert report.ok and report.count == 50
+        assert all(item_id in report.ids for item_id in created.item_ids)
+        assert stream_seller_listing(stub_client, "abc").status_code == 400
+
+
+class TestFuzzing:
+    """Табличный перебор входных данных POST /item"""
+
+    def test_pairs_give_ten_thousand_unique_cases(self):
+        single, pairs = generate_cases(), generate_cases(pairs=True, range_edges=True)
+        assert len(pairs) >= 10_000
+        assert len({(case.content_type, case.body) for case in pairs}) == len(pairs)
+        assert {case.row for case in single} < {case.row for case in pairs}
+
+    def test_accepted_sellers_come_from_allocated_seller(self):
+        edges = {111111, 111112, 555555, 999998, 999999}
+        for range_edges in (False, True):
+            cases = generate_cases(300123, range_edges=range_edges)
+            accepted = {json.loads(case.body)["sellerID"] for case in cases
+                        if case.fields == ("sellerID",) and case.expect != REJECT}
+            assert accepted == ({300123} | edges if range_edges else {300123})
+        raw = [case.body for case in generate_cases(300123) if case.fields == ("<raw>",)]
+        assert not any(b"123456" in body or b"424242" in body for body in raw)
+
+    def test_equivalent_bodies_are_deduplicated(self):
+        variants = {"statistics": [Variant([], REJECT)], "statistics.likes": [Variant(-1, REJECT), Variant(0, OK)],
+                    "price": [Variant(1000, OK)]}
+        cases = generate_cases(123456, pairs=True, variants=variants, raw=False)
+        # price=1000 совпадает с базовым телом, likes внутри statistics=[] не применяется
+        assert [case.label for case in cases] == ["statistics=[]", "statistics.likes=-1", "statistics.likes=0"]
+        assert [case.expect for case in cases] == [REJECT, REJECT, OK]
+
+    def test_pair_expectation_rejects_if_any_field_is_invalid(self):
+        variants = {"price": [Variant(-1, REJECT)], "name": [Variant("a", OK)]}
+        pair = generate_cases(123456, pairs=True, variants=variants, raw=False)[-1]
+        assert pair.fields == ("price", "name") and pair.expect == REJECT
+
+    def test_rate_limiter_spaces_requests(self):
+        clock = FakeClock()
+        limiter = RateLimiter(4.0, clock=clock, sleep=clock.sleep)
+        for _ in range(5):
+            limiter.acquire()
+        assert clock.sleeps == [0.25] * 4
+
+    def test_reports_unexpected_statuses(self, stub_client):
+        cases = generate_cases(123456)
+        report = run_cases(stub_client, cases + [FuzzCase("bogus", ("name",), b"{}", OK)], concurrency=4)
+        assert len(report.results) == len(cases) + 1
+        assert [result.case.label for result in report.unexpected] == ["bogus"]
+        assert report.matrix()["<raw>"][400] >= 10
+        assert "Неожиданных ответов: 1" in report.format()
+
+
+def _history(tmp_path, durations):
+    history = DurationHistory(str(tmp_path / "durations.json"))
+    history.update(durations)
+    return history
+
+
+class TestScheduling:
+    """Порядок и распределение тестов по истории длительностей"""
+
+    def test_history_key_ignores_rootdir_and_xdist_group(self):
+        assert history_key("task_2/test_api.py::TestAdsAPI::test_x") == "test_api.py::TestAdsAPI::test_x"
+        assert history_key("test_api.py::TestAdsAPI::test_x@ads-lpt-1") == "test_api.py::TestAdsAPI::test_x"
+        assert history_key("test_h.py::test_p[a@b]") == "test_h.py::test_p[a@b]"
+
+    def test_history_is_smoothed_and_persisted(self, tmp_path):
+        history = _history(tmp_path, {"a.py::t": 4.0})
+        history.update({"a.py::t": 2.0, "a.py::u": 1.0})
+        history.save()
+        loaded = DurationHistory(history.path)
+        assert loaded.durations == {"a.py::t": 3.0, "a.py::u": 1.0}
+        assert loaded.estimate("a.py::new") == 2.0
+
+    def test_longest_first_with_cheap_batch_last(self, tmp_path):
+        keys = ["a.py::cheap1", "a.py::slow", "a.py::cheap2", "a.py::mid", "a.py::new"]
+        history = _history(tmp_path, {"a.py::cheap1": 0.01, "a.py::slow": 5.0, "a.py::cheap2": 0.02,
+                                      "a.py::mid": 1.0})
+        [order] = plan(keys, history)
+        # Новый тест оценивается медианой известных (0.51 с)
+        assert [keys[index] for index in order] == ["a.py::slow", "a.py::mid", "a.py::new",
+                                                     "a.py::cheap1", "a.py::cheap2"]
+
+    def test_lpt_balances_workers_and_keeps_modules_together(self, tmp_path):
+        durations = {"a.py::t1": 6.0, "b.py::t2": 5.0, "a.py::t3": 4.0, "b.py::t4": 3.0, "a.py::t5": 2.0,
+                     "b.py::t6": 2.0}
+        keys = list(durations)
+        bins = plan(keys, _history(tmp_path, durations), workers=2)
+        loads = sorted(sum(durations[keys[index]] for index in indexes) for indexes in bins)
+        assert loads == [11.0, 11.0]
+        for indexes in bins:
+            modules = [keys[index].split("::")[0] for index in indexes]
+            assert modules == sorted(modules, key=modules.index)
+
+    def test_simulate_assigns_to_first_free_worker(self):
+        assert simulate([3.0, 1.0, 1.0, 1.0], workers=2) == [[0], [1, 2, 3]]
+
+
+class ScriptedApp:
+    """Заглушка, отвечающая заданной последовательностью статусов"""
+
+    def __init__(self, *statuses, headers=None):
+        self.statuses = list(statuses)
+        self.headers = headers or {}
+        self.calls = 0
+
+    def handle(self, method, path, headers, body):
+        status = self.statuses[min(self.calls, len(self.statuses) - 1)]
+        self.calls += 1
+        return status, dict(self.headers, **{"Content-Type": "application/json"}), b"[]"
+
+
+class TestSharedThrottle:
+    """Общий для процессов лимит частоты и выключатель"""
+
+    @pytest.fixture
+    def clock(self):
+        clock = FakeClock()
+        clock.now = 1000.0
+        return clock
+
+    def _throttle(self, tmp_path, clock, **kwargs) -> SharedThrottle:
+        return SharedThrottle(str(tmp_path / "throttle.state"), clock=clock, sleep=clock.sleep, **kwargs)
+
+    def test_rate_with_burst(self, tmp_path, clock):
+        throttle = self._throttle(tmp_path, clock, rate=10.0, burst=3)
+        for _ in range(5):
+            throttle.acquire()
+        assert clock.sleeps == pytest.approx([0.1, 0.1])
+
+    def test_state_is_shared_between_instances(self, tmp_path, clock):
+        first = self._throttle(tmp_path, clock, rate=10.0, burst=1)
+        second = self._throttle(tmp_path, clock, rate=10.0, burst=1)
+        first.acquire()
+        second.acquire()
+        assert clock.sleeps == pytest.approx([0.1])
+
+    def test_retry_after_pauses_everyone(self, tmp_path, clock):
+        first, second = self._throttle(tmp_path, clock), self._throttle(tmp_path, clock)
+        first.record(429, "3")
+        second.acquire()
+        assert clock.sleeps == [3.0]
+        first.record(429, "120")
+        with pytest.raises(ThrottleError):
+            second.acquire()
+
+    def test_wait_is_bounded_by_call_deadline(self, tmp_path, clock):
+        throttle = self._throttle(tmp_path, clock)
+        throttle.record(429, "3")
+        with pytest.raises(ThrottleDeadline):
+            throttle.acquire(timeout=1.0)
+        throttle.acquire(timeout=5.0)
+        assert clock.sleeps == [3.0]
+
+    def test_state_is_per_run(self, tmp_path, clock, monkeypatch):
+        monkeypatch.setattr(tempfile, "tempdir", str(tmp_path))
+        url = "https://example.invalid/api/1"
+        first, second = default_state_path(url, "run-a"), default_state_path(url, "run-b")
+        assert first != second and first == default_state_path(url, "run-a")
+        # Выключатель, открытый прогоном run-a, не действует на run-b
+        broken = SharedThrottle(first, threshold=1, clock=clock, sleep=clock.sleep)
+        broken.record(503)
+        assert broken.is_open
+        fresh = SharedThrottle(second, threshold=1, clock=clock, sleep=clock.sleep)
+        fresh.acquire()
+        broken.close()
+        fresh.close()
+        remove_run_state("run-a")
+        remove_run_state("run-b")
+        assert not list(tmp_path.glob("ads-throttle-*"))
+
+    def test_parse_retry_after(self):
+        assert parse_retry_after("5", 0.0) == 5.0
+        assert parse_retry_after(None, 0.0) == 1.0
+        assert parse_retry_after("Thu, 01 Jan 1970 00:00:10 GMT", 4.0) == 6.0
+        assert parse_retry_after("soon", 0.0) == 1.0
+
+    def test_breaker_opens_probes_and_closes(self, tmp_path, clock):
+        throttle = self._throttle(tmp_path, clock, threshold=2, cooldown=5.0)
+        throttle.record(503)
+        throttle.acquire()
+        throttle.record(None)
+        assert throttle.is_open
+        with pytest.raises(CircuitOpenError):
+            throttle.acquire()
+        clock.now += 5.0
+        throttle.acquire()  # пробный запрос
+        with pytest.raises(CircuitOpenError):
+            throttle.acquire()
+        throttle.record(200)
+        throttle.acquire()
+        assert not throttle.is_open
+
+    def test_client_retries_429_and_fails_fast_when_open(self, tmp_path, clock):
+        app = ScriptedApp(429, 200, 500, headers={"Retry-After": "2"})
+        throttle = self._throttle(tmp_path, clock, threshold=3)
+        with AdsApiClient(INPROCESS_BASE_URL, transport=InProcessAdapter(app), throttle=throttle) as client:
+            assert client.get("/1/item").status_code == 200
+            assert clock.sleeps == [2.0]
+            for _ in range(3):
+                assert client.get("/1/item").status_code == 500
+            with pytest.raises(CircuitOpenError):
+                client.get("/1/item")
+        assert app.calls == 5
+
+    def test_client_does_not_wait_past_its_deadline(self, tmp_path, clock):
+        app = ScriptedApp(429, 200, headers={"Retry-After": "5"})
+        throttle = self._throttle(tmp_path, clock)
+        with AdsApiClient(INPROCESS_BASE_URL, transport=InProcessAdapter(app), throttle=throttle,
+                          deadline=1.0) as client:
+            with pytest.raises(DeadlineExceeded):
+                client.get("/1/item")
+        assert clock.sleeps == [] and app.calls == 1
+
+
+class TestLagProfile:
+    """Профиль задержки видимости объявлений"""
+
+    def test_lag_per_endpoint_against_delayed_stub(self, tmp_path):
+        app = AdsStubApp(AdsStore(visibility_delay=0.03))
+        seller_ids = itertools.count(300000)
+        with AdsApiClient(INPROCESS_BASE_URL, pool_size=12, transport=InProcessAdapter(app)) as client:
+            result = profile(client, lambda: next(seller_ids), samples=8, horizon=2.0)
+        assert result.samples == 8 and not result.failed
+        for name in ENDPOINTS:
+            lag = result.endpoints[name]
+            assert lag.histogram.count == 8 and not lag.invisible
+            # Задержка считается от ответа POST, а таймер заглушки запущен чуть раньше
+            assert lag.histogram.min_us >= 25_000
+        path = tmp_path / "lag.json"
+        path.write_text(json.dumps(result.to_dict()), encoding="utf-8")
+        assert load_deadlines(str(path)) == {name: 1.0 for name in ENDPOINTS}
+
+    def test_poll_error_is_recorded_not_raised(self):
+        class BrokenStatistic(InProcessAdapter):
+            def send(self, request, **kwargs):
+                if "/statistic/" in request.path_url:
+                    raise requests.ConnectionError("соединение сброшено")
+                return super().send(request, **kwargs)
+
+        seller_ids = itertools.count(300100)
+        transport = BrokenStatistic(AdsStubApp())
+        with AdsApiClient(INPROCESS_BASE_URL, pool_size=12, transport=transport, retries=0) as client:
+            result = profile(client, lambda: next(seller_ids), samples=4, horizon=2.0)
+        # Образцы остальных эндпоинтов сохраняются, ошибки опроса учитываются отдельно
+        assert result.samples == 4
+        assert result.endpoints[LISTING].histogram.count == 4
+        statistic = result.endpoints[STATISTIC]
+        assert statistic.errors == 4 and not statistic.histogram.count
+        assert len(result.failed) == 4 and all("ConnectionError" in line for line in result.failed)
+        assert result.deadlines()[STATISTIC] is None
+        assert "ошибок" in result.format()
+
+    def test_recommended_deadline(self):
+        lag = EndpointLag(LISTING)
+        for seconds in (0.2, 0.4, 1.5):
+            lag.add(LagSample(LISTING, "id", seconds, 0.01, 3))
+        assert lag.recommended_deadline(percentile=99.0, safety=2.0) == pytest.approx(3.0, abs=0.1)
+        assert lag.recommended_deadline(percentile=50.0, safety=1.0) == 1.0
+        lag.add(LagSample(LISTING, "id", None, 0.01, 100))
+        assert lag.recommended_deadline() is None
+
+    def test_load_deadlines_skips_missing_and_checks_version(self, tmp_path):
+        path = tmp_path / "lag.json"
+        path.write_text(json.dumps({"v": 1, "deadlines_s": {LISTING: 2.5, "GET /item/:id": None}}), encoding="utf-8")
+        assert load_deadlines(str(path)) == {LISTING: 2.5}
+        path.write_text(json.dumps({"v": 99}), encoding="utf-8")
+        with pytest.raises(LagProfileError):
+            load_deadlines(str(path))
+
+
+class RacyStore(AdsStore):
+    """Хранилище, увеличивающее viewCount без блокировки: чтение-изменение-запись с паузой"""
+
+    def view(self, item_id):
+        statistics = self._ads[item_id]["statistics"]
+        value = statistics["viewCount"]
+        time.sleep(0.0005)
+        statistics["viewCount"] = value + 1
+        return dict(statistics)
+
+
+class TestCounterStress:
+    """Конкурентная проверка счетчика статистики"""
+
+    def _stress(self, store: AdsStore, **kwargs):
+        with AdsApiClient(INPROCESS_BASE_URL, pool_size=8, transport=InProcessAdapter(AdsStubApp(store))) as client:
+            item_id = prepare_item(client, 500000)
+            return run_stress(client, item_id, 500000, levels=(1, 8), operations=200, **kwargs)
+
+    def test_atomic_counter_passes(self):
+        report = self._stress(AdsStore(count_views=True))
+        assert not report.violations(), report.format()
+        assert [level.concurrency for level in report.levels] == [1, 8]
+        for level in report.levels:
+            assert level.read_latency.count + level.create_latency.count == 200
+            assert level.unaccounted(1) == 0
+
+    def test_lost_updates_are_detected(self):
+        report = self._stress(RacyStore())
+        racy = report.levels[1]
+        assert racy.unaccounted(1) < 0 and racy.duplicates(1) > 0
+        assert any("потеряно обновлений" in problem for problem in report.violations())
+
+    def test_counter_that_does_not_count_fails_only_with_increment(self):
+        assert self._stress(AdsStore(), increment=None).violations() == []
+        assert self._stress(AdsStore()).violations()
+
+    def test_failed_reads_are_not_retried_or_miscounted(self):
+        class FlakyStatistic(InProcessAdapter):
+            """Каждое 7-е чтение статистики засчитывается сервером, но отвечает 503, каждое 11-е - 200 не в JSON"""
+            calls = itertools.count(1)
+
+            def send(self, request, **kwargs):
+                response = super().send(request, **kwargs)
+                if "/statistic/" in request.path_url:
+                    number = next(self.calls)
+                    if number % 7 == 0:
+                        response.status_code = 503
+                    elif number % 11 == 0:
+                        response._content = b"<html>bad gateway</html>"
+                return response
+
+        transport = FlakyStatistic(AdsStubApp(AdsStore(count_views=True)))
+        # Клиент с повторами: повтор засчитанного 503 дал бы лишнее обновление
+        with AdsApiClient(INPROCESS_BASE_URL, pool_size=8, transport=transport, retries=2) as client:
+            item_id = prepare_item(client, 500100)
+            report = run_stress(client, item_id, 500100, levels=(1, 8), operations=200, create_ratio=0.0)
+        assert not report.violations(), report.format()
+        for level in report.levels:
+            assert level.read_errors > 0
+            # Ошибки чтения - неудачные попытки уровня и второго контрольного чтения
+            assert 200 <= len(level.reads) + level.read_errors < 200 + CONTROL_ATTEMPTS
+
+    def test_non_monotonic_reads(self):
+        reads = [Read(0.0, 1.0, 5), Read(0.5, 2.0, 7), Read(1.5, 3.0, 4), Read(2.5, 3.5, 6)]
+        pairs = find_non_monotonic(reads)
+        # 4 начато после завершения 5; 6 начато после завершения 7; перекрывающиеся чтения не сравниваются
+        assert [(earlier.value, later.value) for earlier, later in pairs] == [(5, 4), (7, 6)]
+        level = LevelResult(1, before=6, after=7, reads=[Read(0.0, 1.0, 5)])
+        assert len(level.non_monotonic()) == 1
+
+
+class TestFaultProxy:
+    """Дедлайны и повторы клиента при сетевых сбоях (прокси перед HTTP-заглушкой)"""
+
+    def _client(self, fault_proxy, **kwargs) -> AdsApiClient:
+        return AdsApiClient(fault_proxy.url, **kwargs)
+
+    def test_latency_and_bandwidth(self, fault_proxy):
+        fault_proxy.configure(latency=0.1)
+        with self._client(fault_proxy) as client:
+            started = time.perf_counter()
+            assert client.get("/123456/item").status_code == 200
+            assert time.perf_counter() - started >= 0.1
+            fault_proxy.configure(Faults(bandwidth=20_000))
+            started = time.perf_counter()
+            response = client.post("/item", json=build_ad_payload(123456, name="x" * 4000))
+            assert response.status_code == 200
+            response = client.get("/123456/item")
+            assert response.status_code == 200 and len(response.content) > 4000
+            # Запрос и ответ отдаются не быстрее 20 000 байт/с
+            assert time.perf_counter() - started >= len(response.content) / 20_000
+
+    @pytest.mark.parametrize("faults", [Faults(drop=1.0, times=1), Faults(partial=1, times=1)],
+                             ids=["drop", "partial"])
+    def test_get_is_retried(self, fault_proxy, faults):
+        fault_proxy.configure(faults)
+        with self._client(fault_proxy, retries=2) as client:
+            assert client.get("/123456/item").status_code == 200
+        assert fault_proxy.stats.requests == 2
+
+    @pytest.mark.parametrize("faults", [Faults(drop=1.0, times=1), Faults(partial=1, times=1)],
+                             ids=["drop", "partial"])
+    def test_post_is_not_retried(self, fault_proxy, faults):
+        fault_proxy.configure(faults)
+        with self._client(fault_proxy, retries=2) as client:
+            with pytest.raises((requests.ConnectionError, requests.exceptions.ChunkedEncodingError)):
+                client.post("/item", json=build_ad_payload(123456))
+        assert fault_proxy.stats.requests == 1
+
+    def test_slow_loris_body_hits_deadline(self, fault_proxy):
+        with self._client(fault_proxy, read_timeout=5.0, deadline=0.3, retries=0) as client:
+            # Свой список продавца: тело в тысячи байт не успевает прийти до дедлайна
+            assert client.post("/item", json=build_ad_payload(123456, name="x" * 2000)).status_code == 200
+            # Байт каждые 20 мс не дает сработать таймауту чтения, но общий дедлайн ограничивает вызов
+            fault_proxy.configure(trickle=0.02)
+            started = time.perf_counter()
+            with pytest.raises(DeadlineExceeded):
+                client.get("/123456/item")
+            assert time.perf_counter() - started < 0.5
+
+    def test_stalled_server_is_bounded_by_deadline(self, fault_proxy):
+        fault_proxy.configure(stall=True)
+        with self._client(fault_proxy, read_timeout=0.2, deadline=0.6, retries=10) as client:
+            started = time.perf_counter()
+            with pytest.raises(requests.Timeout):
+                client.get("/123456/item")
+            assert time.perf_counter() - started < 0.8
+        # Повторы прекращаются, когда следующий не успевает до дедлайна
+        assert 2 <= fault_proxy.stats.requests < 11
+
+    def test_parse_faults(self):
+        assert Faults.parse("latency=0.05, drop=0.1,stall,times=3") == Faults(latency=0.05, drop=0.1,
+                                                                                stall=True, times=3)
+        with pytest.raises(ValueError):
+            Faults.parse("jitter=1")
+
+
+class TestSnapshot:
+    """Снимок объявлений в mmap-файле и заглушка поверх него"""
+
+    SELLERS = [(999990, 3), (999991, 0), (999992, 40), (999993, 1)]
+
+    @pytest.fixture
+    def snapshot(self, tmp_path):
+        path = str(tmp_path / "ads.snap")
+        write_snapshot(path, self.SELLERS, seed=1)
+        with Snapshot.open(path) as snapshot:
+            yield snapshot
+
+    def test_seller_counts_skew_and_heavy(self):
+        even = seller_counts(100, 4)
+        assert even == [(999996, 25), (999997, 25), (999998, 25), (999999, 25)]
+        skewed = seller_counts(1000, 10, skew=1.2, heavy=[(2, 300)], first_seller=200000)
+        counts = [count for _, count in skewed]
+        assert [seller_id for seller_id, _ in skewed] == list(range(200000, 200010))
+        assert sum(counts) == 1000 and counts[:2] == [300, 300]
+        assert counts[2:] == sorted(counts[2:], reverse=True) and counts[2] > 4 * counts[-1]
+        with pytest.raises(ValueError):
+            seller_counts(10, 2, heavy=[(1, 20)])
+
+    def test_find_and_listing_order(self, snapshot):
+        assert len(snapshot) == 44
+        assert snapshot.seller_range == (999990, 999993)
+        assert snapshot.largest(2) == [(999992, 40), (999990, 3)]
+        assert snapshot.by_seller(999991) == [] and snapshot.by_seller(111111) == []
+        listing = snapshot.by_seller(999992)
+        assert len(listing) == 40 and not listing_violations(listing, 999992)
+        # Порядок списка - порядок создания, как у сервиса
+        created = [ad["createdAt"] for ad in listing]
+        assert created == sorted(created)
+        for ad in listing[::7]:
+            assert snapshot.get(ad["id"]) == ad
+        assert snapshot.get(str(uuid.uuid4())) is None
+        assert snapshot.get("not-a-uuid") is None
+
+    def test_rejects_foreign_file(self, tmp_path):
+        path = tmp_path / "broken.snap"
+        path.write_bytes(b"NOTSNAP\0" + bytes(120))
+        with pytest.raises(SnapshotError):
+            Snapshot.open(str(path))
+
+    def test_stub_serves_snapshot_and_new_ads(self, snapshot):
+        app = AdsStubApp(AdsStore(count_views=True, snapshot=snapshot))
+        with AdsApiClient(base_url=INPROCESS_BASE_URL, transport=InProcessAdapter(app)) as client:
+            seller_id, size = snapshot.largest(1)[0]
+            created = parse_item_id(client.post("/item", json=build_ad_payload(seller_id)).json()["status"])
+            listing = client.get(f"/{seller_id}/item").json()
+            assert len(listing) == size + 1 and listing[-1]["id"] == created
+            item_id = listing[0]["id"]
+            assert client.get(f"/item/{item_id}").json() == [listing[0]]
+            views = listing[0]["statistics"]["viewCount"]
+            client.get(f"/statistic/{item_id}")
+            assert client.get(f"/statistic/{item_id}").json()[0]["viewCount"] == views + 2
+            assert client.get(f"/item/{item_id}").json()[0]["statistics"]["viewCount"] == views + 2
+
+
+class TestResponseCache:
+    """Кэш ответов GET: ETag, срок без ETag, сброс списка после POST, исключение счетчиков"""
+
+    @pytest.fixture
+    def app(self):
+        return AdsStubApp(AdsStore(count_views=True))
+
+    def _client(self, app, calls, **kwargs) -> AdsApiClient:
+        client = AdsApiClient(base_url=INPROCESS_BASE_URL, transport=InProcessAdapter(app),
+                              cache=ResponseCache(**kwargs))
+        client.observers.append(lambda method, path, status, size, elapsed: calls.append((method, path, status)))
+        return client
+
+    def _create(self, client, seller_id: int) -> str:
+        return parse_item_id(client.post("/item", json=build_ad_payload(seller_id)).json()["status"])
+
+    def test_stub_answers_not_modified(self, app):
+        status, headers, body = app.handle("GET", "/api/1/123456/item", {}, b"")
+        assert status == 200 and headers["ETag"]
+        status, _, body = app.handle("GET", "/api/1/123456/item", {"if-none-match": headers["ETag"]}, b"")
+        assert (status, body) == (304, b"")
+
+    def test_etag_entries_are_revalidated(self, app):
+        calls = []
+        with self._client(app, calls, ttl=60.0) as client:
+            item_id = self._create(client, 123456)
+            first = client.get(f"/item/{item_id}")
+            second = client.get(f"/item/{item_id}")
+            # Запись с ETag не отдается без запроса даже в пределах ttl
+            assert [status for method, _, status in calls if method == "GET"] == [200, 304]
+            assert second.status_code == 200 and second.json() == first.json()
+            assert client.cache.stats.revalidated == 1
+
+    def test_create_invalidates_seller_listing(self, app):
+        calls = []
+        with self._client(app, calls, ttl=60.0) as client:
+            self._create(client, 123456)
+            self._create(client, 654321)
+            client.get("/123456/item")
+            client.get("/654321/item")
+            item_id = self._create(client, 123456)
+            listing = client.get("/123456/item").json()
+            assert contains_item(item_id)(listing) and len(listing) == 2
+            assert client.cache.stats.invalidations == 1
+            assert client.cache.lookup("/654321/item") is not None
+
+    def test_fresh_entries_without_etag_skip_the_server(self):
+        # Сервер без ETag: в пределах ttl ответ отдается из кэша, после - запрашивается снова
+        app = AdsStubApp(etags=False)
+        clock = FakeClock()
+        calls = []
+        with self._client(app, calls, ttl=1.0, clock=clock) as client:
+            item_id = self._create(client, 123456)
+            client.get(f"/item/{item_id}")
+            client.get(f"/item/{item_id}").json()[0]["name"] = "changed"
+            assert client.get(f"/item/{item_id}").json()[0]["name"] != "changed"
+            assert len(calls) == 2
+            clock.sleep(1.0)
+            client.get(f"/item/{item_id}")
+            assert len(calls) == 3
+
+    def test_statistic_is_exempt_unless_opted_in(self, app):
+        calls = []
+        with self._client(app, calls) as client:
+            item_id = self._create(client, 123456)
+            views = [client.get(f"/statistic/{item_id}").json()[0]["viewCount"] for _ in range(2)]
+            assert views[1] == views[0] + 1 and not client.cache.cacheable(f"/statistic/{item_id}")
+        with self._client(app, calls, include_statistic=True) as client:
+            assert client.cache.cacheable(f"/statistic/{item_id}")
+
+    def test_lru_bound_and_errors_not_cached(self, app):
+        calls = []
+        with self._client(app, calls, max_entries=2) as client:
+            ids = [self._create(client, 123456) for _ in range(3)]
+            for item_id in ids:
+                client.get(f"/item/{item_id}")
+            client.get(f"/item/{uuid.uuid4()}")
+            assert len(client.cache) == 2 and client.cache.stats.evictions == 1
+            assert client.cache.lookup(f"/item/{ids[0]}") is None
+            # Поток и явный отказ от кэша идут мимо него
+            with client.get("/123456/item", stream=True):
+                pass
+            client.get("/123456/item", cache=False)
+            assert client.cache.lookup("/123456/item") is None
@@ -0,0 +1,204 @@
+"""
+Ограничение частоты запросов и автоматический выключатель (circuit breaker),
+общие для всех процессов одного прогона, работающих с одним сервисом (воркеры xdist).
+
+Состояние - несколько чисел в маленьком файле во временном каталоге; каждое
+изменение выполняется под блокировкой файла (fcntl, на Windows - msvcrt),
+поэтому лимит соблюдается суммарно, а не на каждый воркер отдельно. Имя файла
+зависит от идентификатора прогона: выключатель, открытый упавшим прогоном,
+не действует на следующий.
+
+- Частота: алгоритм GCRA (эквивалент token bucket) - каждый запрос за одну
+  блокировку резервирует себе момент отправки и ждет его вне блокировки.
+- 429: момент, указанный в Retry-After (или через секунду), становится общим
+  для всех процессов - до него никто не отправляет запросы; сам запрос повторяется.
+- Выключатель: после threshold подряд ошибок (5xx, таймауты, обрывы) запросы
+  сразу завершаются CircuitOpenError на cooldown секунд; затем один пробный
+  запрос решает, закрыть выключатель или снова открыть.
+- Ожидание очереди или Retry-After не дольше max_wait и не дольше оставшегося
+  времени вызова (timeout): иначе запрос сразу завершается ThrottleDeadline.
+"""
+
+import email.utils
+import glob
+import hashlib
+import os
+import struct
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Iterator, Optional
+
+from requests.exceptions import ConnectionError
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+DEFAULT_LIVE_RATE = 20.0
+DEFAULT_BURST = 5
+DEFAULT_BREAKER_THRESHOLD = 5
+DEFAULT_BREAKER_COOLDOWN = 10.0
+DEFAULT_RETRY_AFTER = 1.0
+# Дольше этого запрос не ждет очереди или Retry-After, а сразу завершается ошибкой
+DEFAULT_MAX_WAIT = 30.0
+MAX_429_RETRIES = 3
+
+# tat (теоретическое время следующего запроса), blocked_until (Retry-After),
+# opened_until (выключатель открыт), probe_until (идет пробный запрос), failures подряд
+_STATE = struct.Struct("<ddddi")
+
+
+class ThrottleError(ConnectionError):
+    """Запрос не отправлен: сервис перегружен или недоступен"""
+
+
+class CircuitOpenError(ThrottleError):
+    """Выключатель открыт: недавние запросы подряд завершились ошибками"""
+
+
+class ThrottleDeadline(ThrottleError):
+    """Очередь или Retry-After дольше, чем осталось до дедлайна вызова"""
+
+
+def default_state_path(base_url: str, run: str = "") -> str:
+    """Файл состояния, общий для процессов прогона run, работающих с base_url"""
+    digest = hashlib.sha256(base_url.encode("utf-8")).hexdigest()[:16]
+    suffix = f"-{run}" if run else ""
+    return os.path.join(tempfile.gettempdir(), f"ads-throttle-{digest}{suffix}.state")
+
+
+def remove_run_state(run: str):
+    """Удаление файлов состояния прогона run (по всем base_url)"""
+    for path in glob.glob(os.path.join(tempfile.gettempdir(), f"ads-throttle-*-{glob.escape(run)}.state")):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def parse_retry_after(value: Optional[str], now: float, default: float = DEFAULT_RETRY_AFTER) -> float:
+    """Retry-After в секундах: число секунд или HTTP-дата"""
+    if not value:
+        return default
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        moment = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return default
+    return max(0.0, moment.timestamp() - now)
+
+
+class SharedThrottle:
+    """Лимит частоты и выключатель с общим для процессов состоянием в файле path"""
+
+    def __init__(self, path: str, rate: Optional[float] = None, burst: int = DEFAULT_BURST,
+                 threshold: int = DEFAULT_BREAKER_THRESHOLD, cooldown: float = DEFAULT_BREAKER_COOLDOWN,
+                 max_wait: float = DEFAULT_MAX_WAIT, clock: Callable[[], float] = time.time,
+                 sleep: Callable[[float], None] = time.sleep):
+        self.path = path
+        self.rate = rate
+        self.burst = max(1, burst)
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.max_wait = max_wait
+        self._clock = clock
+        self._sleep = sleep
+        # Блокировка файла разделяет процессы, потоки одного процесса разделяет обычный Lock
+        self._thread_lock = threading.Lock()
+        self._fd: Optional[int] = os.open(path, os.O_RDWR | os.O_CREAT | getattr(os, "O_BINARY", 0), 0o666)
+
+    @contextmanager
+    def _state(self) -> Iterator[list]:
+        with self._thread_lock:
+            self._lock_file()
+            try:
+                os.lseek(self._fd, 0, os.SEEK_SET)
+                raw = os.read(self._fd, _STATE.size)
+                state = list(_STATE.unpack(raw)) if len(raw) == _STATE.size else [0.0, 0.0, 0.0, 0.0, 0]
+                before = list(state)
+                yield state
+                if state != before:
+                    os.lseek(self._fd, 0, os.SEEK_SET)
+                    os.write(self._fd, _STATE.pack(*state))
+            finally:
+                self._unlock_file()
+
+    def _lock_file(self):
+        if fcntl is not None:
+            fcntl.flock(self._fd, fcntl.LOCK_EX)
+        else:
+            os.lseek(self._fd, 0, os.SEEK_SET)
+            msvcrt.locking(self._fd, msvcrt.LK_LOCK, 1)
+
+    def _unlock_file(self):
+        if fcntl is not None:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+        else:
+            os.lseek(self._fd, 0, os.SEEK_SET)
+            msvcrt.locking(self._fd, msvcrt.LK_UNLCK, 1)
+
+    def acquire(self, timeout: Optional[float] = None):
+        """
+        Разрешение на запрос: ждет своей очереди или сразу завершается ThrottleError.
+        timeout - сколько секунд осталось до дедлайна вызова; ожидание дольше - ThrottleDeadline
+        """
+        with self._state() as state:
+            tat, blocked_until, opened_until, probe_until, failures = state
+            now = self._clock()
+            probing = failures >= self.threshold
+            if probing and now < opened_until:
+                raise CircuitOpenError(f"Сервис недоступен: {failures} ошибок подряд, "
+                                       f"повтор через {opened_until - now:.1f} с")
+            if probing and now < probe_until:
+                raise CircuitOpenError("Сервис недоступен: выполняется пробный запрос")
+            allowed_at = blocked_until
+            if self.rate:
+                interval = 1.0 / self.rate
+                tat = max(tat, now)
+                allowed_at = max(allowed_at, tat - (self.burst - 1) * interval)
+                tat = max(tat, allowed_at) + interval
+            wait = allowed_at - now
+            if wait > self.max_wait:
+                raise ThrottleError(f"Сервис просит подождать {wait:.1f} с (больше {self.max_wait:g} с)")
+            if timeout is not None and wait > timeout:
+                raise ThrottleDeadline(f"Ожидание очереди {wait:.1f} с дольше оставшихся до дедлайна "
+                                       f"{max(timeout, 0.0):.1f} с")
+            state[0] = tat
+            if probing:
+                # Выключатель полуоткрыт: этот запрос - пробный, остальные завершаются до его результата
+                state[3] = now + self.cooldown
+        if wait > 0:
+            self._sleep(wait)
+
+    def record(self, status: Optional[int], retry_after: Optional[str] = None):
+        """Результат запроса: status=None - таймаут или обрыв соединения"""
+        with self._state() as state:
+            now = self._clock()
+            if status == 429:
+                state[1] = max(state[1], now + parse_retry_after(retry_after, now))
+                return
+            if status is None or status >= 500:
+                state[4] += 1
+                if state[4] >= self.threshold:
+                    state[2] = now + self.cooldown
+                    state[3] = 0.0
+            elif state[4]:
+                state[4] = 0
+                state[3] = 0.0
+
+    @property
+    def is_open(self) -> bool:
+        with self._state() as state:
+            return state[4] >= self.threshold and self._clock() < state[2]
+
+    def close(self):
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
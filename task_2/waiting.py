@@ -0,0 +1,55 @@
+"""
+Ожидание выполнения условия с общим дедлайном.
+Заменяет фиксированные паузы между повторными запросами: первые попытки
+идут через миллисекунды, дальше интервал растет экспоненциально с джиттером.
+"""
+
+import random
+import time
+from typing import Any, Callable, Dict, List, TypeVar
+
+
+T = TypeVar("T")
+
+DEFAULT_TIMEOUT = 20.0
+DEFAULT_INITIAL_DELAY = 0.005
+DEFAULT_MAX_DELAY = 1.0
+
+# Собственный генератор джиттера: число опросов зависит от времени, и общий random
+# после ожидания давал бы в тесте разные значения при одном и том же зерне
+_jitter_random = random.Random()
+
+
+def wait_until(fetch: Callable[[], T], predicate: Callable[[T], bool],
+               timeout: float = DEFAULT_TIMEOUT, initial_delay: float = DEFAULT_INITIAL_DELAY,
+               max_delay: float = DEFAULT_MAX_DELAY, factor: float = 2.0, jitter: float = 0.5,
+               clock: Callable[[], float] = time.monotonic,
+               sleep: Callable[[float], None] = time.sleep) -> T:
+    """
+    Вызывает fetch, пока predicate(результат) не станет истинным или не истечет timeout.
+    Возвращает последний полученный результат; проверку итогового условия делает вызывающий код,
+    чтобы сообщение об ошибке оставалось в тесте.
+    """
+    deadline = clock() + timeout
+    delay = initial_delay
+    while True:
+        value = fetch()
+        if predicate(value):
+            return value
+        remaining = deadline - clock()
+        if remaining <= 0:
+            return value
+        # Джиттер разносит повторы параллельных тестов во времени
+        pause = delay * (1 - jitter * _jitter_random.random())
+        sleep(min(pause, remaining))
+        delay = min(delay * factor, max_delay)
+
+
+def has_at_least(count: int) -> Callable[[List[Dict[str, Any]]], bool]:
+    """Условие: в списке объявлений не меньше count элементов"""
+    return lambda ads: len(ads) >= count
+
+
+def contains_item(item_id: str) -> Callable[[List[Dict[str, Any]]], bool]:
+    """Условие: в списке объявлений есть объявление с заданным id"""
+    return lambda ads: any(ad.get("id") == item_id for ad in ads)